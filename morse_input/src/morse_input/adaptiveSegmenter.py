@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+# Learns a user's pauses between Morse elements, and derives
+# the dwell times that end letters and words from them.
+#
+# The pauses a user makes within a letter, such as when moving from
+# the dot to the dash button, are shorter than the pauses between 
+# letters. The segmenter keeps a window of the most recent pauses, 
+# so that old pauses are forgotten as the user's rhythm changes, for
+# instance with fatigue. After each new pause, the window is split into
+# a short and a long cluster at the point that maximizes the variance 
+# between the clusters (Otsu's method, which is exact for one dimension).
+#
+# The end-of-letter threshold is the point between the clusters that is
+# equally many standard deviations from both means. Pauses of inter-word
+# length are rare, so the end-of-word threshold is derived from the long
+# cluster rather than from a cluster of its own: standard Morse timing has
+# word gaps of 7 dot lengths where letter gaps have 3.
+#
+# Until both clusters hold enough pauses, and are well separated,
+# confidence() stays below MIN_CONFIDENCE, and the configured dwell
+# times stay in effect.
+
+import math;
+from collections import deque;
+
+class GapCluster(object):
+    '''
+    Mean and standard deviation of a cluster of pause durations.
+    '''
+    
+    def __init__(self, gaps):
+        '''
+        @param gaps: pause durations of the cluster; at least one.
+        @type gaps: [float]
+        '''
+        self.count = len(gaps);
+        self.mean = sum(gaps) / self.count;
+        variance = sum([(gap - self.mean)**2 for gap in gaps]) / self.count;
+        self.stdDev = max(math.sqrt(variance), AdaptiveSegmenter.MIN_STD_DEV);
+
+class AdaptiveSegmenter(object):
+    '''
+    Adapts end-of-letter and end-of-word dwell times to the pauses
+    reported through noteGap(). All times are in fractional seconds.
+    '''
+    
+    # Number of recent pauses that are clustered:
+    WINDOW_SIZE = 60;
+    # Pauses per cluster needed before adapting, and for full confidence:
+    MIN_SAMPLES = 5;
+    FULL_CONFIDENCE_SAMPLES = 15;
+    # Separation of the cluster means, in summed standard 
+    # deviations, that earns full confidence:
+    FULL_CONFIDENCE_SEPARATION = 2.0;
+    # Adapted times are used from this confidence on:
+    MIN_CONFIDENCE = 0.5;
+    # Floor of cluster standard deviations, against 
+    # overconfidence from a few similar pauses:
+    MIN_STD_DEV = 0.02;
+    # Longer pauses are rests, not segmentation:
+    MAX_GAP = 10.0;
+    # Word gap to letter gap ratio of standard Morse timing:
+    WORD_TO_LETTER_GAP_RATIO = 7.0 / 3.0;
+    # The end-of-word threshold is at least this many standard
+    # deviations above the mean of the long cluster:
+    WORD_GAP_STD_DEVS = 3.0;
+    
+    def __init__(self, windowSize=WINDOW_SIZE):
+        '''
+        @param windowSize: number of recent pauses learned from. Smaller 
+                           windows adapt faster, but less steadily.
+        @type windowSize: int
+        '''
+        self.gaps = deque(maxlen=windowSize);
+        self.numWordGaps = 0;
+        # (short, long) GapClusters of the current window, or None
+        # if they were not computed since the last change:
+        self.clusters = None;
+        # Total pause that ends a word, from the most recent 
+        # wordDelay() call. Longer pauses are not clustered:
+        self.wordThreshold = None;
+    
+    def noteGap(self, gap):
+        '''
+        Learn from one pause between the end of a dot or dash
+        sequence and the start of the next. 
+        @param gap: duration of the pause
+        @type gap: float
+        '''
+        if gap <= 0 or gap > AdaptiveSegmenter.MAX_GAP:
+            return;
+        if self.wordThreshold is not None and gap >= self.wordThreshold:
+            self.numWordGaps += 1;
+            return;
+        self.gaps.append(gap);
+        self.clusters = None;
+    
+    def confidence(self):
+        '''
+        Return how much the learned thresholds can be trusted,
+        between 0.0 and 1.0. Grows with the number of pauses in
+        the sparser cluster, and with the separation of the clusters.
+        @rtype: float
+        '''
+        clusters = self.getClusters();
+        if clusters is None:
+            return 0.0;
+        (shortGaps, longGaps) = clusters;
+        separation = (longGaps.mean - shortGaps.mean) / (shortGaps.stdDev + longGaps.stdDev);
+        minCount = min(shortGaps.count, longGaps.count);
+        return min(1.0, float(minCount) / AdaptiveSegmenter.FULL_CONFIDENCE_SAMPLES) *\
+               min(1.0, separation / AdaptiveSegmenter.FULL_CONFIDENCE_SEPARATION);
+    
+    def letterDelay(self, configuredDelay):
+        '''
+        Return the pause after which a letter ends.
+        @param configuredDelay: delay to use while confidence is too low
+        @type configuredDelay: float
+        @rtype: float
+        '''
+        if self.confidence() < AdaptiveSegmenter.MIN_CONFIDENCE:
+            return configuredDelay;
+        (shortGaps, longGaps) = self.getClusters();
+        # Equally many standard deviations from both means:
+        return (shortGaps.mean * longGaps.stdDev + longGaps.mean * shortGaps.stdDev) /\
+               (shortGaps.stdDev + longGaps.stdDev);
+    
+    def wordDelay(self, configuredLetterDelay, configuredWordDelay):
+        '''
+        Return the pause after the end of a letter after which
+        a word ends. Like the generator's inter-word time, this 
+        delay starts when the letter ends.
+        @param configuredLetterDelay: letter delay to use while confidence is too low
+        @type configuredLetterDelay: float
+        @param configuredWordDelay: word delay to use while confidence is too low
+        @type configuredWordDelay: float
+        @rtype: float
+        '''
+        if self.confidence() < AdaptiveSegmenter.MIN_CONFIDENCE:
+            self.wordThreshold = None;
+            return configuredWordDelay;
+        longGaps = self.getClusters()[1];
+        self.wordThreshold = max(longGaps.mean * AdaptiveSegmenter.WORD_TO_LETTER_GAP_RATIO,
+                                 longGaps.mean + AdaptiveSegmenter.WORD_GAP_STD_DEVS * longGaps.stdDev);
+        return self.wordThreshold - self.letterDelay(configuredLetterDelay);
+    
+    # ---- Private ----
+    
+    def getClusters(self):
+        '''
+        Return the (short, long) GapClusters of the window, or None if
+        the window cannot yet be split into two clusters of MIN_SAMPLES.
+        '''
+        if self.clusters is not None:
+            return self.clusters;
+        minSamples = AdaptiveSegmenter.MIN_SAMPLES;
+        sortedGaps = sorted(self.gaps);
+        numGaps = len(sortedGaps);
+        if numGaps < 2 * minSamples:
+            return None;
+        # Split before index bestSplit, maximizing the between-cluster 
+        # variance, which is proportional to n0 * n1 * (mean0 - mean1)^2:
+        total = sum(sortedGaps);
+        shortSum = sum(sortedGaps[:minSamples - 1]);
+        bestSplit = None;
+        bestBetweenVariance = -1.0;
+        for split in range(minSamples, numGaps - minSamples + 1):
+            shortSum += sortedGaps[split - 1];
+            numLong = numGaps - split;
+            meanDiff = (total - shortSum) / numLong - shortSum / split;
+            betweenVariance = split * numLong * meanDiff * meanDiff;
+            if betweenVariance > bestBetweenVariance:
+                (bestSplit, bestBetweenVariance) = (split, betweenVariance);
+        self.clusters = (GapCluster(sortedGaps[:bestSplit]), GapCluster(sortedGaps[bestSplit:]));
+        return self.clusters;
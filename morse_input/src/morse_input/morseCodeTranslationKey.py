@@ -81,4 +81,15 @@ codeKey = {
 	   '.......'   : 'HS',  # 'HS' Invented: space
 	   '-......'  : 'BS',  # 'BS' invented; backspace
            }
+
+# Prosigns that accept the first, second, or third word completion
+# that Morser offers. They decode into these control characters, 
+# which are never typed:
+ACCEPT_COMPLETION_CHARS = ('\x11', '\x12', '\x13');
+
+completionProsignKey = {
+           '..--'     : '\x11', # Invented: accept first completion
+           '..--.'    : '\x12', # Invented: accept second completion
+           '..--.-'   : '\x13', # Invented: accept third completion
+           }
     
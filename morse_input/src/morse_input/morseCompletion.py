@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+# Word completion for Morser. A CompletionSession follows the 
+# letters Morser outputs, and looks up completions of the word 
+# being keyed after each of them. Accepting a completion yields
+# the keystrokes that finish the word, so that Morser can type
+# them in one batch.
+
+from morseCodeTranslationKey import ACCEPT_COMPLETION_CHARS;
+
+try:
+    from word_completion.word_collection import CompletionKind;
+except ImportError:
+    CompletionKind = None;
+
+class CompletionSession(object):
+    '''
+    Tracks the word being keyed, and its completions from a WordCollection.
+    '''
+    
+    # One completion per accept prosign:
+    NUM_COMPLETIONS = len(ACCEPT_COMPLETION_CHARS);
+    # Letters of a word needed before completions are offered:
+    MIN_PREFIX_LENGTH = 1;
+    
+    def __init__(self, wordCollection, numCompletions=NUM_COMPLETIONS):
+        '''
+        @param wordCollection: dictionary to complete from
+        @type wordCollection: word_completion.word_collection.WordCollection
+        @param numCompletions: maximum number of completions offered at a time
+        @type numCompletions: int
+        '''
+        self.wordCollection = wordCollection;
+        self.numCompletions = numCompletions;
+        self.wordSoFar = '';
+        # (completion, CompletionKind) pairs for wordSoFar:
+        self.completions = [];
+    
+    def noteLetter(self, letter):
+        '''
+        Follow one letter that was output, and update the completions.
+        @param letter: the letter; '\b' for backspace.
+        @type letter: string
+        '''
+        if letter == '\b':
+            self.wordSoFar = self.wordSoFar[:-1];
+        elif letter.isalnum() or letter == "'":
+            self.wordSoFar += letter;
+        else:
+            # The word was finished without a completion:
+            if len(self.wordSoFar) > 0:
+                self.wordCollection.noteWordUsed(self.wordSoFar);
+            self.wordSoFar = '';
+        self.completions = self.lookup();
+    
+    def accept(self, completionIndex):
+        '''
+        Accept one of the current completions. 
+        @param completionIndex: index into the current completions
+        @type completionIndex: int
+        @return: None if there is no such completion. Else the number of 
+                 backspaces to type, and the text to type after them, which
+                 ends with a space.
+        @rtype: (int, string)
+        '''
+        if completionIndex >= len(self.completions):
+            return None;
+        (completion, kind) = self.completions[completionIndex];
+        wordSoFar = self.wordSoFar;
+        # Expansions replace the abbreviation. Capitalized dictionary
+        # entries, such as names, replace the lower case letters keyed:
+        if kind == CompletionKind.ABBREVIATION or\
+           (completion != completion.lower() and not completion.startswith(wordSoFar)):
+            keystrokes = (len(wordSoFar), completion + ' ');
+        else:
+            keystrokes = (0, completion[len(wordSoFar):] + ' ');
+        self.wordCollection.noteWordUsed(completion);
+        self.wordSoFar = '';
+        self.completions = [];
+        return keystrokes;
+    
+    def completionsText(self):
+        '''
+        Return the current completions, numbered
+        by the prosign that accepts them.
+        '''
+        return '  '.join(["%d: %s" % (position, completion) 
+                          for (position, (completion, _)) in enumerate(self.completions, 1)]);
+    
+    # ---- Private ----
+    
+    def lookup(self):
+        if len(self.wordSoFar) < CompletionSession.MIN_PREFIX_LENGTH:
+            return [];
+        completions = [];
+        for (completion, kind) in self.wordCollection.tagged_prefix_search(self.wordSoFar, cutoffRank=self.numCompletions + 1):
+            # Skip the word itself, which leaves nothing to complete:
+            if kind == CompletionKind.WORD and len(completion) <= len(self.wordSoFar):
+                continue;
+            completions.append((completion, kind));
+        return completions[:self.numCompletions];
@@ -0,0 +1,560 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+# The Qt-free core of Morse input: it takes in the dots and dashes of
+# each button dwell, ends letters and words after the dwell times, and
+# decodes the letters. MorseCore does not time dots and dashes, and plays
+# no tones; MorseGenerator adds both on top of it.
+#
+# All timing goes through a clock, which tells the time and creates the
+# timers that end letters and words:
+#
+#    QtClock       timers are WatchdogTimers, which need a running Qt event loop.
+#    AsyncioClock  timers run on an asyncio event loop. Python 3 only.
+#    VirtualClock  time only passes when advanceTo() is called, and timers
+#                  fire on the way. For replays and tests, which then run
+#                  as fast as the events can be processed.
+#
+# Timers of all clocks behave like WatchdogTimer: kick() restarts the timer,
+# and a callback argument passed to kick() sticks for later kicks.
+
+import threading;
+from morseDecodeTree import MorseDecodeTree;
+from morseTiming import monotonicTime;
+
+class Morse:
+    DOT  = 0;
+    DASH = 1;
+
+class TimeoutReason:
+    END_OF_LETTER = 0
+    END_OF_WORD   = 1
+    BAD_MORSE_INPUT = 2
+
+# ---------------------------------- Clocks -----------------------
+
+class QtClock(object):
+    '''
+    Monotonic time, with WatchdogTimers for timers.
+    '''
+    
+    def now(self):
+        return monotonicTime();
+    
+    def createTimer(self, callback):
+        # Imported here, so that Qt is needed only by this clock:
+        from watchdogTimer import WatchdogTimer;
+        return WatchdogTimer(callback=callback);
+
+class AsyncioClock(object):
+    '''
+    Time and timers of an asyncio event loop. Timers must be
+    kicked and stopped from the thread that runs the loop.
+    '''
+    
+    def __init__(self, loop=None):
+        '''
+        @param loop: event loop to run the timers on. If None, the current event loop is used.
+        @type loop: asyncio.AbstractEventLoop
+        @raise ImportError: if asyncio is not available.
+        '''
+        # Imported here, so that the other clocks work without asyncio:
+        import asyncio;
+        self.loop = loop if loop is not None else asyncio.get_event_loop();
+    
+    def now(self):
+        return self.loop.time();
+    
+    def createTimer(self, callback):
+        return AsyncioClock.AsyncioTimer(self.loop, callback);
+    
+    class AsyncioTimer(object):
+        
+        def __init__(self, loop, callback):
+            self.loop = loop;
+            self.callback = callback;
+            self.callbackArg = None;
+            self.handle = None;
+        
+        def kick(self, _timeout, callbackArg=None):
+            '''
+            (Re)-start the timer. Parameters are named as for WatchdogTimer.kick().
+            @param _timeout: seconds until the callback is invoked
+            @type _timeout: float
+            @param callbackArg: argument to pass to the callback. Sticks for later kicks.
+            @type callbackArg: any
+            '''
+            if callbackArg is not None:
+                self.callbackArg = callbackArg;
+            self.stop();
+            self.handle = self.loop.call_later(_timeout, self.expired);
+        
+        def stop(self):
+            if self.handle is not None:
+                self.handle.cancel();
+                self.handle = None;
+        
+        def expired(self):
+            self.handle = None;
+            if self.callbackArg is None:
+                self.callback();
+            else:
+                self.callback(self.callbackArg);
+
+class VirtualClock(object):
+    '''
+    Time that passes only when advanceTo() or advanceBy() is called.
+    Timers expire in the order of their expiration times, and among 
+    timers that expire at the same time, in the order they were created.
+    '''
+    
+    def __init__(self, startTime=0.0):
+        self.currentTime = startTime;
+        self.timers = [];
+    
+    def now(self):
+        return self.currentTime;
+    
+    def createTimer(self, callback):
+        timer = VirtualClock.VirtualTimer(self, callback);
+        self.timers.append(timer);
+        return timer;
+    
+    def nextExpiration(self):
+        '''
+        Return the time the next running timer expires, or None
+        if no timer is running.
+        '''
+        expirations = [timer.expirationTime for timer in self.timers if timer.expirationTime is not None];
+        if len(expirations) == 0:
+            return None;
+        return min(expirations);
+    
+    def advanceTo(self, newTime):
+        '''
+        Let time pass up to newTime, and fire the timers that expire
+        on the way. Timers kicked by the callbacks fire as well, if they
+        expire by newTime. Time never runs backwards.
+        @param newTime: time to advance to
+        @type newTime: float
+        '''
+        while True:
+            expirationTime = self.nextExpiration();
+            if expirationTime is None or expirationTime > newTime:
+                break;
+            self.currentTime = max(self.currentTime, expirationTime);
+            for timer in self.timers:
+                if timer.expirationTime == expirationTime:
+                    timer.expired();
+                    break;
+        self.currentTime = max(self.currentTime, newTime);
+    
+    def advanceBy(self, secs):
+        self.advanceTo(self.currentTime + secs);
+    
+    def runUntilIdle(self):
+        '''
+        Fire timers until none is running. Timers that keep kicking
+        themselves make this method loop forever.
+        '''
+        while True:
+            expirationTime = self.nextExpiration();
+            if expirationTime is None:
+                return;
+            self.advanceTo(expirationTime);
+    
+    class VirtualTimer(object):
+        
+        def __init__(self, clock, callback):
+            self.clock = clock;
+            self.callback = callback;
+            self.callbackArg = None;
+            self.expirationTime = None;
+        
+        def kick(self, _timeout, callbackArg=None):
+            '''
+            (Re)-start the timer. Parameters are named as for WatchdogTimer.kick().
+            @param _timeout: seconds until the callback is invoked
+            @type _timeout: float
+            @param callbackArg: argument to pass to the callback. Sticks for later kicks.
+            @type callbackArg: any
+            '''
+            if callbackArg is not None:
+                self.callbackArg = callbackArg;
+            self.expirationTime = self.clock.now() + _timeout;
+        
+        def stop(self):
+            self.expirationTime = None;
+        
+        def expired(self):
+            self.expirationTime = None;
+            if self.callbackArg is None:
+                self.callback();
+            else:
+                self.callback(self.callbackArg);
+
+# ---------------------------------- MorseCore -----------------------
+
+class MorseCore(object):
+    '''
+    Turns sequences of dots and dashes into letters and word ends. 
+    Whoever times the dots and dashes reports each sequence through 
+    sequenceStarted(), sequenceStopped(), and addMorseElements().
+    '''
+    
+    def __init__(self, clock, callback=None, candidatesCallback=None, morseCodeKey=None):
+        '''
+        @param clock: time and timers for the letter and word ends
+        @type clock: QtClock, AsyncioClock, or VirtualClock
+        @param callback: callable to invoke with a TimeoutReason and detail
+                         string when a letter or word ends.
+        @type callback: Python callable
+        @param candidatesCallback: if provided, called with the dots and dashes of the 
+                         current letter so far, and the tuple of letters they may 
+                         still become, each time dots or dashes were added.
+        @type candidatesCallback: Python callable
+        @param morseCodeKey: map from Morse codes to the letters they are decoded
+                         into. If None, morseCodeTranslationKey.codeKey is used.
+        @type morseCodeKey: {string : string}
+        '''
+        super(MorseCore, self).__init__();
+        self.clock = clock;
+        self.callback = callback;
+        self.candidatesCallback = candidatesCallback;
+        
+        # Dwell segmentation is off until the delays are set:
+        self.interLetterTime = -1;
+        self.interWordTime = -1;
+        # Time to wait for the dots and dashes of a stopped sequence
+        # when the end-of-letter timeout finds none:
+        self.sequenceWaitTime = 0.5;
+        
+        # morseResult will accumulate the dots and dashes:
+        self.morseResult = '';
+        self.alphaStr = '';
+        # Decode tree node reached by morseResult:
+        self.decodeTree = MorseDecodeTree(morseCodeKey);
+        self.decodeNode = self.decodeTree.root;
+        # True after a sequence that cannot become a letter was
+        # rejected, until the next dot or dash. The pending end-of-letter
+        # timeout then has nothing to wait for:
+        self.badInputRejected = False;
+        self.watchdog = clock.createTimer(self.watchdogExpired);
+        
+        # Learns the dwell times from the user's pauses, if set.
+        # See setAdaptiveSegmenter():
+        self.adaptiveSegmenter = None;
+        # When the most recent dot/dash sequence was stopped:
+        self.seqStopTime = None;
+        # Logs the elements and letters for replay, if set.
+        # See setSessionRecorder():
+        self.sessionRecorder = None;
+        
+        # Lock for regulating write-access to alpha string:
+        self.alphaStrLock = threading.Lock();
+        # Lock for regulating write-access to morse elements,
+        # which may be delivered from another thread:
+        self.morseResultLock = threading.Lock();
+
+    # ------------------------------ Public Methods ---------------------
+    
+    def sequenceStarted(self):
+        '''
+        A sequence of dots or dashes started. The letter cannot 
+        end before the sequence is stopped.
+        '''
+        self.watchdog.stop();
+        if self.adaptiveSegmenter is not None and self.seqStopTime is not None:
+            self.adaptiveSegmenter.noteGap(self.clock.now() - self.seqStopTime);
+        self.seqStopTime = None;
+    
+    def sequenceStopped(self):
+        '''
+        A sequence of dots or dashes stopped. Its elements may be
+        delivered later through addMorseElements().
+        '''
+        self.seqStopTime = self.clock.now();
+        # If there will now be a pause long enough
+        # to indicate the end of a letter, this
+        # watchdog will go off:
+        if self.interLetterTime > 0:
+            self.watchdog.kick(_timeout=self.getEffectiveInterLetterTime(), callbackArg=TimeoutReason.END_OF_LETTER);
+    
+    def addMorseElements(self, dotsOrDashes, numElements):
+        '''
+        Add the dots or dashes of one sequence to the current letter.
+        @param dotsOrDashes: which element the sequence consisted of
+        @type dotsOrDashes: Morse
+        @param numElements: number of dots or dashes
+        @type numElements: int
+        '''
+        if self.sessionRecorder is not None:
+            self.sessionRecorder.recordElements(('-' if dotsOrDashes == Morse.DASH else '.') * numElements);
+        if dotsOrDashes == Morse.DASH:
+            decodeNode = self.appendMorseResult('-'*numElements); 
+        else: # dots:
+            # Catch abort-letter:
+            if numElements > 7:
+                self.abortCurrentMorseElement();
+                return;
+            decodeNode = self.appendMorseResult('.'*numElements);
+        if decodeNode is None:
+            # No letter starts with these elements. Reject them
+            # now, rather than at the end-of-letter timeout:
+            badMorseResult = self.morseResult;
+            self.badInputRejected = True;
+            self.setMorseResult('');
+            if self.sessionRecorder is not None:
+                self.sessionRecorder.recordSegment(TimeoutReason.BAD_MORSE_INPUT, detail=badMorseResult);
+            if self.callback is not None:
+                self.callback(TimeoutReason.BAD_MORSE_INPUT, badMorseResult);
+            return;
+        self.badInputRejected = False;
+        if self.candidatesCallback is not None:
+            self.candidatesCallback(self.morseResult, decodeNode.candidates);
+    
+    def abortCurrentMorseElement(self):
+        '''
+        Discard the dots and dashes of the current letter.
+        '''
+        self.watchdog.stop();
+        self.setMorseResult('');
+    
+    def watchdogExpired(self, reason):
+        '''
+        End the current letter or word. Called when a dwell time 
+        expires, and by clients that end letters and words by other
+        means, such as mouse clicks.
+        @param reason: whether a letter or a word ended
+        @type reason: TimeoutReason
+        '''
+        detail = '';
+        newLetter = None;
+        if reason == TimeoutReason.END_OF_LETTER:
+            # If no Morse elements are in self.morseResult,
+            # it could be because the dots and dashes of the
+            # stopped sequence are not delivered yet. In that case,
+            # set the timer again to give them time:
+            if len(self.morseResult) == 0:
+                if self.badInputRejected:
+                    # Already reported by addMorseElements():
+                    self.badInputRejected = False;
+                    return;
+                self.watchdog.kick(_timeout=self.sequenceWaitTime);
+                return;
+            newLetter = self.decodeMorseLetter();
+            # If Morse sequence was legal and recognized,
+            # append it:
+            if newLetter is not None:
+                self.setAlphaStr(self.alphaStr + newLetter);
+            else:
+                reason = TimeoutReason.BAD_MORSE_INPUT;
+                detail = self.morseResult;
+            # One way or other, a letter has ended. Start the
+            # timeout for a word-separation sized pause:
+            if self.interWordTime > 0:
+                self.watchdog.kick(_timeout=self.getEffectiveInterWordTime(), callbackArg=TimeoutReason.END_OF_WORD);
+        elif reason == TimeoutReason.END_OF_WORD:
+            # Decided to have the client decide what to do when a word ends.
+            # The commented code would add a space:
+            #self.setAlphaStr(self.alphaStr + ' ');
+            pass;
+        if self.sessionRecorder is not None:
+            self.sessionRecorder.recordSegment(reason, newLetter, detail);
+        self.setMorseResult('');
+        if self.callback is not None:
+            self.callback(reason, detail);
+    
+    def getAndRemoveAlphaStr(self):
+        res = self.alphaStr;
+        self.setAlphaStr('');
+        return res;
+
+    def setAlphaStr(self, newAlphaStr):
+        with self.alphaStrLock:
+            self.alphaStr = newAlphaStr
+
+    def setMorseResult(self, newMorseResult):
+        with self.morseResultLock:
+            self.morseResult = newMorseResult;
+            self.decodeNode = self.decodeTree.descend(newMorseResult);
+    
+    def appendMorseResult(self, morseElements):
+        '''
+        Add dots and dashes to the current letter, and advance
+        the decode tree by each of them.
+        @param morseElements: dots and dashes
+        @type morseElements: string
+        @return: the decode tree node reached, or None if the
+                 current letter can no longer be decoded.
+        @rtype: MorseDecodeNode
+        '''
+        with self.morseResultLock:
+            self.morseResult += morseElements;
+            for element in morseElements:
+                if self.decodeNode is None:
+                    break;
+                self.decodeNode = self.decodeTree.advance(self.decodeNode, element);
+            return self.decodeNode;
+    
+    def inMidLetter(self):
+        '''
+        Return True if user has morsed any dots or dashes
+        since the last letter or word segmentation
+        '''
+        return len(self.morseResult) > 0;
+    
+    def setInterLetterDelay(self, secs):
+        '''
+        Sets the time that must elapse between two letters.
+        If negative, no letter segmentation is performed.
+        @param secs: fractional seconds
+        @type secs: float
+        '''
+        self.interLetterTime = secs;
+        
+    def setInterWordDelay(self, secs):
+        '''
+        Sets the time that must elapse between two words.
+        If negative, no word segmentation is performed.
+        @param secs: fractional seconds
+        @type secs: float
+        '''
+        self.interWordTime = secs;
+    
+    def setSequenceWaitTime(self, secs):
+        '''
+        Sets how long an end-of-letter timeout that finds no dots 
+        or dashes waits for those of the stopped sequence.
+        @param secs: fractional seconds
+        @type secs: float
+        '''
+        self.sequenceWaitTime = secs;
+    
+    def getInterLetterTime(self):
+        '''
+        Return the minimum amount of silence time required
+        for the system to conclude that the Morse code equivalent
+        of a letter has been generated. I.e.: end-of-letter pause.
+        '''
+        return self.interLetterTime;
+    
+    def getInterWordTime(self):
+        '''
+        Return the minimum amount of silence time required
+        for the system to conclude that a word has ended.
+        I.e.: end-of-word pause.
+        '''
+        return self.interWordTime;
+    
+    def setAdaptiveSegmenter(self, adaptiveSegmenter):
+        '''
+        Let the end-of-letter and end-of-word dwell times adapt
+        to the user's pauses. The times set through setInterLetterDelay()
+        and setInterWordDelay() are used until the segmenter is confident,
+        and dwell segmentation that is turned off stays off.
+        @param adaptiveSegmenter: segmenter to learn the pauses, or None to stop adapting.
+        @type adaptiveSegmenter: adaptiveSegmenter.AdaptiveSegmenter
+        '''
+        self.adaptiveSegmenter = adaptiveSegmenter;
+    
+    def getSegmentationConfidence(self):
+        '''
+        Return the confidence of the adaptive segmenter between 0.0 and 1.0,
+        or None if dwell times are not adapted.
+        '''
+        if self.adaptiveSegmenter is None:
+            return None;
+        return self.adaptiveSegmenter.confidence();
+    
+    def getEffectiveInterLetterTime(self):
+        '''
+        Return the end-of-letter pause in use: the adapted one if 
+        an adaptive segmenter is set, else getInterLetterTime().
+        '''
+        if self.adaptiveSegmenter is None or self.interLetterTime <= 0:
+            return self.interLetterTime;
+        return self.adaptiveSegmenter.letterDelay(self.interLetterTime);
+    
+    def getEffectiveInterWordTime(self):
+        '''
+        Return the end-of-word pause in use: the adapted one if 
+        an adaptive segmenter is set, else getInterWordTime().
+        '''
+        if self.adaptiveSegmenter is None or self.interWordTime <= 0 or self.interLetterTime <= 0:
+            return self.interWordTime;
+        return self.adaptiveSegmenter.wordDelay(self.interLetterTime, self.interWordTime);
+    
+    def setMorseCodeKey(self, morseCodeKey):
+        '''
+        Decode with a different code key from now on. Dots and dashes
+        of a letter in progress are decoded with the new key.
+        @param morseCodeKey: map from Morse codes to the letters they are decoded
+                         into. If None, morseCodeTranslationKey.codeKey is used.
+        @type morseCodeKey: {string : string}
+        '''
+        self.decodeTree = MorseDecodeTree(morseCodeKey);
+        self.decodeNode = self.decodeTree.descend(self.morseResult);
+    
+    def getMorseCodeKey(self):
+        '''
+        Return the map from Morse codes to letters in use.
+        '''
+        return self.decodeTree.morseCodeKey;
+    
+    def setSessionRecorder(self, sessionRecorder):
+        '''
+        Log the dots and dashes added to letters, and the letter and
+        word ends, so that replays of the session can be checked against them.
+        @param sessionRecorder: recorder of the session, or None to stop recording.
+        @type sessionRecorder: morseSessionLog.SessionRecorder
+        '''
+        self.sessionRecorder = sessionRecorder;
+    
+    def decodeMorseLetter(self):
+        '''
+        Return the letter of the current dots and dashes, or None
+        if they are not the code of a letter. 
+        '''
+        decodeNode = self.decodeNode;
+        if decodeNode is None or decodeNode.letter is None:
+            return None
+        letter = decodeNode.letter;
+        if letter == 'BS':
+            letter = '\b';
+        elif letter == 'NL':
+            letter = '\r';
+        elif letter == 'HS':
+            letter = ' ';
+        return letter;
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+# Binary tree for decoding Morse letters element by element. 
+# Dots lead to the left child, dashes to the right child. A node 
+# carries the letter whose code ends there, if any, and the letters 
+# still reachable from it. Decoding thus knows after each element
+# which letters remain possible, and notices at once when a sequence
+# cannot be completed to any letter.
+
+from morseCodeTranslationKey import codeKey;
+
+DOT_CHAR  = '.';
+DASH_CHAR = '-';
+
+class MorseDecodeNode(object):
+    
+    def __init__(self):
+        # Letter whose code ends at this node, or None:
+        self.letter = None;
+        self.dot  = None;
+        self.dash = None;
+        # Letters whose codes start with this node's code. Shortest
+        # codes first, so the most likely intended letters lead:
+        self.candidates = ();
+
+class MorseDecodeTree(object):
+    '''
+    Decode tree compiled from a code key that maps dot/dash strings,
+    such as '.-', to letters. Use root, advance(), and descend().
+    '''
+    
+    def __init__(self, morseCodeKey=None):
+        '''
+        @param morseCodeKey: map from Morse codes to letters. If None, 
+                             morseCodeTranslationKey.codeKey is used.
+        @type morseCodeKey: {string : string}
+        @raise ValueError: if a code contains characters other than dots and dashes.
+        '''
+        if morseCodeKey is None:
+            morseCodeKey = codeKey;
+        self.morseCodeKey = morseCodeKey;
+        self.root = MorseDecodeNode();
+        for (code, letter) in morseCodeKey.items():
+            node = self.root;
+            for element in code:
+                if element == DOT_CHAR:
+                    if node.dot is None:
+                        node.dot = MorseDecodeNode();
+                    node = node.dot;
+                elif element == DASH_CHAR:
+                    if node.dash is None:
+                        node.dash = MorseDecodeNode();
+                    node = node.dash;
+                else:
+                    raise ValueError("Morse code '%s' contains '%s', which is neither dot nor dash." % (code, element));
+            node.letter = letter;
+        self.collectCandidates(self.root, '');
+    
+    def advance(self, node, element):
+        '''
+        Return the node reached from node by one more element,
+        or None if no letter's code continues that way.
+        @param node: current node
+        @type node: MorseDecodeNode
+        @param element: DOT_CHAR or DASH_CHAR
+        @type element: string
+        @rtype: MorseDecodeNode
+        '''
+        if element == DOT_CHAR:
+            return node.dot;
+        elif element == DASH_CHAR:
+            return node.dash;
+        return None;
+    
+    def descend(self, morseStr):
+        '''
+        Return the node of the given dot/dash string, or None if
+        it does not start the code of any letter.
+        @param morseStr: dots and dashes
+        @type morseStr: string
+        @rtype: MorseDecodeNode
+        '''
+        node = self.root;
+        for element in morseStr:
+            node = self.advance(node, element);
+            if node is None:
+                return None;
+        return node;
+    
+    def decode(self, morseStr):
+        '''
+        Return the letter of the given dot/dash string, or None.
+        @param morseStr: dots and dashes
+        @type morseStr: string
+        '''
+        node = self.descend(morseStr);
+        if node is None:
+            return None;
+        return node.letter;
+    
+    # ---- Private ----
+    
+    def collectCandidates(self, node, code):
+        '''
+        Set the candidates of node and all its descendants. Returns
+        (code, letter) pairs of the subtree.
+        '''
+        codesAndLetters = [];
+        if node.letter is not None:
+            codesAndLetters.append((code, node.letter));
+        if node.dot is not None:
+            codesAndLetters.extend(self.collectCandidates(node.dot, code + DOT_CHAR));
+        if node.dash is not None:
+            codesAndLetters.extend(self.collectCandidates(node.dash, code + DASH_CHAR));
+        codesAndLetters.sort(key=lambda codeAndLetter: (len(codeAndLetter[0]), codeAndLetter[0]));
+        node.candidates = tuple([letter for (_, letter) in codesAndLetters]);
+        return codesAndLetters;
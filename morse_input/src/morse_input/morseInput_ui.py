@@ -64,6 +64,7 @@ import sys
 import os
 import re
 import fcntl
+import time
 import ConfigParser
 from functools import partial
 
@@ -86,8 +87,12 @@ except ImportError as e:
 from morseToneGeneration import MorseGenerator
 from morseToneGeneration import Morse
 from morseToneGeneration import TimeoutReason
+from adaptiveSegmenter import AdaptiveSegmenter
 
 from morseCheatSheet import MorseCheatSheet;
+from morseCodeTranslationKey import codeKey, completionProsignKey, ACCEPT_COMPLETION_CHARS;
+from morseCompletion import CompletionSession;
+from morseSessionLog import SessionRecorder, SessionButton;
 
 from morseSpeedTimer import MorseSpeedTimer;
 
@@ -95,7 +100,12 @@ from morseSpeedTimer import MorseSpeedTimer;
 from python_qt_binding import loadUi;
 from python_qt_binding import QtGui;
 from python_qt_binding import QtCore;
-#from word_completion.word_collection import WordCollection;
+
+try:
+    from word_completion.word_collection import WordCollection;
+    WORD_COMPLETION_AVAILABLE = True;
+except ImportError:
+    WORD_COMPLETION_AVAILABLE = False;
 from QtGui import QApplication, QMainWindow, QMessageBox, QWidget, QCursor, QHoverEvent, QColor, QIcon;
 from QtGui import QMenuBar, QToolTip, QLabel, QPixmap, QRegExpValidator;
 from QtCore import QPoint, Qt, QTimer, QEvent, Signal, QCoreApplication, QRect, QRegExp; 
@@ -122,6 +132,7 @@ class PanelExpansion:
     
 class MorseInputSignals(CommChannel):
     letterDone = Signal(int,str);
+    candidatesChanged = Signal(str,str); # Dots/dashes so far, and the letters they may still become.
     panelCollapsed = Signal(int); # Morse panel was collapsed. Make main win shorter.
 
 class MorseInput(QMainWindow):
@@ -193,8 +204,16 @@ class MorseInput(QMainWindow):
         self.dialogService = DialogService();
 
         # Get a morse generator that manages all Morse 
-        # generation and timing:
-        self.morseGenerator = MorseGenerator(callback=MorseInput.letterCompleteNotification);
+        # generation and timing. Its code key is set 
+        # in setOptions(), depending on word completion:
+        self.morseGenerator = MorseGenerator(callback=MorseInput.letterCompleteNotification,
+                                             candidatesCallback=MorseInput.candidatesNotification);
+        # Word completion of the letters as they are output. Set
+        # up in setOptions(), if word_completion is available:
+        self.completionSession = None;
+        # Log of button and mouse events for replay. Set up
+        # in setOptions(), if sessions are recorded:
+        self.sessionRecorder = None;
         
         # Get virtual keyboard that can 'fake' X11 keyboard inputs:
         self.virtKeyboard = VirtualKeyboard();
@@ -203,6 +222,7 @@ class MorseInput(QMainWindow):
         # of morseGenerator, so that we can obtain the generator's
         # defaults for timings:
         self.optionsFilePath = os.path.join(os.getenv('HOME'), '.morser/morser.cfg');
+        self.sessionLogDir = os.path.join(os.getenv('HOME'), '.morser/sessions');
         self.setOptions();
 
         # Create the gesture buttons for dot/dash/space/backspace:
@@ -428,6 +448,7 @@ class MorseInput(QMainWindow):
         CommChannel.getSignal('GestureSignals.buttonEnteredSig').connect(self.buttonEntered);
         CommChannel.getSignal('GestureSignals.buttonExitedSig').connect(self.buttonExited);
         CommChannel.getSignal('MorseInputSignals.letterDone').connect(self.deliverInput);
+        CommChannel.getSignal('MorseInputSignals.candidatesChanged').connect(self.showCandidates);
         CommChannel.getSignal('MorseInputSignals.panelCollapsed').connect(self.adjustMainWindowHeight);
 
         # Main window:
@@ -544,6 +565,8 @@ class MorseInput(QMainWindow):
                     'outputDevice'             : str(OutputType.TYPE),
                     'letterDwellSegmentation'  : str(True),
                     'wordDwellSegmentation'    : str(True),
+                    'adaptiveSegmentation'     : str(False),
+                    'recordSessions'           : str(False),
                     'constrainCursorInHotZone' : str(False),
                     'keySpeed'                 : str(1.7),
                     'cursorDeceleration'       : str(0.5),
@@ -551,6 +574,7 @@ class MorseInput(QMainWindow):
                     'interWordDwellDelay'      : str(self.morseGenerator.getInterWordTime()),
                     'winGeometry'              : '100,100,350,350',
                     'useTickerTape'            : str(True),
+                    'wordCompletion'           : str(True),
                     'morePanelExpanded'        : str(True),
                     }
 
@@ -579,9 +603,27 @@ class MorseInput(QMainWindow):
         self.outputDevice = self.cfgParser.getint('Output', 'outputDevice');
         self.letterDwellSegmentation = self.cfgParser.getboolean('Morse generation', 'letterDwellSegmentation');
         self.letterDwellSegmentation = self.cfgParser.getboolean('Morse generation', 'wordDwellSegmentation');
+        # Learn the dwell times from the user's pauses, starting
+        # from the configured ones:
+        if self.cfgParser.getboolean('Morse generation', 'adaptiveSegmentation'):
+            self.morseGenerator.setAdaptiveSegmenter(AdaptiveSegmenter());
+        else:
+            self.morseGenerator.setAdaptiveSegmenter(None);
 
         self.useTickerTape = self.cfgParser.getboolean('Output', 'useTickerTape');
         
+        if WORD_COMPLETION_AVAILABLE and self.cfgParser.getboolean('Output', 'wordCompletion'):
+            if self.completionSession is None:
+                self.completionSession = CompletionSession(WordCollection());
+            # The prosigns that accept word completions are decoded
+            # like letters:
+            morseCodeKey = dict(codeKey);
+            morseCodeKey.update(completionProsignKey);
+            self.morseGenerator.setMorseCodeKey(morseCodeKey);
+        else:
+            self.completionSession = None;
+            self.morseGenerator.setMorseCodeKey(codeKey);
+        
         self.panelExpanded = self.cfgParser.getboolean('Appearance', 'morePanelExpanded');
         if self.panelExpanded:
             self.expandMorePanel(PanelExpansion.MORE);
@@ -591,6 +633,62 @@ class MorseInput(QMainWindow):
         # Make the options dialog reflect the options we just established:
         # Path to Morser options file:
         self.initOptionsDialogFromOptions();
+        
+        if self.cfgParser.getboolean('Morse generation', 'recordSessions'):
+            if self.sessionRecorder is None:
+                self.startSessionRecording();
+            self.recordSessionOptions();
+        elif self.sessionRecorder is not None:
+            self.stopSessionRecording();
+
+    def startSessionRecording(self):
+        '''
+        Start logging the button and mouse events of this session 
+        to a new file in the session log directory. See morseReplay
+        for replaying the log.
+        '''
+        logPath = os.path.join(self.sessionLogDir, 'session-%s.jsonl' % time.strftime('%Y%m%d-%H%M%S'));
+        try:
+            if not os.path.isdir(self.sessionLogDir):
+                os.makedirs(self.sessionLogDir, 0777);
+            self.sessionRecorder = SessionRecorder(logPath, self.morseGenerator.getMorseCodeKey());
+        except (IOError, OSError) as e:
+            self.dialogService.showErrorMsg("Could not record session: %s" % `e`);
+            return;
+        self.morseGenerator.setSessionRecorder(self.sessionRecorder);
+    
+    def stopSessionRecording(self):
+        self.morseGenerator.setSessionRecorder(None);
+        self.sessionRecorder.close();
+        self.sessionRecorder = None;
+
+    def recordSessionOptions(self):
+        '''
+        Log the settings in force, if the session is recorded. Called 
+        whenever options that affect Morse generation may have changed.
+        '''
+        if self.sessionRecorder is None:
+            return;
+        options = self.morseGenerator.getSettings();
+        options['clickSegmentation'] = self.mouseClicksForSegmentation();
+        # The completion prosigns are decoded only while
+        # word completion is on:
+        options['codeKey'] = self.morseGenerator.getMorseCodeKey();
+        self.sessionRecorder.recordOptions(options);
+    
+    def sessionButtonName(self, buttonObj):
+        '''
+        Return the name under which a button's events are recorded.
+        '''
+        if buttonObj == self.dotButton:
+            return SessionButton.DOT;
+        elif buttonObj == self.dashButton:
+            return SessionButton.DASH;
+        elif buttonObj == self.eowButton:
+            return SessionButton.EOW;
+        elif buttonObj == self.backspaceButton:
+            return SessionButton.BACKSPACE;
+        return None;
 
     def initOptionsDialogFromOptions(self):
 
@@ -711,6 +809,7 @@ class MorseInput(QMainWindow):
             #**************
         else:
             raise ValueError('Unknown checkbox: %s' % str(checkbox));
+        self.recordSessionOptions();
 
 
     def sliderStateChanged(self, slider, newValue):
@@ -741,6 +840,7 @@ class MorseInput(QMainWindow):
             valInSecs = newValue/1000.;
             self.cfgParser.set('Morse generation', 'interWordDwellDelay', str(valInSecs));
             self.morseGenerator.setInterWordDelay(valInSecs);
+        self.recordSessionOptions();
         
     def setCursorDeceleration(self, newValue):
         '''
@@ -775,6 +875,8 @@ class MorseInput(QMainWindow):
         self.initOptionsDialogFromOptions();
         
     def buttonEntered(self, buttonObj):
+        if self.sessionRecorder is not None:
+            self.sessionRecorder.recordButtonEnter(self.sessionButtonName(buttonObj));
         if not self.poweredUp:
             return;
         if buttonObj == self.dotButton:
@@ -786,9 +888,14 @@ class MorseInput(QMainWindow):
             self.outputLetters(' ');
         elif buttonObj == self.backspaceButton:
             buttonObj.animateClick();
+            if self.completionSession is not None:
+                self.completionSession.noteLetter('\b');
             self.outputBackspace();
+            self.showCompletions();
         
     def buttonExited(self, buttonObj):
+        if self.sessionRecorder is not None:
+            self.sessionRecorder.recordButtonExit(self.sessionButtonName(buttonObj));
         if buttonObj == self.dotButton:
             self.morseGenerator.stopMorseSeq();
         elif buttonObj == self.dashButton:
@@ -861,6 +968,8 @@ class MorseInput(QMainWindow):
         self.virtKeyboard.activateWindow('keyboardTarget');
         
         inRestZone = self.cursorInRestZone(mouseEvent.pos());
+        if self.sessionRecorder is not None:
+            self.sessionRecorder.recordMousePress(inRestZone);
         if inRestZone:
             self.mousePressedInRestZone = True;
         else:
@@ -893,6 +1002,8 @@ class MorseInput(QMainWindow):
             return;
         
         inRestZone = self.cursorInRestZone(mouseEvent.pos()); 
+        if self.sessionRecorder is not None:
+            self.sessionRecorder.recordMouseRelease(inRestZone);
 
         # If inter letter/word segmentation is set to 
         # mouse control in Options AND cursor is in rest area,
@@ -1079,6 +1190,65 @@ class MorseInput(QMainWindow):
         '''
         MorseInputSignals.getSignal('MorseInputSignals.letterDone').emit(reason, details);
 
+    @staticmethod
+    def candidatesNotification(morseSoFar, candidates):
+        '''
+        Called from MorseGenerator after dots or dashes were added
+        to the current letter. Sends a signal and returns right away.
+        @param morseSoFar: dots and dashes of the current letter so far
+        @type morseSoFar: string
+        @param candidates: letters that the current letter may still become, likeliest first.
+        @type candidates: (string)
+        '''
+        # The prosigns that accept completions are shown by
+        # the number of the completion they accept:
+        candidateLabels = [];
+        for candidate in candidates:
+            if candidate in ACCEPT_COMPLETION_CHARS:
+                candidateLabels.append('%d:' % (ACCEPT_COMPLETION_CHARS.index(candidate) + 1));
+            else:
+                candidateLabels.append(candidate);
+        MorseInputSignals.getSignal('MorseInputSignals.candidatesChanged').emit(morseSoFar, ' '.join(candidateLabels));
+
+    @QtCore.Slot(str,str)
+    def showCandidates(self, morseSoFar, candidates):
+        if self.completionSession is not None and len(self.completionSession.completions) > 0:
+            self.statusBar.showMessage("%s   %s   | %s" % (morseSoFar, candidates, self.completionSession.completionsText()));
+        else:
+            self.statusBar.showMessage("%s   %s" % (morseSoFar, candidates));
+    
+    def showCompletions(self):
+        '''
+        Show the current word completions in the status bar,
+        numbered by the prosign that accepts them.
+        '''
+        if self.completionSession is None:
+            return;
+        completionsText = self.completionSession.completionsText();
+        if len(completionsText) > 0:
+            self.statusBar.showMessage(completionsText);
+        else:
+            self.statusBar.clearMessage();
+    
+    def acceptCompletion(self, completionIndex):
+        '''
+        Finish the current word with one of the offered completions.
+        The remainder of the word is typed in one batch.
+        @param completionIndex: position of the completion among those offered, starting at 0.
+        @type completionIndex: int
+        '''
+        if self.completionSession is None:
+            return;
+        keystrokes = self.completionSession.accept(completionIndex);
+        if keystrokes is None:
+            self.statusBar.showMessage("No completion %d to accept" % (completionIndex + 1), 4000); # milliseconds
+            return;
+        (numBackspaces, text) = keystrokes;
+        for _ in range(numBackspaces):
+            self.outputBackspace();
+        self.virtKeyboard.typeTextToActiveWindow(text);
+        self.tickerTapeAppend(text);
+
     @QtCore.Slot(int,str)
     def deliverInput(self, reason, detail):
         alpha = self.morseGenerator.getAndRemoveAlphaStr()
@@ -1088,6 +1258,8 @@ class MorseInput(QMainWindow):
             # Give very brief indication that word boundary detected:
             self.flashCrosshair(crossHairColor=Crosshairs.YELLOW);
         elif reason == TimeoutReason.END_OF_LETTER:
+            # Letter is done; remove its candidates:
+            self.statusBar.clearMessage();
             self.outputLetters(alpha);
         elif reason == TimeoutReason.BAD_MORSE_INPUT:
             self.statusBar.showMessage("Bad Morse input: '%s'" % detail, 4000); # milliseconds
@@ -1095,6 +1267,11 @@ class MorseInput(QMainWindow):
     def outputLetters(self, lettersToSend):
         if self.outputDevice == OutputType.TYPE:
             for letter in lettersToSend:
+                if letter in ACCEPT_COMPLETION_CHARS:
+                    self.acceptCompletion(ACCEPT_COMPLETION_CHARS.index(letter));
+                    continue;
+                if self.completionSession is not None:
+                    self.completionSession.noteLetter(letter);
                 # Write to the local ticker tape:
                 self.tickerTapeAppend(letter);
                 # Then write to the X11 window in focus:
@@ -1105,6 +1282,7 @@ class MorseInput(QMainWindow):
                 else:
                     #print(letter);
                     self.virtKeyboard.typeTextToActiveWindow(letter);
+            self.showCompletions();
         elif self.outputDevice == OutputType.SPEAK:
             print("Speech not yet implemented.");
 
@@ -1225,6 +1403,8 @@ class MorseInput(QMainWindow):
             self.eowButton.setEnabled(True);
             self.backspaceButton.setEnabled(True);
             self.poweredUp = True;
+        if self.sessionRecorder is not None:
+            self.sessionRecorder.recordPower(self.poweredUp);
     
     def exit(self):
         self.cleanup();
@@ -1240,6 +1420,8 @@ class MorseInput(QMainWindow):
         try:
             self.morserOptionsDialog.close();
             self.morseGenerator.stopMorseGenerator();
+            if self.sessionRecorder is not None:
+                self.sessionRecorder.close();
         except:
             # Best effort:
             pass
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+# Headless replay of Morser sessions recorded by morseSessionLog. 
+# The recorded button, mouse, and options events are fed to a MorseCore
+# on a virtual clock. Button dwells become dots and dashes as the element
+# scheduler of MorseGenerator would time them, and the core's end-of-letter
+# and end-of-word timers fire as virtual time passes. Neither Qt nor a sound
+# card is needed, and a session replays as fast as the events can be 
+# processed. A speed factor paces the replay against the wall clock instead.
+#
+# The letters that the generator decoded while the session was
+# recorded are compared with those of the replay. Replaying with
+# changed options, for instance with adaptive segmentation turned on,
+# shows how a change would have segmented and decoded a real session.
+
+import difflib;
+from morseCore import MorseCore, VirtualClock, Morse, TimeoutReason;
+from adaptiveSegmenter import AdaptiveSegmenter;
+from morseSessionLog import SessionEvent, SessionButton, readSessionLog;
+from morseTiming import monotonicTime, sleepUntil;
+
+class ReplayResult(object):
+    '''
+    What a replay produced, next to what was recorded.
+    '''
+    
+    def __init__(self):
+        # Letters and spaces in the order Morser would have typed them. 
+        # Backspace and newline are '\b' and '\r':
+        self.text = '';
+        # (time, TimeoutReason, letter or rejected Morse) of the 
+        # replay, and as recorded:
+        self.segments = [];
+        self.recordedSegments = [];
+        self.numBadInputs = 0;
+        # Seconds of session time, and of wall clock time the replay took:
+        self.sessionDuration = 0.0;
+        self.replayDuration = 0.0;
+    
+    def agreement(self):
+        '''
+        Return how closely the letter and word ends of the replay match
+        the recorded ones, between 0.0 and 1.0. Times are not compared.
+        '''
+        replayed = [segment[1:] for segment in self.segments];
+        recorded = [segment[1:] for segment in self.recordedSegments];
+        if len(replayed) == 0 and len(recorded) == 0:
+            return 1.0;
+        return difflib.SequenceMatcher(None, replayed, recorded, autojunk=False).ratio();
+    
+    def __str__(self):
+        return "Replayed %d segments (%d recorded) in %.3fs of %.1fs session time. Agreement: %.3f. Text: %s" %\
+               (len(self.segments), len(self.recordedSegments), self.replayDuration, 
+                self.sessionDuration, self.agreement(), `self.text`);
+
+class SessionReplayer(object):
+    '''
+    Feeds the input events of a recorded session to a MorseCore. One
+    replayer can replay its session several times, with different options.
+    '''
+    
+    # Input events, which are replayed. The others are compared against:
+    INPUT_EVENTS = (SessionEvent.ENTER, SessionEvent.EXIT, SessionEvent.PRESS, 
+                    SessionEvent.RELEASE, SessionEvent.POWER, SessionEvent.OPTIONS);
+    
+    def __init__(self, records, morseCodeKey=None):
+        '''
+        @param records: session records, as returned by morseSessionLog.readSessionLog()
+        @type records: [{string : any}]
+        @param morseCodeKey: map from Morse codes to letters, used throughout
+                         the replay. If None, the code keys recorded with the session 
+                         are used, or morseCodeTranslationKey.codeKey for sessions
+                         that did not record one.
+        @type morseCodeKey: {string : string}
+        '''
+        self.records = records;
+        self.morseCodeKey = morseCodeKey;
+    
+    @staticmethod
+    def fromFile(logPath, morseCodeKey=None):
+        return SessionReplayer(readSessionLog(logPath), morseCodeKey);
+    
+    def replay(self, speed=None, optionOverrides=None):
+        '''
+        Replay the session.
+        @param speed: if None, replay as fast as possible. Else the factor by
+                      which the replay is faster than the session: 1.0 replays
+                      in real time. 
+        @type speed: float
+        @param optionOverrides: settings that replace the recorded ones throughout
+                      the replay. Keys as in MorseGenerator.getSettings(), and 'clickSegmentation'.
+        @type optionOverrides: {string : any}
+        @return: the letters and segments produced
+        @rtype: ReplayResult
+        @raise ValueError: if speed is not positive.
+        '''
+        if speed is not None and speed <= 0:
+            raise ValueError("Replay speed must be positive, not %s" % str(speed));
+        self.speed = speed;
+        self.optionOverrides = optionOverrides if optionOverrides is not None else {};
+        self.resetState();
+        self.wallStartTime = monotonicTime();
+        for record in self.records:
+            event = record['ev'];
+            if event == SessionEvent.SEGMENT:
+                self.result.recordedSegments.append((record['t'], record['reason'], 
+                                                     record.get('letter', record.get('detail'))));
+            if event not in SessionReplayer.INPUT_EVENTS:
+                continue;
+            self.advanceTo(record['t']);
+            self.handleRecord(record);
+        # Let the pending sequence and timeouts run out:
+        self.advanceTo(None);
+        self.result.sessionDuration = self.clock.now();
+        self.result.replayDuration = monotonicTime() - self.wallStartTime;
+        return self.result;
+
+    # ---------------------------------- Private -----------------------
+    
+    def resetState(self):
+        self.result = ReplayResult();
+        self.clock = VirtualClock();
+        # Delivers a stopped sequence once its last element has
+        # played. Created before the core's timer, so that a sequence
+        # ending together with a timeout is delivered first:
+        self.finishTimer = self.clock.createTimer(self.finishSequence);
+        morseCodeKey = self.morseCodeKey;
+        if morseCodeKey is None:
+            morseCodeKey = self.records[0].get('codeKey');
+        self.core = MorseCore(self.clock, callback=self.segmentEnded, morseCodeKey=morseCodeKey);
+        self.settings = {};
+        self.clickSegmentation = False;
+        self.poweredUp = True;
+        self.mousePressedInRestZone = False;
+        # Running dot or dash sequence: (element, start time), or None:
+        self.sequence = None;
+        # Stopped sequence awaiting the finish timer: 
+        # (element, number of elements), or None:
+        self.finishedSequence = None;
+    
+    def advanceTo(self, eventTime):
+        '''
+        Let the virtual clock run up to eventTime. If eventTime 
+        is None, run until no timer is pending. 
+        '''
+        while True:
+            expirationTime = self.clock.nextExpiration();
+            if expirationTime is None or (eventTime is not None and expirationTime > eventTime):
+                break;
+            self.pace(expirationTime);
+            self.clock.advanceTo(expirationTime);
+        if eventTime is not None:
+            self.pace(eventTime);
+            self.clock.advanceTo(eventTime);
+    
+    def pace(self, sessionTime):
+        if self.speed is not None:
+            sleepUntil(self.wallStartTime + sessionTime / self.speed);
+    
+    def handleRecord(self, record):
+        event = record['ev'];
+        if event == SessionEvent.OPTIONS:
+            self.setOptions(record['options']);
+        elif event == SessionEvent.POWER:
+            self.poweredUp = record['on'];
+        elif event == SessionEvent.ENTER:
+            if not self.poweredUp:
+                return;
+            if record['button'] == SessionButton.DOT:
+                self.startMorseSeq(Morse.DOT);
+            elif record['button'] == SessionButton.DASH:
+                self.startMorseSeq(Morse.DASH);
+            elif record['button'] == SessionButton.EOW:
+                self.result.text += ' ';
+            elif record['button'] == SessionButton.BACKSPACE:
+                self.result.text += '\b';
+        elif event == SessionEvent.EXIT:
+            if record['button'] in (SessionButton.DOT, SessionButton.DASH):
+                self.stopMorseSeq();
+        elif event == SessionEvent.PRESS:
+            inRestZone = record['restZone'];
+            self.mousePressedInRestZone = inRestZone;
+            if inRestZone and not self.clickSegmentation:
+                self.abortCurrentMorseElement();
+        elif event == SessionEvent.RELEASE:
+            if not record['restZone'] or not self.mousePressedInRestZone:
+                return;
+            if self.clickSegmentation:
+                if self.core.inMidLetter():
+                    self.core.watchdogExpired(TimeoutReason.END_OF_LETTER);
+                else:
+                    self.core.watchdogExpired(TimeoutReason.END_OF_WORD);
+    
+    def setOptions(self, options):
+        self.settings = dict(options);
+        self.settings.update(self.optionOverrides);
+        self.clickSegmentation = self.settings.get('clickSegmentation', False);
+        self.core.setInterLetterDelay(self.settings['interLetterTime']);
+        self.core.setInterWordDelay(self.settings['interWordTime']);
+        self.core.setSequenceWaitTime(self.settings['waitDashDotThreadsIdleTime']);
+        if self.morseCodeKey is None and 'codeKey' in self.settings:
+            self.core.setMorseCodeKey(self.settings['codeKey']);
+        if not self.settings['adaptiveSegmentation']:
+            self.core.setAdaptiveSegmenter(None);
+        elif self.core.adaptiveSegmenter is None:
+            self.core.setAdaptiveSegmenter(AdaptiveSegmenter());
+    
+    def elementDuration(self, element):
+        if element == Morse.DOT:
+            return self.settings['dotDuration'];
+        return self.settings['dashDuration'];
+    
+    def elementPeriod(self, element):
+        if element == Morse.DOT:
+            return self.settings['dotDuration'] + self.settings['interSigPauseDots'];
+        return self.settings['dashDuration'] + self.settings['interSigPauseDashes'];
+    
+    def startMorseSeq(self, element):
+        self.core.sequenceStarted();
+        # A new sequence delivers the one that still plays, 
+        # counting the elements completed so far:
+        if self.finishedSequence is not None:
+            self.finishTimer.stop();
+            self.finishSequence();
+        elif self.sequence is not None:
+            (previousElement, startTime) = self.sequence;
+            self.sequence = None;
+            elapsed = self.clock.now() - startTime - self.elementDuration(previousElement);
+            if elapsed >= 0:
+                self.core.addMorseElements(previousElement, int(elapsed / self.elementPeriod(previousElement)) + 1);
+            else:
+                self.core.addMorseElements(previousElement, 0);
+        if self.settings['automaticMorse']:
+            self.sequence = (element, self.clock.now());
+        else:
+            self.finishedSequence = (element, 1);
+            self.finishTimer.kick(_timeout=self.elementDuration(element));
+    
+    def stopMorseSeq(self):
+        if self.sequence is not None:
+            (element, startTime) = self.sequence;
+            self.sequence = None;
+            # Elements started before the stop are completed:
+            numElements = int((self.clock.now() - startTime) / self.elementPeriod(element)) + 1;
+            endTime = startTime + (numElements - 1) * self.elementPeriod(element) + self.elementDuration(element);
+            self.finishedSequence = (element, numElements);
+            self.finishTimer.kick(_timeout=max(0.0, endTime - self.clock.now()));
+        self.core.sequenceStopped();
+    
+    def finishSequence(self):
+        (element, numElements) = self.finishedSequence;
+        self.finishedSequence = None;
+        self.core.addMorseElements(element, numElements);
+    
+    def abortCurrentMorseElement(self):
+        self.finishTimer.stop();
+        self.sequence = None;
+        self.finishedSequence = None;
+        self.core.abortCurrentMorseElement();
+    
+    def segmentEnded(self, reason, detail):
+        '''
+        Callback of the core. Collects what Morser would have typed.
+        '''
+        if reason == TimeoutReason.END_OF_LETTER:
+            letter = self.core.getAndRemoveAlphaStr();
+            self.result.text += letter;
+            self.result.segments.append((self.clock.now(), reason, letter));
+        elif reason == TimeoutReason.END_OF_WORD:
+            self.result.text += self.core.getAndRemoveAlphaStr() + ' ';
+            self.result.segments.append((self.clock.now(), reason, None));
+        else:
+            self.result.numBadInputs += 1;
+            self.result.segments.append((self.clock.now(), reason, detail));
+
+if __name__ == "__main__":
+    
+    import argparse;
+    parser = argparse.ArgumentParser(description="Replay recorded Morser sessions without a display or sound card.");
+    parser.add_argument('logFiles', nargs='+', help="session logs, as written with the recordSessions option");
+    parser.add_argument('-s', '--speed', type=float, help="replay this many times faster than real time. Default: as fast as possible");
+    parser.add_argument('-a', '--adaptive', action='store_true', help="replay with adaptive segmentation turned on");
+    args = parser.parse_args();
+    
+    optionOverrides = {'adaptiveSegmentation' : True} if args.adaptive else None;
+    for logFile in args.logFiles:
+        result = SessionReplayer.fromFile(logFile).replay(speed=args.speed, optionOverrides=optionOverrides);
+        print("%s: %s" % (logFile, str(result)));
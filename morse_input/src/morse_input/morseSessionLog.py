@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+# Recording of Morser sessions for later replay. A SessionRecorder
+# appends one JSON object per line to a log file: the button enter
+# and exit events, mouse presses and releases, the options in force,
+# and what the generator made of the input. Each record holds its
+# event type under the key 'ev', and the seconds since the session 
+# started under the key 't'. Times are read from the monotonic clock
+# (see morseTiming), so changes of the system time do not show up as
+# pauses of the user.
+#
+# Each line is flushed as it is written, so a log survives a crash of the
+# program that wrote it. readSessionLog() ends at a truncated last line, 
+# rather than failing.
+#
+# See morseReplay for feeding a recording back through the decoder.
+
+import json;
+import threading;
+from datetime import datetime;
+from morseTiming import monotonicTime, MONOTONIC_CLOCK_AVAILABLE;
+
+SESSION_LOG_VERSION = 1;
+
+class SessionEvent:
+    # First record of every log:
+    SESSION  = 'session'
+    # Cursor entered or left one of the buttons:
+    ENTER    = 'enter'
+    EXIT     = 'exit'
+    # Left mouse button, with whether the cursor was in the rest zone:
+    PRESS    = 'press'
+    RELEASE  = 'release'
+    POWER    = 'power'
+    OPTIONS  = 'options'
+    # Recorded by the generator: dots or dashes added to the
+    # current letter, and letter or word ends:
+    ELEMENTS = 'elements'
+    SEGMENT  = 'segment'
+
+class SessionButton:
+    DOT       = 'dot'
+    DASH      = 'dash'
+    EOW       = 'eow'
+    BACKSPACE = 'backspace'
+
+class SessionRecorder(object):
+    '''
+    Appends the events of one Morser session to a JSONL log. May be
+    called from several threads.
+    '''
+    
+    def __init__(self, logPath, morseCodeKey=None):
+        '''
+        @param logPath: file to write the records to. Overwritten if it exists.
+        @type logPath: string
+        @param morseCodeKey: map from Morse codes to letters that the session decodes
+                         with. Recorded in the first record, so that replays decode
+                         alike. If None, none is recorded.
+        @type morseCodeKey: {string : string}
+        @raise IOError: if the file cannot be opened for writing.
+        '''
+        self.logPath = logPath;
+        self.logFd = open(logPath, 'w');
+        self.lock = threading.Lock();
+        self.startTime = monotonicTime();
+        fields = {'version'   : SESSION_LOG_VERSION,
+                  'started'   : datetime.now().isoformat(),
+                  'monotonic' : MONOTONIC_CLOCK_AVAILABLE};
+        if morseCodeKey is not None:
+            fields['codeKey'] = morseCodeKey;
+        self.record(SessionEvent.SESSION, **fields);
+    
+    def record(self, event, **fields):
+        '''
+        Append one record. Records after close() are dropped.
+        @param event: type of the event
+        @type event: SessionEvent
+        @param fields: event details. Must be JSON serializable.
+        @type fields: {string : any}
+        '''
+        fields['ev'] = event;
+        with self.lock:
+            if self.logFd is None:
+                return;
+            fields['t'] = round(monotonicTime() - self.startTime, 6);
+            self.logFd.write(json.dumps(fields, separators=(',',':'), sort_keys=True) + '\n');
+            self.logFd.flush();
+    
+    def recordButtonEnter(self, button):
+        self.record(SessionEvent.ENTER, button=button);
+    
+    def recordButtonExit(self, button):
+        self.record(SessionEvent.EXIT, button=button);
+    
+    def recordMousePress(self, inRestZone):
+        self.record(SessionEvent.PRESS, restZone=inRestZone);
+    
+    def recordMouseRelease(self, inRestZone):
+        self.record(SessionEvent.RELEASE, restZone=inRestZone);
+    
+    def recordPower(self, poweredUp):
+        self.record(SessionEvent.POWER, on=poweredUp);
+    
+    def recordOptions(self, options):
+        '''
+        @param options: settings in force from now on. See MorseGenerator.getSettings().
+                        Under the key 'codeKey', may hold the code key in force from now on.
+        @type options: {string : any}
+        '''
+        self.record(SessionEvent.OPTIONS, options=options);
+    
+    def recordElements(self, morseElements):
+        '''
+        @param morseElements: dots and dashes added to the current letter
+        @type morseElements: string
+        '''
+        self.record(SessionEvent.ELEMENTS, code=morseElements);
+    
+    def recordSegment(self, reason, letter=None, detail=''):
+        '''
+        @param reason: why the letter or word ended
+        @type reason: TimeoutReason
+        @param letter: letter that was decoded, if any
+        @type letter: string
+        @param detail: rejected dots and dashes for bad input
+        @type detail: string
+        '''
+        fields = {'reason' : reason};
+        if letter is not None:
+            fields['letter'] = letter;
+        if len(detail) > 0:
+            fields['detail'] = detail;
+        self.record(SessionEvent.SEGMENT, **fields);
+    
+    def close(self):
+        with self.lock:
+            if self.logFd is not None:
+                self.logFd.close();
+                self.logFd = None;
+
+def readSessionLog(logPath):
+    '''
+    Return the records of a session log in the order they were written.
+    A last line that was cut off while it was written is skipped.
+    @param logPath: log written by a SessionRecorder
+    @type logPath: string
+    @return: one dict per record
+    @rtype: [{string : any}]
+    @raise ValueError: if the file is not a session log of a known version.
+    '''
+    records = [];
+    with open(logPath, 'r') as logFd:
+        lines = logFd.readlines();
+    for (lineNum, line) in enumerate(lines):
+        try:
+            records.append(json.loads(line));
+        except ValueError:
+            if lineNum == len(lines) - 1:
+                break;
+            raise ValueError("Line %d of session log %s is not JSON: '%s'" % (lineNum + 1, logPath, line.strip()));
+    if len(records) == 0 or records[0].get('ev') != SessionEvent.SESSION:
+        raise ValueError("File %s is not a Morser session log." % logPath);
+    if records[0].get('version') != SESSION_LOG_VERSION:
+        raise ValueError("Session log %s has version %s; only version %d is supported." % 
+                         (logPath, records[0].get('version'), SESSION_LOG_VERSION));
+    return records;
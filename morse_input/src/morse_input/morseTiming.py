@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+# Timing support for Morse element generation.
+#
+# Element boundaries are absolute deadlines on a monotonic clock, which
+# setting the system time does not disturb. Python 2 has no time.monotonic(),
+# so clock_gettime(CLOCK_MONOTONIC) is called through ctypes where available.
+# Elsewhere the wall clock is used as a last resort.
+#
+# JitterStats accumulates how late deadlines were met.
+
+import ctypes;
+import ctypes.util;
+import math;
+import os;
+import time;
+
+# From <linux/time.h>:
+CLOCK_MONOTONIC = 1;
+
+class Timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), 
+                ('tv_nsec', ctypes.c_long)];
+
+def findClockGettime():
+    '''
+    Return the C library's clock_gettime() function, or None if
+    it cannot be found. Older glibc versions keep it in librt.
+    '''
+    for libName in ('c', 'rt'):
+        libPath = ctypes.util.find_library(libName);
+        if libPath is None:
+            continue;
+        try:
+            clockGettime = ctypes.CDLL(libPath, use_errno=True).clock_gettime;
+        except (OSError, AttributeError):
+            continue;
+        clockGettime.argtypes = [ctypes.c_int, ctypes.POINTER(Timespec)];
+        return clockGettime;
+    return None;
+
+if hasattr(time, 'monotonic'):
+    monotonicTime = time.monotonic;
+    MONOTONIC_CLOCK_AVAILABLE = True;
+else:
+    clockGettime = findClockGettime();
+    MONOTONIC_CLOCK_AVAILABLE = clockGettime is not None;
+    if MONOTONIC_CLOCK_AVAILABLE:
+        def monotonicTime():
+            '''
+            Seconds on a clock that only moves forward. Only
+            differences between its readings are meaningful.
+            '''
+            timespec = Timespec();
+            if clockGettime(CLOCK_MONOTONIC, ctypes.byref(timespec)) != 0:
+                errno = ctypes.get_errno();
+                raise OSError(errno, os.strerror(errno));
+            return timespec.tv_sec + timespec.tv_nsec * 1e-9;
+    else:
+        monotonicTime = time.time;
+
+def sleepUntil(deadline):
+    '''
+    Return no earlier than the given monotonicTime() reading. 
+    Sleeps that end early, for instance because of signals, 
+    are resumed.
+    @param deadline: time to wake up
+    @type deadline: float
+    '''
+    while True:
+        timeLeft = deadline - monotonicTime();
+        if timeLeft <= 0:
+            return;
+        time.sleep(timeLeft);
+
+class JitterStats(object):
+    '''
+    Running statistics of how late deadlines were met, in 
+    fractional seconds. Uses Welford's method for the variance.
+    '''
+    
+    def __init__(self):
+        self.reset();
+    
+    def reset(self):
+        self.count = 0;
+        self.mean = 0.0;
+        self.sumSquaredDiffs = 0.0;
+        self.max = 0.0;
+    
+    def record(self, lateness):
+        '''
+        Record the lateness of one deadline.
+        @param lateness: time between deadline and wakeup
+        @type lateness: float
+        '''
+        self.count += 1;
+        delta = lateness - self.mean;
+        self.mean += delta / self.count;
+        self.sumSquaredDiffs += delta * (lateness - self.mean);
+        self.max = max(self.max, lateness);
+    
+    def stdDev(self):
+        if self.count < 2:
+            return 0.0;
+        return math.sqrt(self.sumSquaredDiffs / (self.count - 1));
+    
+    def __str__(self):
+        return "%d deadlines, lateness mean %.2fms, std dev %.2fms, max %.2fms" %\
+            (self.count, 1000 * self.mean, 1000 * self.stdDev(), 1000 * self.max);
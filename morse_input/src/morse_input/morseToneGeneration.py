@@ -33,31 +33,120 @@
 # POSSIBILITY OF SUCH DAMAGE
 
 
-import subprocess;
-import time;
 import os;
-import signal;
+import select;
 import threading;
-from datetime import datetime;
-from watchdogTimer import WatchdogTimer;
-from morseCodeTranslationKey import codeKey;
+from collections import deque, OrderedDict;
+from morseCore import MorseCore, QtClock, Morse, TimeoutReason;
+from toneSynthesis import ToneEngine, synthesizeTone, RAMP_DURATION;
+from morseTiming import monotonicTime, sleepUntil, JitterStats;
 
-class Morse:
-    DOT  = 0;
-    DASH = 1;
+class SchedulerCommand:
+    START    = 0
+    STOP     = 1
+    ABORT    = 2
+    SHUTDOWN = 3
 
-class TimeoutReason:
-    END_OF_LETTER = 0
-    END_OF_WORD   = 1
-    BAD_MORSE_INPUT = 2
+class ToneBank(object):
+    '''
+    Cache of synthesized tones, keyed by frequency, duration, ramp
+    duration, and sample rate. The least recently used tone is dropped when
+    the capacity is exceeded. The cached sample strings are handed to the
+    tone engine as they are, so playing a cached tone allocates nothing.
+    '''
+    
+    # Enough for the dot and dash tones of several recent speed settings:
+    DEFAULT_CAPACITY = 16;
+    
+    def __init__(self, sampleRate, capacity=DEFAULT_CAPACITY):
+        '''
+        @param sampleRate: samples per second of the tones
+        @type sampleRate: int
+        @param capacity: maximum number of tones kept
+        @type capacity: int
+        @raise ValueError: if capacity is less than 1.
+        '''
+        if capacity < 1:
+            raise ValueError("ToneBank capacity must be at least 1, not %s" % str(capacity));
+        self.sampleRate = sampleRate;
+        self.capacity = capacity;
+        # Key tuple to samples. Ordered from least to most recently used:
+        self.tones = OrderedDict();
+        # The dot and dash threads, and the GUI thread through
+        # setSpeed() all use the bank:
+        self.lock = threading.Lock();
+        self.numMisses = 0;
+    
+    def getTone(self, frequency, duration, rampDuration=RAMP_DURATION):
+        '''
+        Return the samples of a tone, synthesizing them only if
+        they are not cached.
+        @param frequency: pitch of the tone in Hz
+        @type frequency: float
+        @param duration: length of the tone in fractional seconds
+        @type duration: float
+        @param rampDuration: length of the onset and decay ramps
+        @type rampDuration: float
+        @return: 16-bit signed little endian mono samples
+        @rtype: string
+        '''
+        key = (frequency, duration, rampDuration, self.sampleRate);
+        with self.lock:
+            pcm = self.tones.pop(key, None);
+            if pcm is None:
+                self.numMisses += 1;
+                pcm = synthesizeTone(frequency, duration, self.sampleRate, rampDuration);
+            self.tones[key] = pcm;
+            if len(self.tones) > self.capacity:
+                self.tones.popitem(last=False);
+            return pcm;
+    
+    def prepare(self, frequency, durations):
+        '''
+        Synthesize the tones of the given durations ahead of their use.
+        @param frequency: pitch of the tones in Hz
+        @type frequency: float
+        @param durations: tone lengths in fractional seconds
+        @type durations: [float]
+        '''
+        for duration in durations:
+            self.getTone(frequency, duration);
+    
+    def __len__(self):
+        return len(self.tones);
 
 class MorseGenerator(object):
     '''
     Manages non-UI issues for Morse code generation: Interacts with the 
-    tone generator, regulates auto dot/dash generation speed.
+    tone generator, regulates auto dot/dash generation speed. Segmentation
+    into letters and words, and decoding, are left to a MorseCore.
     '''
     
-    def __init__(self, callback=None):
+    def __init__(self, callback=None, toneSink=None, elementCallback=None, candidatesCallback=None, morseCodeKey=None, clock=None):
+        '''
+        @param callback: callable to invoke with a TimeoutReason and detail
+                         string when a letter or word ends.
+        @type callback: Python callable
+        @param elementCallback: if provided, called with the Morse element, and the
+                         times its tone started and ended, after each dot or dash. Called
+                         from the element scheduler thread. Times are readings 
+                         of morseTiming.monotonicTime().
+        @type elementCallback: Python callable
+        @param candidatesCallback: if provided, called with the dots and dashes of the 
+                         current letter so far, and the tuple of letters they may 
+                         still become, each time dots or dashes were added. Called 
+                         from the element scheduler thread.
+        @type candidatesCallback: Python callable
+        @param toneSink: where the dot and dash tones are played. If None, the
+                         sound card is used. See toneSynthesis.defaultSink().
+        @type toneSink: toneSynthesis.ToneSink
+        @param morseCodeKey: map from Morse codes to the letters they are decoded
+                         into. If None, morseCodeTranslationKey.codeKey is used.
+        @type morseCodeKey: {string : string}
+        @param clock: time and timers for the letter and word ends. If None,
+                         a morseCore.QtClock, which needs a running Qt event loop.
+        @type clock: QtClock, AsyncioClock, or VirtualClock
+        '''
         super(MorseGenerator, self).__init__();
         
         # ------ Instance Vars Available Through Getters/Setters ------------
@@ -65,39 +154,40 @@ class MorseGenerator(object):
         # Frequency of the tone:        
         self.frequency = 300; # Hz
         
-        self.callback = callback;
+        self.elementCallback = elementCallback;
+        
+        # Plays the tones through one output stream that
+        # stays open while the generator runs. Created before
+        # setSpeed() is called, which prepares the tones:
+        self.toneEngine = ToneEngine(sink=toneSink);
+        self.toneBank = ToneBank(self.toneEngine.sampleRate);
+        
+        # Letter and word segmentation, and decoding. Created
+        # before setSpeed() is called, which sets their timing:
+        if clock is None:
+            clock = QtClock();
+        self.core = MorseCore(clock, callback, candidatesCallback, morseCodeKey);
         
         self.interLetterDelayExplicitlySet = False;
         self.interWordDelayExplicitlySet = False;
-        # setSpeed() must be called before setting up
-        # watchdog timer below:
         self.setSpeed(3.3);
         self.automaticMorse = True;
         
         self.recentDots = 0;
         self.recentDashes = 0;
-        # morseResult will accumulate the dots and dashes:
-        self.morseResult = '';
-        self.alphaStr = '';
-        self.watchdog = WatchdogTimer(timeout=self.interLetterTime, callback=self.watchdogExpired);
         
         # ------ Private Instance Vars  ------------
         
-        self.morseDashEvent  = threading.Event();
-        self.morseDotEvent   = threading.Event();
-        self.morseStopEvent  = threading.Event();
-
-        # Lock for regulating write-access to alpha string:
-        self.alphaStrLock = threading.Lock();
-        # Lock for regulating write-access to morse elements
-        # delivered from the dot and dash threads:
-        self.morseResultLock = threading.Lock();
-
-        # Set to False to stop thread:        
+        # Set to False when the generator is stopped:        
         self.keepRunning = True;
         
-        self.dotGenerator  = MorseGenerator.DotGenerator(self).start();
-        self.DashGenerator = MorseGenerator.DashGenerator(self).start();
+        # How late the scheduler met element deadlines:
+        self.timingJitter = JitterStats();
+        
+        # One thread times the dots and dashes of all 
+        # sequences, driven by commands from the public methods:
+        self.scheduler = MorseGenerator.ElementScheduler(self);
+        self.scheduler.start();
         
     # ------------------------------ Public Methods ---------------------
 
@@ -124,12 +214,8 @@ class MorseGenerator(object):
         # The Morse element can't possibly be ended until
         # stopMorseSeq() is called by mouse cursor leaving
         # a gesture button:
-        self.watchdog.stop();
-        # Set a thread event for which dot or dash generator are waiting:
-        if morseElement == Morse.DASH:
-            self.morseDashEvent.set();
-        elif morseElement == Morse.DOT:
-            self.morseDotEvent.set();
+        self.core.sequenceStarted();
+        self.scheduler.submit(SchedulerCommand.START, morseElement);
 
     def stopMorseSeq(self):
         '''
@@ -142,19 +228,18 @@ class MorseGenerator(object):
         '''
         if not self.keepRunning:
             raise RuntimeError("Called Morse generator method after stopMorseGenerator() was called.");
-        # Clear dot and dash generation events so that the
-        # generator threads will go into a wait state.
-        self.morseDotEvent.clear();
-        self.morseDashEvent.clear();
-        # If there will now be a pause long enough
-        # to indicate the end of a letter, this
-        # watchdog will go off:
-        if self.interLetterTime > 0:
-            self.watchdog.kick(_timeout=self.interLetterTime, callbackArg=TimeoutReason.END_OF_LETTER);
+        # The scheduler finishes the running sequence once
+        # the current dot or dash has ended:
+        self.scheduler.submit(SchedulerCommand.STOP);
+        # Starts the end-of-letter timeout:
+        self.core.sequenceStopped();
         
     def abortCurrentMorseElement(self):
-        self.watchdog.stop();
-        self.setMorseResult('');
+        # Drop any running sequence as well. The scheduler 
+        # itself aborts only after finishing its sequence:
+        if self.keepRunning and threading.current_thread() is not self.scheduler:
+            self.scheduler.submit(SchedulerCommand.ABORT);
+        self.core.abortCurrentMorseElement();
 
     def setAutoMorse(self, yesNo):
         '''
@@ -200,28 +285,26 @@ class MorseGenerator(object):
         # letters and words, compute a default now:
         if not self.interLetterDelayExplicitlySet:
             # Turn automatic word segmentation off by default:
-            self.interLetterTime = -1;
-            # self.interLetterTime = 7.0*self.dotDuration;
+            self.core.setInterLetterDelay(-1);
+            # self.core.setInterLetterDelay(7.0*self.dotDuration);
         if not self.interWordDelayExplicitlySet:
             # Turn automatic word segmentation off by default:
-            self.interWordTime = -1;
-            #self.interWordTime   = 9.0*self.dotDuration;
+            self.core.setInterWordDelay(-1);
+            #self.core.setInterWordDelay(9.0*self.dotDuration);
         self.waitDashDotThreadsIdleTime = 0.5 * 7.0*self.dotDuration;
+        self.core.setSequenceWaitTime(self.waitDashDotThreadsIdleTime);
+        # Synthesize the tones for the new speed now, rather 
+        # than when the first dot or dash is keyed:
+        self.toneBank.prepare(self.frequency, [self.dotDuration, self.dashDuration]);
     
     def setInterLetterDelay(self, secs):
         '''
         Sets the time that must elapse between two letters.
+        If negative, no letter segmentation is performed.
         @param secs: fractional seconds
         @type secs: float
         '''
-        self.interLetterTime = secs;
-        # The following are commented, b/c mouse-click-controlled
-        # inter-letter delay was introduced. That feature sets
-        # interLetterTime to -1, which would cause bugs
-        # below. The lines make sense if interLetterTime is known
-        # to be positive:
-        #self.watchdog.changeTimeout(self.interLetterTime);
-        #self.waitDashDotThreadsIdleTime = 0.5 * self.interLetterTime;
+        self.core.setInterLetterDelay(secs);
         self.interLetterDelayExplicitlySet = True;
         
     def setInterWordDelay(self, secs):
@@ -231,7 +314,7 @@ class MorseGenerator(object):
         @param secs: fractional seconds
         @type secs: float
         '''
-        self.interWordTime = secs;
+        self.core.setInterWordDelay(secs);
         # Indicate that client explicitly set the
         # inter-word dwell time. This note will prevent
         # setSpeed() from defining its default dwell:
@@ -243,32 +326,22 @@ class MorseGenerator(object):
         Subsequent calls to startMorseSeq() or stopMorseSeq() 
         generate exceptions.
         '''
+        if not self.keepRunning:
+            return;
         self.keepRunning = False;
-        # Ensure that the dot and dash generators
-        # get out of the wait state to notice that
-        # they are supposed to terminate:
-        self.morseDashEvent.set();
-        self.morseDotEvent.set();
+        self.scheduler.submit(SchedulerCommand.SHUTDOWN);
+        self.scheduler.join();
+        self.toneEngine.close();
 
     def getAndRemoveAlphaStr(self):
-        res = self.alphaStr;
-        self.setAlphaStr('');
-        return res;
-
-    def setAlphaStr(self, newAlphaStr):
-        with self.alphaStrLock:
-            self.alphaStr = newAlphaStr
+        return self.core.getAndRemoveAlphaStr();
 
-    def setMorseResult(self, newMorseResult):
-        with self.morseResultLock:
-            self.morseResult = newMorseResult;
-    
     def inMidLetter(self):
         '''
         Return True if user has morsed any dots or dashes
         since the last letter or word segmentation
         '''
-        return len(self.morseResult) > 0;
+        return self.core.inMidLetter();
         
     def getInterLetterTime(self):
         '''
@@ -276,7 +349,7 @@ class MorseGenerator(object):
         for the system to conclude that the Morse code equivalent
         of a letter has been generated. I.e.: end-of-letter pause.
         '''
-        return self.interLetterTime;
+        return self.core.getInterLetterTime();
     
     def getInterWordTime(self):
         '''
@@ -284,194 +357,228 @@ class MorseGenerator(object):
         for the system to conclude that a word has ended.
         I.e.: end-of-word pause.
         '''
-        return self.interWordTime;
+        return self.core.getInterWordTime();
+    
+    def setAdaptiveSegmenter(self, adaptiveSegmenter):
+        '''
+        Let the end-of-letter and end-of-word dwell times adapt
+        to the user's pauses. See MorseCore.setAdaptiveSegmenter().
+        @param adaptiveSegmenter: segmenter to learn the pauses, or None to stop adapting.
+        @type adaptiveSegmenter: adaptiveSegmenter.AdaptiveSegmenter
+        '''
+        self.core.setAdaptiveSegmenter(adaptiveSegmenter);
+    
+    def getSegmentationConfidence(self):
+        '''
+        Return the confidence of the adaptive segmenter between 0.0 and 1.0,
+        or None if dwell times are not adapted.
+        '''
+        return self.core.getSegmentationConfidence();
+    
+    def getEffectiveInterLetterTime(self):
+        return self.core.getEffectiveInterLetterTime();
+    
+    def getEffectiveInterWordTime(self):
+        return self.core.getEffectiveInterWordTime();
+    
+    def setMorseCodeKey(self, morseCodeKey):
+        '''
+        Decode with a different code key from now on. See MorseCore.setMorseCodeKey().
+        @param morseCodeKey: map from Morse codes to letters, or None for morseCodeTranslationKey.codeKey.
+        @type morseCodeKey: {string : string}
+        '''
+        self.core.setMorseCodeKey(morseCodeKey);
+    
+    def getMorseCodeKey(self):
+        return self.core.getMorseCodeKey();
+    
+    def getSettings(self):
+        '''
+        Return the settings that determine how button dwells become
+        dots and dashes, and where letters and words end. Used to 
+        record sessions, and to replay them with the same settings.
+        @return: setting names to values
+        @rtype: {string : any}
+        '''
+        return {'dotDuration'         : self.dotDuration,
+                'dashDuration'        : self.dashDuration,
+                'interSigPauseDots'   : self.interSigPauseDots,
+                'interSigPauseDashes' : self.interSigPauseDashes,
+                'interLetterTime'     : self.core.getInterLetterTime(),
+                'interWordTime'       : self.core.getInterWordTime(),
+                'automaticMorse'      : self.automaticMorse,
+                'adaptiveSegmentation': self.core.adaptiveSegmenter is not None,
+                'waitDashDotThreadsIdleTime' : self.waitDashDotThreadsIdleTime,
+                };
+    
+    def setSessionRecorder(self, sessionRecorder):
+        '''
+        Log the dots and dashes added to letters, and the letter and
+        word ends, so that replays of the session can be checked against them.
+        @param sessionRecorder: recorder of the session, or None to stop recording.
+        @type sessionRecorder: morseSessionLog.SessionRecorder
+        '''
+        self.core.setSessionRecorder(sessionRecorder);
+    
+    def getTimingJitter(self):
+        '''
+        Return statistics of how late the dot and dash boundaries
+        were met since the generator was created, or since the 
+        returned object's reset() was called.
+        @rtype: morseTiming.JitterStats
+        '''
+        return self.timingJitter;
+    
+    def watchdogExpired(self, reason):
+        '''
+        End the current letter or word without waiting for the
+        dwell time, as when the user clicks the mouse.
+        @param reason: whether a letter or a word ended
+        @type reason: TimeoutReason
+        '''
+        self.core.watchdogExpired(reason);
     
     def reallySleep(self, secs):
         '''
         Truly return only after specified time. Just using
         time.sleep() sleeps shorter if any interrupts occur during
-        the sleep period.
+        the sleep period. Measured on the monotonic clock, so
+        changes of the system time do not matter.
         @param secs: fractional seconds to sleep
         @type secs: float
         '''
-        sleepStop  = time.time() + secs; 
-        while True:
-            timeLeft = sleepStop - time.time();
-            if timeLeft <= 0:
-                return
-            time.sleep(timeLeft)
+        sleepUntil(monotonicTime() + secs);
             
 
     # ------------------------------ Private ---------------------
 
-    def addMorseElements(self, dotsOrDashes, numElements):
-        if dotsOrDashes == Morse.DASH:
-            self.setMorseResult(self.morseResult + '-'*numElements); 
-        else: # dots:
-            # Catch abort-letter:
-            if numElements > 7:
-                self.abortCurrentMorseElement();
-                return;
-            self.setMorseResult(self.morseResult + '.'*numElements);
-
-    def watchdogExpired(self, reason):
-
-        detail = '';
-        if reason == TimeoutReason.END_OF_LETTER:
-            # If no Morse elements are in self.morseResult,
-            # it could be because the dash or dot thread are
-            # not done delivering their result. In that case,
-            # set the timer again to get them idle:
-            if len(self.morseResult) == 0:
-                self.watchdog.kick(self.waitDashDotThreadsIdleTime);
-                return;
-            newLetter = self.decodeMorseLetter();
-            # If Morse sequence was legal and recognized,
-            # append it:
-            if newLetter is not None:
-                self.setAlphaStr(self.alphaStr + newLetter);
-            else:
-                reason = TimeoutReason.BAD_MORSE_INPUT;
-                detail = self.morseResult;
-            # One way or other, a letter has ended. Start the
-            # timeout for a word-separation sized pause:
-            if self.interWordTime > 0:
-                self.watchdog.kick(_timeout=self.interWordTime, callbackArg=TimeoutReason.END_OF_WORD);
-        elif reason == TimeoutReason.END_OF_WORD:
-            # Decided to have the client decide what to do when a word ends.
-            # The commented code would add a space:
-            #self.setAlphaStr(self.alphaStr + ' ');
-            pass;
-        self.setMorseResult('');
-        if self.callback is not None:
-            self.callback(reason, detail);
+    def playTone(self, duration):
+        '''
+        Start playing a tone of the current frequency in the background.
+        '''
+        self.toneEngine.playPcm(self.toneBank.getTone(self.frequency, duration));
 
-    def decodeMorseLetter(self):
-        try:
-            letter = codeKey[self.morseResult];
-            if letter == 'BS':
-                letter = '\b';
-            elif letter == 'NL':
-                letter = '\r';
-            elif letter == 'HS':
-                letter = ' ';
-        except KeyError:
-            #print("Bad morse seq: '%s'" % self.morseResult);
-            return None
-        return letter;
+    def addMorseElements(self, dotsOrDashes, numElements):
+        self.core.addMorseElements(dotsOrDashes, numElements);
             
     #-----------------------------
-    # DotGenerator Class
+    # ElementScheduler Class
     #-------------------
     
-    class DotGenerator(threading.Thread):
+    class ElementScheduler(threading.Thread):
+        '''
+        Times the dots and dashes of the generator. Commands from
+        the generator's public methods arrive through a queue. While a
+        sequence runs, the thread waits for the next command until the 
+        deadline of the next element boundary. Each deadline is computed 
+        from the previous one, not from when the thread woke up, so errors
+        do not accumulate over long sequences. Only this thread adds elements 
+        to the generator's morseResult.
+        
+        Deadlines are on the monotonic clock. The thread waits in select() on
+        a pipe that submit() writes to, because select() timeouts do not depend on
+        the wall clock, as Queue.get() timeouts do in Python 2.
+        '''
         
         def __init__(self, parent):
-            super(MorseGenerator.DotGenerator,self).__init__();
+            super(MorseGenerator.ElementScheduler,self).__init__();
+            self.daemon = True;
             self.parent = parent;
-            self.idle = True;
+            # Queue of (SchedulerCommand, argument). A byte is
+            # written to the wakeup pipe for each command:
+            self.commandQueue = deque();
+            (self.wakeupReadFd, self.wakeupWriteFd) = os.pipe();
+            # Morse element of the running sequence; None while idle:
+            self.element = None;
+            self.numElements = 0;
+            # True during the pause that follows an element:
+            self.inPause = False;
+            self.stopRequested = False;
+            self.elementStartTime = None;
+            # Time of the next element boundary:
+            self.deadline = None;
         
-        def isIdle(self):
-            return self.idle;
+        def submit(self, command, arg=None):
+            self.commandQueue.append((command, arg));
+            os.write(self.wakeupWriteFd, 'c');
         
         def run(self):
-            self.genDots();
-    
-        def genDots(self):
-            
-            # Initially: wait for first dot request.
-            self.parent.morseDotEvent.wait();
-            # No dots generated yet:
-            numDots = 0;
-                        
-            while self.parent.keepRunning:
-            
-                while self.parent.morseDotEvent.is_set():
-                    
-                    self.idle = False;    
-                
-                    # Use Alsa utils speaker tester to produce sound:
-                    proc = subprocess.Popen(['speaker-test', 
-                                             "--test", "sine", 
-                                             "--frequency", str(self.parent.frequency)],
-                                            stdout=subprocess.PIPE); # suppress speaker-test display output
-                    time.sleep(self.parent.dotDuration);
-                    os.kill(proc.pid, signal.SIGUSR1)
-                    
-                    numDots += 1;
-                    if not self.parent.automaticMorse:
-                        # Not doing automatic dot generation.
-                        # So clear the dot event that controls out
-                        # loop. That would otherwise happen 
-                        # in self.parent.stopMorseSequence(), which
-                        # clients call:
-                        self.parent.morseDotEvent.clear();
-                    else:
-                        # Auto dot generation: pause for
-                        # the inter-dot period:
-                        self.parent.reallySleep(self.parent.interSigPauseDots);
-                    
-                self.parent.addMorseElements(Morse.DOT, numDots);
-                # Get ready for the next request for dot sequences:
-                numDots = 0;
-                self.idle = True;
-                self.parent.morseDotEvent.wait();
+            try:
+                while True:
+                    if len(self.commandQueue) == 0:
+                        if self.element is None:
+                            timeout = None;
+                        else:
+                            timeout = max(0, self.deadline - monotonicTime());
+                        (readyFds, _, _) = select.select([self.wakeupReadFd], [], [], timeout);
+                        if len(readyFds) > 0:
+                            os.read(self.wakeupReadFd, 512);
+                    # A late wakeup may have passed several deadlines:
+                    while self.element is not None and monotonicTime() >= self.deadline:
+                        self.deadlineReached();
+                    while len(self.commandQueue) > 0:
+                        (command, arg) = self.commandQueue.popleft();
+                        if command == SchedulerCommand.SHUTDOWN:
+                            return;
+                        self.handleCommand(command, arg);
+            finally:
+                os.close(self.wakeupReadFd);
+                os.close(self.wakeupWriteFd);
         
-    #-----------------------------
-    # DashGenerator Class
-    #-------------------
-            
-    class DashGenerator(threading.Thread):
+        def handleCommand(self, command, arg):
+            if command == SchedulerCommand.START:
+                if self.element is not None:
+                    self.finishSequence();
+                self.startSequence(arg);
+            elif command == SchedulerCommand.STOP:
+                if self.element is not None:
+                    self.stopRequested = True;
+                    # An element that is playing is completed:
+                    if self.inPause:
+                        self.finishSequence();
+            elif command == SchedulerCommand.ABORT:
+                self.element = None;
+                self.parent.toneEngine.flush();
         
-        def __init__(self, parent):
-            super(MorseGenerator.DashGenerator,self).__init__();
-            self.parent = parent;
-            self.idle = True;
-
-        def isIdle(self):
-            return self.idle;
+        def startSequence(self, morseElement):
+            self.element = morseElement;
+            self.numElements = 0;
+            self.stopRequested = False;
+            self.startElement(monotonicTime());
         
-        def run(self):
-            self.genDashes();
-    
-        def genDashes(self):
-            
-            # Initially: wait for first dash request.
-            self.parent.morseDashEvent.wait();
-            # No dashes generated yet:
-            numDashes = 0;
-            
-            while self.parent.keepRunning:
-                while self.parent.morseDashEvent.is_set():
-                    
-                    self.idle = False;
-                    
-                    # Speaker-test subprocess will run until we kill it:
-                    proc = subprocess.Popen(['speaker-test', 
-                                             "--test", "sine", 
-                                             "--frequency", str(self.parent.frequency)],
-                                            stdout=subprocess.PIPE); # Suppress print output
-                    time.sleep(self.parent.dashDuration);
-                    os.kill(proc.pid, signal.SIGUSR1)
-                    
-                    numDashes += 1;
-                    if not self.parent.automaticMorse:
-                        # Not doing automatic dash generation.
-                        # So clear the dash event that controls out
-                        # loop. That would otherwise happen 
-                        # in self.parent.stopMorseSequence(), which
-                        # clients call:
-                        self.parent.morseDashEvent.clear();                        
-                    else:
-                        # Auto dot generation: pause for
-                        # the inter-dash period:
-                        self.parent.reallySleep(self.parent.interSigPauseDashes);
-                    
-                self.parent.addMorseElements(Morse.DASH, numDashes);
-                # Get ready for the next request for dashes sequences:
-                numDashes = 0;
-                self.idle = True;
-                self.parent.morseDashEvent.wait();
+        def startElement(self, startTime):
+            self.inPause = False;
+            self.elementStartTime = startTime;
+            self.deadline = startTime + self.elementDuration();
+            self.parent.playTone(self.elementDuration());
+        
+        def deadlineReached(self):
+            self.parent.timingJitter.record(monotonicTime() - self.deadline);
+            if self.inPause:
+                self.startElement(self.deadline);
+                return;
+            self.numElements += 1;
+            if self.parent.elementCallback is not None:
+                self.parent.elementCallback(self.element, self.elementStartTime, self.deadline);
+            if not self.parent.automaticMorse or self.stopRequested:
+                self.finishSequence();
+                return;
+            # Auto generation: pause for the inter-element period:
+            self.inPause = True;
+            if self.element == Morse.DOT:
+                self.deadline += self.parent.interSigPauseDots;
+            else:
+                self.deadline += self.parent.interSigPauseDashes;
+        
+        def finishSequence(self):
+            (element, numElements) = (self.element, self.numElements);
+            self.element = None;
+            self.parent.addMorseElements(element, numElements);
+        
+        def elementDuration(self):
+            if self.element == Morse.DOT:
+                return self.parent.dotDuration;
+            return self.parent.dashDuration;
                     
 if __name__ == "__main__":
     
@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+# In-process synthesis and playback of the Morse tones.
+#
+# Tones are 16-bit signed, little endian, mono PCM. Each tone is
+# a sine whose start and end are shaped by a raised-cosine ramp,
+# which avoids the clicks of abruptly switched tones. A ToneEngine
+# keeps one output stream open for the life of the Morse generator,
+# and plays tones from a queue on its own thread, so starting a tone
+# costs no process start or device open.
+#
+# Where the tones go is determined by a sink:
+#
+#   - AlsaSink: the ALSA 'default' device through the pyalsaaudio module.
+#   - AplaySink: a long-lived 'aplay' process from alsa-utils, fed through a pipe.
+#   - WavFileSink: a WAV file, for listening to sessions later.
+#   - NullSink: discards the tones. For testing.
+#
+# defaultSink() picks the first sink that works on this machine.
+#
+# NumPy is used for synthesis if it is installed; else
+# the samples are computed in pure Python.
+
+import array;
+import math;
+import os;
+import Queue;
+import subprocess;
+import sys;
+import threading;
+import time;
+import wave;
+
+try:
+    import numpy;
+    NUMPY_AVAILABLE = True;
+except ImportError:
+    NUMPY_AVAILABLE = False;
+
+try:
+    import alsaaudio;
+    ALSAAUDIO_AVAILABLE = True;
+except ImportError:
+    ALSAAUDIO_AVAILABLE = False;
+
+SAMPLE_RATE = 22050; # Hz
+SAMPLE_BYTES = 2;
+# Peak amplitude as a fraction of full scale:
+AMPLITUDE = 0.5;
+# Duration of the raised-cosine onset and decay ramps:
+RAMP_DURATION = 0.005; # seconds
+# Samples per write to a continuously fed device. The 
+# latency between playTone() and the tone onset is 
+# about one such period, plus the device buffer:
+PERIOD_FRAMES = 256;
+
+def synthesizeTone(frequency, duration, sampleRate=SAMPLE_RATE, rampDuration=RAMP_DURATION, amplitude=AMPLITUDE):
+    '''
+    Compute the PCM samples of one tone.
+    @param frequency: pitch of the tone in Hz
+    @type frequency: float
+    @param duration: length of the tone in fractional seconds
+    @type duration: float
+    @param sampleRate: samples per second
+    @type sampleRate: int
+    @param rampDuration: length of the onset and decay ramps in fractional seconds. 
+                         Shortened to half the tone for very short tones.
+    @type rampDuration: float
+    @param amplitude: peak amplitude as a fraction of full scale
+    @type amplitude: float
+    @return: 16-bit signed little endian mono samples
+    @rtype: string
+    '''
+    numSamples = int(round(duration * sampleRate));
+    numRampSamples = min(int(rampDuration * sampleRate), numSamples / 2);
+    peak = amplitude * 32767;
+    if NUMPY_AVAILABLE:
+        times = numpy.arange(numSamples) / float(sampleRate);
+        samples = peak * numpy.sin(2 * numpy.pi * frequency * times);
+        if numRampSamples > 0:
+            ramp = 0.5 * (1 - numpy.cos(numpy.pi * numpy.arange(numRampSamples) / numRampSamples));
+            samples[:numRampSamples] *= ramp;
+            samples[numSamples - numRampSamples:] *= ramp[::-1];
+        return samples.astype('<i2').tostring();
+    samples = array.array('h');
+    radiansPerSample = 2 * math.pi * frequency / sampleRate;
+    for sampleIndex in xrange(numSamples):
+        sample = peak * math.sin(radiansPerSample * sampleIndex);
+        if sampleIndex < numRampSamples:
+            sample *= 0.5 * (1 - math.cos(math.pi * sampleIndex / numRampSamples));
+        elif sampleIndex >= numSamples - numRampSamples:
+            sample *= 0.5 * (1 - math.cos(math.pi * (numSamples - 1 - sampleIndex) / numRampSamples));
+        samples.append(int(sample));
+    if sys.byteorder != 'little':
+        samples.byteswap();
+    return samples.tostring();
+
+def silence(duration, sampleRate=SAMPLE_RATE):
+    '''
+    Return PCM samples of the given duration that are all zero.
+    @param duration: fractional seconds
+    @type duration: float
+    @param sampleRate: samples per second
+    @type sampleRate: int
+    @rtype: string
+    '''
+    return '\x00' * (int(round(duration * sampleRate)) * SAMPLE_BYTES);
+
+# ----------------------------------  Sinks -----------------------
+
+class ToneSink(object):
+    '''
+    Destination of PCM samples. Subclasses implement write() and close().
+    A continuous sink consumes samples at the sample rate, with write() 
+    blocking while the device buffer is full. The ToneEngine feeds 
+    continuous sinks silence between tones, so the device never stops, 
+    and a tone starts as soon as it reaches the device buffer. 
+    '''
+    
+    continuous = False;
+    
+    def __init__(self, sampleRate=SAMPLE_RATE):
+        self.sampleRate = sampleRate;
+    
+    def write(self, pcm):
+        raise NotImplementedError("Subclasses of ToneSink must implement write()");
+    
+    def close(self):
+        pass;
+
+class NullSink(ToneSink):
+    '''
+    Discards all samples, but counts them.
+    '''
+    
+    def __init__(self, sampleRate=SAMPLE_RATE):
+        super(NullSink, self).__init__(sampleRate);
+        self.numBytesWritten = 0;
+    
+    def write(self, pcm):
+        self.numBytesWritten += len(pcm);
+
+class WavFileSink(ToneSink):
+    '''
+    Writes the tones to a WAV file. Pauses between tones are written
+    as silence of the wall clock time that passed between them, so the file 
+    has the rhythm of the session.
+    '''
+    
+    def __init__(self, filePath, sampleRate=SAMPLE_RATE):
+        super(WavFileSink, self).__init__(sampleRate);
+        self.wavFile = wave.open(filePath, 'wb');
+        self.wavFile.setnchannels(1);
+        self.wavFile.setsampwidth(SAMPLE_BYTES);
+        self.wavFile.setframerate(sampleRate);
+        # Wall clock time at which the most recently written tone ends:
+        self.writtenUntil = None;
+    
+    def write(self, pcm):
+        now = time.time();
+        if self.writtenUntil is not None:
+            if now > self.writtenUntil:
+                self.wavFile.writeframes(silence(now - self.writtenUntil, self.sampleRate));
+            else:
+                # Tone was queued while the previous one played:
+                now = self.writtenUntil;
+        self.wavFile.writeframes(pcm);
+        self.writtenUntil = now + len(pcm) / float(SAMPLE_BYTES * self.sampleRate);
+    
+    def close(self):
+        self.wavFile.close();
+
+class AplaySink(ToneSink):
+    '''
+    Pipes the samples into one 'aplay' process that runs until close().
+    The pipe is only fed while tones play; aplay recovers from the 
+    underruns in between. A continuous feed would fill the pipe buffer,
+    and delay each tone by that buffer's worth of silence.
+    '''
+    
+    # Size of aplay's device buffer:
+    BUFFER_MICROSECONDS = 50000;
+    
+    def __init__(self, sampleRate=SAMPLE_RATE):
+        '''
+        @raise OSError: if aplay cannot be started.
+        '''
+        super(AplaySink, self).__init__(sampleRate);
+        with open(os.devnull, 'w') as devNull:
+            self.proc = subprocess.Popen(['aplay', '--quiet',
+                                          '--file-type', 'raw',
+                                          '--format', 'S16_LE',
+                                          '--channels', '1',
+                                          '--rate', str(sampleRate),
+                                          '--buffer-time', str(AplaySink.BUFFER_MICROSECONDS)],
+                                         stdin=subprocess.PIPE,
+                                         stderr=devNull); # suppress underrun reports
+    
+    def write(self, pcm):
+        self.proc.stdin.write(pcm);
+        self.proc.stdin.flush();
+    
+    def close(self):
+        try:
+            self.proc.stdin.close();
+        except IOError:
+            pass;
+        self.proc.wait();
+
+class AlsaSink(ToneSink):
+    '''
+    Writes to an ALSA playback device through the pyalsaaudio module.
+    '''
+    
+    continuous = True;
+    
+    def __init__(self, sampleRate=SAMPLE_RATE, device='default'):
+        '''
+        @raise ImportError: if pyalsaaudio is not installed.
+        @raise alsaaudio.ALSAAudioError: if the device cannot be opened.
+        '''
+        if not ALSAAUDIO_AVAILABLE:
+            raise ImportError("The pyalsaaudio module is not installed.");
+        super(AlsaSink, self).__init__(sampleRate);
+        self.pcmDevice = alsaaudio.PCM(alsaaudio.PCM_PLAYBACK, alsaaudio.PCM_NORMAL, device);
+        self.pcmDevice.setchannels(1);
+        self.pcmDevice.setrate(sampleRate);
+        self.pcmDevice.setformat(alsaaudio.PCM_FORMAT_S16_LE);
+        self.pcmDevice.setperiodsize(PERIOD_FRAMES);
+    
+    def write(self, pcm):
+        self.pcmDevice.write(pcm);
+    
+    def close(self):
+        self.pcmDevice.close();
+
+def defaultSink(sampleRate=SAMPLE_RATE):
+    '''
+    Return an AlsaSink if pyalsaaudio is installed and the device opens, 
+    else an AplaySink if aplay can be started, else a NullSink.
+    @param sampleRate: samples per second
+    @type sampleRate: int
+    @rtype: ToneSink
+    '''
+    if ALSAAUDIO_AVAILABLE:
+        try:
+            return AlsaSink(sampleRate);
+        except alsaaudio.ALSAAudioError:
+            pass;
+    try:
+        return AplaySink(sampleRate);
+    except OSError:
+        return NullSink(sampleRate);
+
+# ----------------------------------  Engine -----------------------
+
+class ToneEngine(threading.Thread):
+    '''
+    Plays tones through one sink, from a queue. playTone() returns
+    at once; the tone starts after the tones queued before it. 
+    Callers time the Morse elements themselves, and do not wait 
+    for the sound.
+    '''
+    
+    def __init__(self, sink=None, sampleRate=SAMPLE_RATE):
+        '''
+        Create the engine, and start its playback thread.
+        @param sink: destination of the tones. If None, defaultSink() is used.
+        @type sink: ToneSink
+        @param sampleRate: samples per second. Ignored if sink is given.
+        @type sampleRate: int
+        '''
+        super(ToneEngine, self).__init__();
+        self.daemon = True;
+        if sink is None:
+            sink = defaultSink(sampleRate);
+        self.sink = sink;
+        self.sampleRate = sink.sampleRate;
+        # Queue of (pcm, enqueueTime); None stops the thread:
+        self.toneQueue = Queue.Queue();
+        self.silencePeriod = '\x00' * (PERIOD_FRAMES * SAMPLE_BYTES);
+        # Time from playTone() until the tone's samples
+        # were handed to the sink:
+        self.numTonesPlayed = 0;
+        self.sumOnsetLatency = 0.0;
+        self.maxOnsetLatency = 0.0;
+        self.keepRunning = True;
+        self.start();
+    
+    def playTone(self, frequency, duration):
+        '''
+        Queue one tone for playing.
+        @param frequency: pitch of the tone in Hz
+        @type frequency: float
+        @param duration: length of the tone in fractional seconds
+        @type duration: float
+        '''
+        self.playPcm(synthesizeTone(frequency, duration, self.sampleRate));
+    
+    def playPcm(self, pcm):
+        '''
+        Queue already synthesized samples for playing.
+        @param pcm: 16-bit signed little endian mono samples
+        @type pcm: string
+        '''
+        if not self.keepRunning:
+            raise RuntimeError("Called ToneEngine method after close() was called.");
+        self.toneQueue.put((pcm, time.time()));
+    
+    def flush(self):
+        '''
+        Drop all tones that have not started playing yet.
+        '''
+        while True:
+            try:
+                queuedItem = self.toneQueue.get_nowait();
+            except Queue.Empty:
+                return;
+            if queuedItem is None:
+                # Leave the stop request in place:
+                self.toneQueue.put(None);
+                return;
+    
+    def meanOnsetLatency(self):
+        '''
+        Mean time in fractional seconds from playTone() until the 
+        samples were handed to the sink. None if no tone was played yet.
+        '''
+        if self.numTonesPlayed == 0:
+            return None;
+        return self.sumOnsetLatency / self.numTonesPlayed;
+    
+    def close(self):
+        '''
+        Stop the playback thread after the queued tones, and close the sink.
+        '''
+        if not self.keepRunning:
+            return;
+        self.keepRunning = False;
+        self.toneQueue.put(None);
+        self.join();
+        self.sink.close();
+    
+    def run(self):
+        while True:
+            try:
+                if self.sink.continuous:
+                    queuedItem = self.toneQueue.get_nowait();
+                else:
+                    queuedItem = self.toneQueue.get();
+            except Queue.Empty:
+                # Keep the device running, so that the next
+                # tone does not wait for it to start up:
+                self.sink.write(self.silencePeriod);
+                continue;
+            if queuedItem is None:
+                return;
+            (pcm, enqueueTime) = queuedItem;
+            onsetLatency = time.time() - enqueueTime;
+            self.numTonesPlayed += 1;
+            self.sumOnsetLatency += onsetLatency;
+            self.maxOnsetLatency = max(self.maxOnsetLatency, onsetLatency);
+            self.sink.write(pcm);
+
+if __name__ == "__main__":
+    
+    import argparse;
+    parser = argparse.ArgumentParser(description="Play Morse tones, or write them to a WAV file.");
+    parser.add_argument('-f', '--frequency', type=float, default=300, help="pitch in Hz. Default: 300");
+    parser.add_argument('-d', '--duration', type=float, default=0.15, help="tone length in seconds. Default: 0.15");
+    parser.add_argument('-n', '--numTones', type=int, default=5, help="number of tones. Default: 5");
+    parser.add_argument('-o', '--wavFile', help="write to this WAV file instead of the sound card");
+    args = parser.parse_args();
+    
+    if args.wavFile is not None:
+        engine = ToneEngine(WavFileSink(args.wavFile));
+    else:
+        engine = ToneEngine();
+    for _ in range(args.numTones):
+        engine.playTone(args.frequency, args.duration);
+        time.sleep(2 * args.duration);
+    engine.close();
+    print("Sink: %s. Mean onset latency: %.1fms. Max: %.1fms" % (engine.sink.__class__.__name__, 
+                                                                  1000 * engine.meanOnsetLatency(),
+                                                                  1000 * engine.maxOnsetLatency));
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+import os;
+import sys;
+import unittest;
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src/morse_input'));
+from adaptiveSegmenter import AdaptiveSegmenter;
+
+class AdaptiveSegmenterTest(unittest.TestCase):
+    
+    SHORT_GAPS = (0.28, 0.30, 0.32);
+    LONG_GAPS  = (0.85, 0.90, 0.95);
+    
+    def setUp(self):
+        self.segmenter = AdaptiveSegmenter();
+    
+    def noteGaps(self, numRounds):
+        for _ in range(numRounds):
+            for gap in AdaptiveSegmenterTest.SHORT_GAPS + AdaptiveSegmenterTest.LONG_GAPS:
+                self.segmenter.noteGap(gap);
+
+    def testConfiguredDelaysUntilConfident(self):
+        self.assertEqual(self.segmenter.confidence(), 0.0);
+        # Fewer than MIN_SAMPLES per cluster:
+        self.noteGaps(1);
+        self.assertEqual(self.segmenter.confidence(), 0.0);
+        self.assertEqual(self.segmenter.letterDelay(0.5), 0.5);
+        self.assertEqual(self.segmenter.wordDelay(0.5, 1.5), 1.5);
+        # Six pauses per cluster of the fifteen for full confidence:
+        self.noteGaps(1);
+        self.assertAlmostEqual(self.segmenter.confidence(), 0.4);
+        self.assertEqual(self.segmenter.letterDelay(0.5), 0.5);
+    
+    def testAdaptedDelays(self):
+        self.noteGaps(5);
+        self.assertAlmostEqual(self.segmenter.confidence(), 1.0);
+        # Between the clusters, closer to the narrower short one:
+        letterDelay = self.segmenter.letterDelay(0.1);
+        self.assertAlmostEqual(letterDelay, 0.4973, places=4);
+        # The word threshold is 7/3 of the long cluster's mean, 
+        # counted from the end of the letter:
+        self.assertAlmostEqual(self.segmenter.wordDelay(0.1, 5.0), 0.9 * 7.0 / 3.0 - letterDelay);
+    
+    def testWordGapsAreNotClustered(self):
+        self.noteGaps(5);
+        self.segmenter.wordDelay(0.5, 1.5);
+        letterDelay = self.segmenter.letterDelay(0.5);
+        for _ in range(20):
+            self.segmenter.noteGap(3.0);
+        self.assertEqual(self.segmenter.numWordGaps, 20);
+        self.assertEqual(self.segmenter.letterDelay(0.5), letterDelay);
+    
+    def testIgnoresRests(self):
+        self.segmenter.noteGap(0);
+        self.segmenter.noteGap(AdaptiveSegmenter.MAX_GAP + 1);
+        self.assertEqual(len(self.segmenter.gaps), 0);
+    
+    def testForgetsOldGaps(self):
+        self.segmenter = AdaptiveSegmenter(windowSize=30);
+        self.noteGaps(5);
+        self.assertAlmostEqual(self.segmenter.letterDelay(0.1), 0.4973, places=4);
+        # The user speeds up, until the window holds only fast pauses:
+        for _ in range(5):
+            for gap in (0.14, 0.15, 0.16, 0.43, 0.45, 0.47):
+                self.segmenter.noteGap(gap);
+        self.assertTrue(0.16 < self.segmenter.letterDelay(0.1) < 0.43);
+        self.assertTrue(self.segmenter.letterDelay(0.1) < 0.3);
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+import os;
+import sys;
+import unittest;
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src/morse_input'));
+from morseCore import MorseCore, VirtualClock, Morse, TimeoutReason;
+from morseCodeTranslationKey import codeKey, completionProsignKey;
+
+class MorseCoreTest(unittest.TestCase):
+    
+    LETTER_DELAY = 0.5;
+    WORD_DELAY   = 1.0;
+    
+    def setUp(self):
+        self.clock = VirtualClock();
+        # (time, TimeoutReason, letters or rejected Morse):
+        self.segments = [];
+        self.candidates = [];
+        self.core = MorseCore(self.clock, callback=self.segmentEnded, candidatesCallback=self.candidatesChanged);
+        self.core.setInterLetterDelay(MorseCoreTest.LETTER_DELAY);
+        self.core.setInterWordDelay(MorseCoreTest.WORD_DELAY);
+    
+    def segmentEnded(self, reason, detail):
+        if reason == TimeoutReason.END_OF_LETTER:
+            detail = self.core.getAndRemoveAlphaStr();
+        self.segments.append((self.clock.now(), reason, detail));
+    
+    def candidatesChanged(self, morseSoFar, candidates):
+        self.candidates.append((morseSoFar, candidates));
+    
+    def key(self, element, numElements, duration):
+        '''
+        Key one sequence of dots or dashes, lasting duration seconds.
+        '''
+        self.core.sequenceStarted();
+        self.clock.advanceBy(duration);
+        self.core.sequenceStopped();
+        self.core.addMorseElements(element, numElements);
+
+    def testLetterThenWord(self):
+        self.clock.advanceTo(1.0);
+        self.key(Morse.DASH, 1, 0.2);
+        self.assertEqual(self.candidates[-1][0], '-');
+        self.assertEqual(self.candidates[-1][1][0], 't');
+        self.clock.runUntilIdle();
+        self.assertEqual(len(self.segments), 2);
+        (letterTime, reason, letter) = self.segments[0];
+        self.assertAlmostEqual(letterTime, 1.2 + MorseCoreTest.LETTER_DELAY);
+        self.assertEqual((reason, letter), (TimeoutReason.END_OF_LETTER, 't'));
+        (wordTime, reason, _) = self.segments[1];
+        self.assertAlmostEqual(wordTime, 1.2 + MorseCoreTest.LETTER_DELAY + MorseCoreTest.WORD_DELAY);
+        self.assertEqual(reason, TimeoutReason.END_OF_WORD);
+    
+    def testPausesWithinLetter(self):
+        # 'a', with a pause shorter than the letter delay:
+        self.key(Morse.DOT, 1, 0.1);
+        self.clock.advanceBy(MorseCoreTest.LETTER_DELAY - 0.1);
+        self.key(Morse.DASH, 1, 0.3);
+        self.assertTrue(self.core.inMidLetter());
+        self.clock.advanceBy(MorseCoreTest.LETTER_DELAY);
+        self.assertEqual(self.segments[-1][1:], (TimeoutReason.END_OF_LETTER, 'a'));
+        self.assertFalse(self.core.inMidLetter());
+        # 'e', before the word ends:
+        self.clock.advanceBy(MorseCoreTest.WORD_DELAY - 0.1);
+        self.key(Morse.DOT, 1, 0.1);
+        self.clock.runUntilIdle();
+        self.assertEqual([segment[1:] for segment in self.segments],
+                         [(TimeoutReason.END_OF_LETTER, 'a'), 
+                          (TimeoutReason.END_OF_LETTER, 'e'), 
+                          (TimeoutReason.END_OF_WORD, '')]);
+    
+    def testBadInputRejectedAtOnce(self):
+        self.key(Morse.DASH, 8, 1.0);
+        self.assertEqual(self.segments, [(1.0, TimeoutReason.BAD_MORSE_INPUT, '--------')]);
+        self.assertFalse(self.core.inMidLetter());
+        # The pending end-of-letter timeout reports nothing more:
+        self.clock.runUntilIdle();
+        self.assertEqual(len(self.segments), 1);
+    
+    def testLateElements(self):
+        # The elements of the sequence arrive after the letter delay:
+        self.core.setSequenceWaitTime(0.1);
+        self.core.sequenceStarted();
+        self.clock.advanceBy(0.2);
+        self.core.sequenceStopped();
+        self.clock.advanceBy(MorseCoreTest.LETTER_DELAY + 0.05);
+        self.assertEqual(self.segments, []);
+        self.core.addMorseElements(Morse.DOT, 3);
+        self.clock.advanceBy(0.05);
+        self.assertEqual(self.segments[-1][1:], (TimeoutReason.END_OF_LETTER, 's'));
+    
+    def testSetMorseCodeKey(self):
+        self.key(Morse.DOT, 2, 0.2);
+        morseCodeKey = dict(codeKey);
+        morseCodeKey.update(completionProsignKey);
+        # Takes effect for the letter in progress:
+        self.core.setMorseCodeKey(morseCodeKey);
+        self.key(Morse.DASH, 2, 0.2);
+        self.clock.advanceBy(MorseCoreTest.LETTER_DELAY);
+        self.assertEqual(self.segments[-1][1:], (TimeoutReason.END_OF_LETTER, '\x11'));
+        self.assertTrue(self.core.getMorseCodeKey() is morseCodeKey);
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+import os;
+import sys;
+import unittest;
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src/morse_input'));
+from morseDecodeTree import MorseDecodeTree;
+from morseCodeTranslationKey import codeKey, completionProsignKey;
+
+class MorseDecodeTreeTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tree = MorseDecodeTree();
+
+    def testDecodesEveryCode(self):
+        for (code, letter) in codeKey.items():
+            self.assertEqual(self.tree.decode(code), letter);
+    
+    def testNonCodes(self):
+        self.assertEqual(self.tree.decode(''), None);
+        # Starts codes, but is none itself:
+        self.assertEqual(self.tree.decode('..--'), None);
+        # Starts no code:
+        self.assertEqual(self.tree.decode('--------'), None);
+        self.assertEqual(self.tree.descend('--------'), None);
+    
+    def testCandidates(self):
+        # Every letter is a candidate of the empty code:
+        self.assertEqual(sorted(self.tree.root.candidates), sorted(codeKey.values()));
+        # Shortest codes first:
+        self.assertEqual(self.tree.descend('..-').candidates, ('u', 'f', '2', '?'));
+        for (code, letter) in codeKey.items():
+            for prefixLen in range(len(code) + 1):
+                self.assertTrue(letter in self.tree.descend(code[:prefixLen]).candidates);
+    
+    def testAdvance(self):
+        node = self.tree.root;
+        for element in '-.-.':
+            node = self.tree.advance(node, element);
+        self.assertEqual(node.letter, 'c');
+        self.assertEqual(self.tree.advance(node, 'x'), None);
+    
+    def testOtherKey(self):
+        morseCodeKey = dict(codeKey);
+        morseCodeKey.update(completionProsignKey);
+        tree = MorseDecodeTree(morseCodeKey);
+        self.assertEqual(tree.decode('..--'), '\x11');
+        self.assertEqual(tree.decode('..-'), 'u');
+        self.assertEqual(tree.descend('..--').candidates, ('\x11', '2', '\x12', '\x13', '?'));
+    
+    def testBadKey(self):
+        self.assertRaises(ValueError, MorseDecodeTree, {'.x' : 'a'});
+
+if __name__ == '__main__':
+    unittest.main();
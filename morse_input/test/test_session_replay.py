@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+import os;
+import sys;
+import json;
+import shutil;
+import tempfile;
+import unittest;
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src/morse_input'));
+from morseCore import TimeoutReason;
+from morseSessionLog import SessionRecorder, SessionEvent, readSessionLog;
+from morseReplay import SessionReplayer;
+from morseCodeTranslationKey import codeKey, completionProsignKey;
+
+class SessionReplayTest(unittest.TestCase):
+    '''
+    Writes small session logs, and replays them end to end.
+    '''
+    
+    OPTIONS = {'dotDuration'         : 0.05,
+               'dashDuration'        : 0.15,
+               'interSigPauseDots'   : 0.05,
+               'interSigPauseDashes' : 0.05,
+               'interLetterTime'     : 0.4,
+               'interWordTime'       : 1.0,
+               'automaticMorse'      : True,
+               'adaptiveSegmentation': False,
+               'waitDashDotThreadsIdleTime' : 0.1,
+               'clickSegmentation'   : False,
+               };
+    
+    def setUp(self):
+        self.logDir = tempfile.mkdtemp();
+        self.logPath = os.path.join(self.logDir, 'session.jsonl');
+        
+    def tearDown(self):
+        shutil.rmtree(self.logDir);
+    
+    def writeSession(self, words, morseCodeKey=None, truncate=False):
+        '''
+        Write a session log in which each letter of the given 
+        words is keyed as single dots and dashes on their buttons. 
+        The letters and word ends are recorded as Morser would have.
+        @param words: per word, the Morse codes of its letters
+        @type words: [[string]]
+        '''
+        recorder = SessionRecorder(self.logPath, morseCodeKey);
+        recorder.close();
+        with open(self.logPath, 'a') as logFd:
+            def write(event, t, **fields):
+                fields.update({'ev' : event, 't' : t});
+                logFd.write(json.dumps(fields) + '\n');
+            write(SessionEvent.OPTIONS, 0.0, options=SessionReplayTest.OPTIONS);
+            t = 0.5;
+            for word in words:
+                for code in word:
+                    for element in code:
+                        button = 'dot' if element == '.' else 'dash';
+                        write(SessionEvent.ENTER, t, button=button);
+                        t += 0.06 if element == '.' else 0.16;
+                        write(SessionEvent.EXIT, t, button=button);
+                        t += 0.1;
+                    letter = (morseCodeKey or codeKey)[code];
+                    write(SessionEvent.SEGMENT, t + 0.4, reason=TimeoutReason.END_OF_LETTER, letter=letter);
+                    t += 0.5;
+                write(SessionEvent.SEGMENT, t + 0.9, reason=TimeoutReason.END_OF_WORD);
+                t += 1.2;
+            if truncate:
+                logFd.write('{"ev":"enter","butt');
+
+    def testReplay(self):
+        self.writeSession([['.-', '-.'], ['-', '.']]);
+        records = readSessionLog(self.logPath);
+        self.assertEqual(records[0]['ev'], SessionEvent.SESSION);
+        result = SessionReplayer(records).replay();
+        self.assertEqual(result.text, 'an te ');
+        self.assertEqual(result.numBadInputs, 0);
+        self.assertEqual(result.agreement(), 1.0);
+        # Same letters with adaptive segmentation, which is not
+        # confident after so few pauses:
+        result = SessionReplayer(records).replay(optionOverrides={'adaptiveSegmentation' : True});
+        self.assertEqual(result.text, 'an te ');
+    
+    def testLongerLetterDelayJoinsLetters(self):
+        self.writeSession([['.', '.']]);
+        result = SessionReplayer.fromFile(self.logPath).replay(optionOverrides={'interLetterTime' : 1.0});
+        self.assertEqual(result.text, 'i ');
+        self.assertTrue(result.agreement() < 1.0);
+    
+    def testTruncatedLog(self):
+        self.writeSession([['-']], truncate=True);
+        self.assertEqual(SessionReplayer.fromFile(self.logPath).replay().text, 't ');
+    
+    def testRecordedCodeKey(self):
+        morseCodeKey = dict(codeKey);
+        morseCodeKey.update(completionProsignKey);
+        self.writeSession([['..--']], morseCodeKey);
+        self.assertEqual(SessionReplayer.fromFile(self.logPath).replay().text, '\x11 ');
+        # An explicit code key wins:
+        result = SessionReplayer.fromFile(self.logPath, codeKey).replay();
+        self.assertEqual(result.numBadInputs, 1);
+    
+    def testNotASessionLog(self):
+        with open(self.logPath, 'w') as logFd:
+            logFd.write('{"ev":"enter","t":0.0}\n');
+        self.assertRaises(ValueError, readSessionLog, self.logPath);
+
+if __name__ == '__main__':
+    unittest.main();
@@ -43,10 +43,13 @@ except ImportError:
 import sys;
 import os;
 import signal;
+import re;
 from functools import partial
 
 try:
-    from word_completion.word_collection import WordCollection;
+    from word_completion.word_collection import WordCollection, CompletionKind;
+    from word_completion.async_completion import AsyncCompleter;
+    from word_completion.dictionary_bundles import DictionaryBundleSet;
 except ImportError as e:
     print(`e`);
     print("Roslib is unavailable. So your PYTHONPATH will need to include:\n" +
@@ -57,6 +60,16 @@ except ImportError as e:
 import python_qt_binding;
 from python_qt_binding.QtGui import QApplication, QMainWindow, QDialog, QPushButton, QTextEdit, QTextCursor, QShortcut, QErrorMessage;
 from python_qt_binding.QtGui import QMessageBox, QWidget;
+from python_qt_binding.QtCore import QObject, Signal;
+
+# ----------------------------------------------- Class ProserSignals ------------------------------------
+
+class ProserSignals(QObject):
+    '''
+    Signals for delivering results from worker threads to the GUI thread. 
+    '''
+    # Request ID, and list of (completion, numWords) pairs:
+    completionsReady = Signal(int, object);
 
 # ----------------------------------------------- Class DialogService ------------------------------------
 
@@ -145,22 +158,50 @@ class Proser(QMainWindow):
     REMOTE_PASTE_AND_SPEAK_SIG = signal.SIGUSR2;
     
     
-    def __init__(self, dictDir=None, userDictFilePath=None):
+    def __init__(self, dictDir=None, userDictFilePath=None, bundleRoot=None, bundleName=None):
+        '''
+        @param dictDir: see WordCollection. Ignored if bundleRoot is given.
+        @type dictDir: string
+        @param userDictFilePath: see WordCollection. Ignored if bundleRoot is given.
+        @type userDictFilePath: string
+        @param bundleRoot: if given, directory of compiled per-language dictionary 
+                           bundles (see DictionaryBundleSet). Ctrl-L then switches
+                           to the next bundle.
+        @type bundleRoot: string
+        @param bundleName: bundle to start with. If None, the alphabetically first one.
+        @type bundleName: string
+        '''
         
         super(Proser,self).__init__();
         
         # Get the word completion machinery:
-        self.completer = WordCollection(dictDir=dictDir, userDictFilePath=userDictFilePath);
+        if bundleRoot is None:
+            self.completer = WordCollection(dictDir=dictDir, userDictFilePath=userDictFilePath);
+        else:
+            self.completer = DictionaryBundleSet(bundleRoot, bundleName);
+        # Searches run in a worker thread, so typing never waits for them.
+        # Results arrive in the GUI thread via a queued signal:
+        self.signals = ProserSignals();
+        self.asyncCompleter = AsyncCompleter(self.completer, self.signals.completionsReady.emit);
         
         # Fill our space with the UI:
         guiPath = os.path.join(os.path.dirname(__file__), 'qt_files/Proser/proser.ui');
         self.ui = python_qt_binding.loadUi(guiPath, self);
-        self.setWindowTitle("Proser (V" + Proser.VERSION + ")");
+        self.updateWindowTitle();
         self.completionButtons = [self.wordOption1Button,
                                   self.wordOption2Button,
                                   self.wordOption3Button,
                                   self.wordOption4Button,
                                   self.wordOption5Button];
+        # Number of typed words that the completion on each
+        # button replaces. More than one for phrase completions:
+        self.completionNumWords = {};
+        # CompletionKind of the completion on each button.
+        # Abbreviation expansions replace the typed abbreviation:
+        self.completionKinds = {};
+        # Most recent partially typed word, used to notice
+        # when the user finishes typing a word:
+        self.lastWordSoFar = '';
         self.clearCompletionButtons();
         self.dialogService = DialogService(parent=self);
         self.connectWidgets();
@@ -175,6 +216,7 @@ class Proser(QMainWindow):
         self.clearButton.clicked.connect(self.actionClear);
         self.copyButton.clicked.connect(self.actionCopy);
         self.textArea.textChanged.connect(self.actionTextChanged);
+        self.signals.completionsReady.connect(self.actionCompletionsReady);
         for buttonObj in self.completionButtons:
             buttonObj.clicked.connect(partial(self.actionCompletionButton,buttonObj));
             
@@ -186,6 +228,9 @@ class Proser(QMainWindow):
             shortcut.activated.connect(partial(self.actionKeyShortcut, i));
             
         self.addToDictButton.clicked.connect(self.actionAddToDictButton);
+        if isinstance(self.completer, DictionaryBundleSet):
+            shortcut = QShortcut(self.tr('Ctrl+L'), self);
+            shortcut.activated.connect(self.actionNextDictionary);
         self.clearSpeakEasyButton.clicked.connect(self.actionClearSpeakEasyText);
         self.sayButton.clicked.connect(self.actionSendTextToSpeakEasy);
     
@@ -214,35 +259,92 @@ class Proser(QMainWindow):
         '''
         Act on notification that text in the text panel changed.
         This notification occurs with every one of the user's keystroke.
-        In response this method updates the text completion buttons.
+        In response this method requests completions for the text before
+        the cursor. The completion buttons are updated when the results 
+        arrive (see actionCompletionsReady()).
         '''
         wordSoFar = self.getWordSoFar();
         if len(wordSoFar) == 0:
+            # User just ended a word. Let the completer
+            # favor it for the rest of the session:
+            if len(self.lastWordSoFar) > 0:
+                self.completer.noteWordUsed(self.lastWordSoFar);
+            self.lastWordSoFar = '';
+            self.asyncCompleter.cancel();
             self.clearCompletionButtons();
             return;
-        completions = self.completer.prefix_search(wordSoFar, cutoffRank=len(self.completionButtons));
-        if len(completions) == 0:
-            self.clearCompletionButtons();
+        self.lastWordSoFar = wordSoFar;
+        self.asyncCompleter.phrase_prefix_search(self.getPhraseSoFar(wordSoFar), cutoffRank=len(self.completionButtons));
+        
+    def actionCompletionsReady(self, requestID, completions):
+        '''
+        Completions requested by actionTextChanged() have arrived. Show
+        them on the completion buttons, unless the text changed again since
+        the request.
+        @param requestID: ID under which the completions were requested.
+        @type requestID: int
+        @param completions: triples of completion, number of typed words it replaces, and CompletionKind
+        @type completions: [(string, int, int)]
+        '''
+        if not self.asyncCompleter.isLatest(requestID):
+            return;
         #print str(completions)
         self.clearCompletionButtons();
         for index,button in enumerate(self.completionButtons):
             if index >= len(completions):
                 return;
-            button.setText(completions[index]);
+            (completion, numWords, kind) = completions[index];
+            button.setText(completion);
+            self.completionNumWords[button] = numWords;
+            self.completionKinds[button] = kind;
             
+    def actionNextDictionary(self):
+        '''
+        Switch to the next dictionary bundle, such as the next language.
+        '''
+        self.completer.switchToNext();
+        self.asyncCompleter.cancel();
+        self.clearCompletionButtons();
+        self.updateWindowTitle();
+        self.actionTextChanged();
+
     def actionCompletionButton(self, buttonObj):
         '''
         One of the text completion buttons was pushed. Insert the 
-        respective text at the current cursor position.
+        respective text at the current cursor position. For phrase
+        completions, the typed beginning of the phrase may span several words.
+        Abbreviation expansions replace the typed abbreviation.
         @param buttonObj: the QPushButton object that was pushed.
         @type buttonObj: QPushButton
         '''
         text = buttonObj.text().encode('UTF-8');
-        alreadyTypedTxt = self.getWordSoFar();
-        if len(alreadyTypedTxt) >= len(text):
+        numWords = self.completionNumWords.get(buttonObj, 1);
+        kind = self.completionKinds.get(buttonObj, CompletionKind.WORD);
+        if numWords > 1:
+            alreadyTypedTxt = self.getTypedPhraseTail(numWords);
+        else:
+            alreadyTypedTxt = self.getWordSoFar();
+        # Phrase entries separate their words by single spaces:
+        typedPhrase = ' '.join(alreadyTypedTxt.split());
+        if kind != CompletionKind.ABBREVIATION and len(typedPhrase) >= len(text):
             return;
-        textToAppend =  text[len(alreadyTypedTxt):] + " ";
-        self.textArea.textCursor().insertText(textToAppend);
+        textCursor = self.textArea.textCursor();
+        # Completion lookup ignores case. If the completion is
+        # a capitalized dictionary entry, such as a proper name,
+        # replace what was typed to restore the capitalization.
+        # Otherwise keep the user's capitalization of the fragment:
+        if kind == CompletionKind.ABBREVIATION or\
+           (text != text.lower() and text[:len(typedPhrase)] != typedPhrase):
+            for _ in range(len(alreadyTypedTxt.decode('UTF-8'))):
+                textCursor.deletePreviousChar();
+            textToAppend = text + " ";
+        else:
+            textToAppend =  text[len(typedPhrase):] + " ";
+        self.completer.noteWordUsed(text);
+        # The accepted text was noted; don't note the fragment
+        # when the inserted space ends the word:
+        self.lastWordSoFar = '';
+        textCursor.insertText(textToAppend);
         # Ensure that text area gets focus again:
         self.focusOnTextArea();
 
@@ -266,9 +368,11 @@ class Proser(QMainWindow):
         Words added by this method are appended to the dict_files/dictUserRankAndWord.txt
         file in the word_completion package. A default rank of 100 is attached.
         
-        The method attempts to warn the user if the text selection seems to span
-        multiple words. In that case, a warning is displayed. A confirmation
-        dialog is raised in case of success.
+        The selection may be a single word, or a phrase of several words,
+        which is then offered as one completion. Runs of whitespace in a phrase
+        are reduced to single spaces. The method attempts to warn the user if the
+        text selection seems to span multiple sentences or clauses. In that case, 
+        a warning is displayed. A confirmation dialog is raised in case of success.
         @raise ValueError: if provided rank < 0. 
         '''
         # The following used to be a keyword arg, but keyword args don't
@@ -279,16 +383,17 @@ class Proser(QMainWindow):
             raise ValueError("Rank must be greater than or equal to zero");
         try:
             currCursor = self.textArea.textCursor();
-            selText = currCursor.selectedText().encode('UTF-8');
+            # Paragraph breaks in a selection are U+2029:
+            selText = currCursor.selectedText().replace(u'\u2029', ' ').encode('UTF-8');
+            selText = ' '.join(selText.split());
             if len(selText) == 0:
-                self.dialogService.showErrorMsg("Please select a word to be added to the dictionary.");
+                self.dialogService.showErrorMsg("Please select a word or phrase to be added to the dictionary.");
                 return;
-            if len(selText.split(' ')) != 1 or\
-               len(selText.split(',')) != 1 or\
+            if len(selText.split(',')) != 1 or\
                len(selText.split('.')) != 1 or\
                len(selText.split(';')) != 1 or\
                len(selText.split(':')) != 1:
-                self.dialogService.showErrorMsg("Please select only one word to be added to the dictionary.");
+                self.dialogService.showErrorMsg("Please select only one word or phrase to be added to the dictionary.");
                 return;
             self.completer.addToUserDict(selText, rankInt=rank);
             self.dialogService.showInfoMsg("Added %s to dictionary." % selText);
@@ -305,6 +410,48 @@ class Proser(QMainWindow):
         wordFragment = currCursor.selectedText().encode('UTF-8');
         #print "Frag (cur at: " + str(currCursor.position()) + "): " + str(wordFragment);
         return wordFragment;      
+    
+    def getTextBeforeCursor(self):
+        '''
+        Service method to retrieve the text between the start of the 
+        current paragraph and the cursor.
+        '''
+        currCursor = self.textArea.textCursor();
+        currCursor.movePosition(QTextCursor.StartOfBlock, QTextCursor.KeepAnchor);
+        return currCursor.selectedText().encode('UTF-8');
+    
+    def getPhraseSoFar(self, wordSoFar):
+        '''
+        Service method to retrieve the words typed just before the most
+        recent partially typed word, followed by that word. Only as many
+        words are returned as the longest phrase in the dictionary contains.
+        @param wordSoFar: the partially typed word, as returned by getWordSoFar()
+        @type wordSoFar: string
+        @rtype: [string]
+        '''
+        numPrecedingWords = self.completer.maxPhraseWords - 1;
+        if numPrecedingWords == 0:
+            return [wordSoFar];
+        textBeforeCursor = self.getTextBeforeCursor();
+        precedingWords = textBeforeCursor.split();
+        if len(textBeforeCursor) > 0 and not textBeforeCursor[-1].isspace():
+            # The last word before the cursor is wordSoFar itself:
+            precedingWords = precedingWords[:-1];
+        return precedingWords[-numPrecedingWords:] + [wordSoFar];
+    
+    def getTypedPhraseTail(self, numWords):
+        '''
+        Service method to retrieve the text from the start of the
+        numWords-th last word before the cursor to the cursor, with its
+        original spacing.
+        @param numWords: number of words to include
+        @type numWords: int
+        '''
+        textBeforeCursor = self.getTextBeforeCursor();
+        wordStarts = [match.start() for match in re.finditer(r'\S+', textBeforeCursor)];
+        if len(wordStarts) < numWords:
+            return textBeforeCursor;
+        return textBeforeCursor[wordStarts[-numWords]:];
         
     def clearCompletionButtons(self):
         '''
@@ -312,6 +459,17 @@ class Proser(QMainWindow):
         '''
         for completionButton in self.completionButtons:
             completionButton.setText(completionButton.setText(Proser.NO_COMPLETION_TEXT));
+        self.completionNumWords.clear();
+        self.completionKinds.clear();
+    
+    def updateWindowTitle(self):
+        '''
+        Service method to show the version, and the active dictionary bundle, if any.
+        '''
+        title = "Proser (V" + Proser.VERSION + ")";
+        if isinstance(self.completer, DictionaryBundleSet):
+            title += " - " + self.completer.activeBundleName();
+        self.setWindowTitle(title);
     
     def focusOnTextArea(self):
         '''
@@ -400,7 +558,11 @@ if __name__ == '__main__':
     
     app = QApplication(sys.argv);
     #QApplication.setStyle(QCleanlooksStyle())
-    proser = Proser();
+    # Optional arguments: dictionary bundle root directory, and the bundle to start with:
+    if len(sys.argv) > 1:
+        proser = Proser(bundleRoot=sys.argv[1], bundleName=sys.argv[2] if len(sys.argv) > 2 else None);
+    else:
+        proser = Proser();
     app.exec_();
     sys.exit();
     
@@ -681,8 +681,7 @@ class TBoard(QWidget):
         self.tickerTape.setText(visibleEncoding); 
     
     def showRemainingWords(self):
-        remainingWords = self.wordCollection.prefix_search(self.encEvolvingWord);
-        rankSortedWords = sorted(remainingWords, key=self.wordCollection.rank);
+        rankSortedWords = self.wordCollection.ranked_prefix_search(self.encEvolvingWord);
         self.wordList.clear();
         
         self.wordList.addItems(rankSortedWords);
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+import threading;
+
+class AsyncCompleter(threading.Thread):
+    '''
+    Runs completion queries against a WordCollection in a worker
+    thread, so that the caller, usually a GUI thread, never waits for 
+    a search. Results are passed to a callback, together with the ID
+    that the request received when it was submitted.
+    
+    Results are latest-wins: a new request replaces any request that
+    has not yet started, and results of requests that were superseded
+    while they ran are dropped. During fast typing, only the query for
+    the most recent prefix therefore reaches the callback.
+    
+    The callbacks run in the worker thread. GUI clients forward
+    the result to their GUI thread, for instance by emitting a Qt signal
+    from the callback; signals emitted in another thread are queued to
+    the receiver's thread. Clients should check isLatest() when the result
+    arrives, since newer requests may have been submitted meanwhile.
+    
+    The worker thread relies on WordCollection lookups being safe
+    while the GUI thread adds words.
+    '''
+    
+    def __init__(self, wordCollection, resultCallback, errorCallback=None):
+        '''
+        Create and start the worker thread.
+        @param wordCollection: collection to query
+        @type wordCollection: WordCollection
+        @param resultCallback: called with the request ID and the query result
+        @type resultCallback: Python callable
+        @param errorCallback: called with the request ID and the exception if a query 
+                              raises. If None, the error is printed.
+        @type errorCallback: Python callable
+        '''
+        super(AsyncCompleter, self).__init__(name="AsyncCompleter");
+        self.daemon = True;
+        self.wordCollection = wordCollection;
+        self.resultCallback = resultCallback;
+        self.errorCallback = errorCallback;
+        self.requestCondition = threading.Condition();
+        # (requestID, query function, args, kwargs) of the request waiting to run:
+        self.pendingRequest = None;
+        self.latestRequestID = 0;
+        self.keepRunning = True;
+        self.start();
+        
+    def prefix_search(self, prefix, cutoffRank=None):
+        '''
+        Submit WordCollection.prefix_search(prefix, cutoffRank).
+        @return: ID of the request
+        @rtype: int
+        '''
+        return self.submit(self.wordCollection.prefix_search, prefix, cutoffRank=cutoffRank);
+    
+    def phrase_prefix_search(self, words, cutoffRank=None):
+        '''
+        Submit WordCollection.phrase_prefix_search(words, cutoffRank).
+        @return: ID of the request
+        @rtype: int
+        '''
+        return self.submit(self.wordCollection.phrase_prefix_search, words, cutoffRank=cutoffRank);
+        
+    def submit(self, queryFunc, *args, **kwargs):
+        '''
+        Submit an arbitrary query, which replaces any request
+        that has not started yet.
+        @param queryFunc: function to call in the worker thread with the remaining arguments
+        @type queryFunc: Python callable
+        @return: ID of the request
+        @rtype: int
+        '''
+        with self.requestCondition:
+            self.latestRequestID += 1;
+            self.pendingRequest = (self.latestRequestID, queryFunc, args, kwargs);
+            self.requestCondition.notify();
+            return self.latestRequestID;
+    
+    def cancel(self):
+        '''
+        Drop the pending request, and the result of a running one.
+        For instance when the text no longer ends in a word.
+        '''
+        with self.requestCondition:
+            self.latestRequestID += 1;
+            self.pendingRequest = None;
+    
+    def isLatest(self, requestID):
+        '''
+        True if no request was submitted or cancelled after the one with the given ID.
+        '''
+        return requestID == self.latestRequestID;
+    
+    def shutdown(self):
+        '''
+        Stop the worker thread after the currently running query, if any.
+        '''
+        with self.requestCondition:
+            self.keepRunning = False;
+            self.pendingRequest = None;
+            self.requestCondition.notify();
+
+    def run(self):
+        while True:
+            with self.requestCondition:
+                while self.keepRunning and self.pendingRequest is None:
+                    self.requestCondition.wait();
+                if not self.keepRunning:
+                    return;
+                (requestID, queryFunc, args, kwargs) = self.pendingRequest;
+                self.pendingRequest = None;
+            try:
+                result = queryFunc(*args, **kwargs);
+            except Exception as e:
+                if not self.isLatest(requestID):
+                    continue;
+                if self.errorCallback is None:
+                    print("Completion request failed: %s" % `e`);
+                else:
+                    self.errorCallback(requestID, e);
+                continue;
+            if self.isLatest(requestID):
+                self.resultCallback(requestID, result);
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+import bisect;
+import heapq;
+import json;
+import threading;
+import time;
+
+class Histogram(object):
+    '''
+    Fixed-bucket histogram. Recording a value costs one binary search
+    over the bucket boundaries. Percentiles are approximated by the
+    upper boundary of the bucket in which they fall.
+    '''
+    
+    def __init__(self, bucketBounds):
+        '''
+        @param bucketBounds: ascending upper bucket boundaries. Values larger than 
+                             the last boundary are counted in an overflow bucket.
+        @type bucketBounds: [float]
+        '''
+        self.bucketBounds = list(bucketBounds);
+        self.reset();
+        
+    def reset(self):
+        self.bucketCounts = [0] * (len(self.bucketBounds) + 1);
+        self.count = 0;
+        self.total = 0;
+        self.minValue = None;
+        self.maxValue = None;
+    
+    def record(self, value):
+        self.bucketCounts[bisect.bisect_left(self.bucketBounds, value)] += 1;
+        self.count += 1;
+        self.total += value;
+        if self.minValue is None or value < self.minValue:
+            self.minValue = value;
+        if self.maxValue is None or value > self.maxValue:
+            self.maxValue = value;
+    
+    def merge(self, other):
+        '''
+        Add the values recorded in another histogram with the same
+        bucket boundaries, for instance one from another process.
+        @param other: histogram to add
+        @type other: Histogram
+        @raise ValueError: if the bucket boundaries differ.
+        '''
+        if other.bucketBounds != self.bucketBounds:
+            raise ValueError("Cannot merge histograms with different buckets.");
+        self.bucketCounts = [count + otherCount for (count, otherCount) in zip(self.bucketCounts, other.bucketCounts)];
+        self.count += other.count;
+        self.total += other.total;
+        if other.minValue is not None and (self.minValue is None or other.minValue < self.minValue):
+            self.minValue = other.minValue;
+        if other.maxValue is not None and (self.maxValue is None or other.maxValue > self.maxValue):
+            self.maxValue = other.maxValue;
+    
+    def mean(self):
+        if self.count == 0:
+            return None;
+        return self.total / float(self.count);
+    
+    def percentile(self, percent):
+        '''
+        Return the approximate value below which the given percentage
+        of recorded values fall. None if nothing was recorded.
+        @param percent: number between 0 and 100
+        @type percent: float
+        '''
+        if self.count == 0:
+            return None;
+        wantedCount = percent / 100.0 * self.count;
+        cumulativeCount = 0;
+        for (bucketIndex, bucketCount) in enumerate(self.bucketCounts):
+            cumulativeCount += bucketCount;
+            if cumulativeCount >= wantedCount and bucketCount > 0:
+                if bucketIndex < len(self.bucketBounds):
+                    return min(self.bucketBounds[bucketIndex], self.maxValue);
+                return self.maxValue;
+        return self.maxValue;
+    
+    def toDict(self):
+        return {
+                'count'   : self.count,
+                'mean'    : self.mean(),
+                'min'     : self.minValue,
+                'max'     : self.maxValue,
+                'p50'     : self.percentile(50),
+                'p90'     : self.percentile(90),
+                'p99'     : self.percentile(99),
+                'buckets' : zip(self.bucketBounds + ['inf'], self.bucketCounts)
+                };
+
+class CompletionMetrics(object):
+    '''
+    Collects timing and size measurements from a WordCollection:
+    
+      - per-operation latency histograms (seconds), 
+      - prefix search result counts, 
+      - tree nodes visited per prefix search. The underlying C tree 
+        does not report its traversal, so the number of candidate
+        words the traversal produced is recorded as the proxy,
+      - the slowest prefixes seen,
+      - dictionary load time, and an estimate of the memory used.
+    
+    A WordCollection only measures while it has a metrics instance
+    attached (see WordCollection.enableMetrics()). Otherwise the 
+    cost is one attribute test per operation.
+    '''
+    
+    # 1 microsecond to ~1 second, doubling:
+    LATENCY_BUCKETS = [0.000001 * 2**i for i in range(21)];
+    # 0, 1, 2, 4, ... 65536
+    COUNT_BUCKETS = [0] + [2**i for i in range(17)];
+    NUM_SLOWEST_PREFIXES = 20;
+    
+    def __init__(self):
+        self.lock = threading.Lock();
+        self.dumpThread = None;
+        self.reset();
+
+    def reset(self):
+        with self.lock:
+            self.latencies = {};
+            self.resultCounts = Histogram(CompletionMetrics.COUNT_BUCKETS);
+            self.nodeVisits = Histogram(CompletionMetrics.COUNT_BUCKETS);
+            # Min-heap of (latency, prefix); holds the slowest prefixes:
+            self.slowestPrefixes = [];
+            self.loadTime = None;
+            self.memoryEstimate = None;
+
+    def recordLatency(self, operationName, seconds):
+        '''
+        Record the duration of one operation.
+        @param operationName: name of the operation, e.g. 'prefix_search'
+        @type operationName: string
+        @param seconds: duration
+        @type seconds: float
+        '''
+        with self.lock:
+            try:
+                histogram = self.latencies[operationName];
+            except KeyError:
+                histogram = self.latencies[operationName] = Histogram(CompletionMetrics.LATENCY_BUCKETS);
+            histogram.record(seconds);
+    
+    def recordPrefixSearch(self, prefix, seconds, numNodesVisited, numResults):
+        '''
+        Record one prefix search.
+        @param prefix: the prefix that was searched
+        @type prefix: string
+        @param seconds: duration of the search, including any rank sorting
+        @type seconds: float
+        @param numNodesVisited: number of tree entries the search examined
+        @type numNodesVisited: int
+        @param numResults: length of the returned list
+        @type numResults: int
+        '''
+        self.recordLatency('prefix_search', seconds);
+        with self.lock:
+            self.nodeVisits.record(numNodesVisited);
+            self.resultCounts.record(numResults);
+            if len(self.slowestPrefixes) < CompletionMetrics.NUM_SLOWEST_PREFIXES:
+                heapq.heappush(self.slowestPrefixes, (seconds, prefix));
+            elif seconds > self.slowestPrefixes[0][0]:
+                heapq.heapreplace(self.slowestPrefixes, (seconds, prefix));
+
+    def recordLoad(self, seconds, memoryEstimate):
+        '''
+        Record the time it took to build the dictionary, and the estimated memory it occupies.
+        @param seconds: load time
+        @type seconds: float
+        @param memoryEstimate: bytes
+        @type memoryEstimate: int
+        '''
+        self.recordLatency('createDictStructureFromFiles', seconds);
+        with self.lock:
+            self.loadTime = seconds;
+            self.memoryEstimate = memoryEstimate;
+    
+    def report(self):
+        '''
+        Return all measurements as a dict that is suitable for JSON export.
+        '''
+        with self.lock:
+            return {
+                    'time'            : time.time(),
+                    'latencies'       : dict([(operationName, histogram.toDict()) for (operationName, histogram) in self.latencies.items()]),
+                    'resultCounts'    : self.resultCounts.toDict(),
+                    'nodeVisits'      : self.nodeVisits.toDict(),
+                    'slowestPrefixes' : sorted(self.slowestPrefixes, reverse=True),
+                    'loadTime'        : self.loadTime,
+                    'memoryEstimate'  : self.memoryEstimate
+                    };
+    
+    def dumpToFile(self, filePath):
+        '''
+        Append the current report() as one line of JSON to the given file.
+        @param filePath: file to append to.
+        @type filePath: string
+        '''
+        reportLine = json.dumps(self.report());
+        with open(filePath, 'a') as fd:
+            fd.write(reportLine + '\n');
+    
+    def startPeriodicDump(self, filePath, intervalSecs=60.0):
+        '''
+        Start a daemon thread that calls dumpToFile() every intervalSecs seconds.
+        @param filePath: file to append to.
+        @type filePath: string
+        @param intervalSecs: time between dumps
+        @type intervalSecs: float
+        '''
+        if self.dumpThread is not None:
+            return;
+        stopEvent = threading.Event();
+        def dumpPeriodically():
+            while not stopEvent.wait(intervalSecs):
+                try:
+                    self.dumpToFile(filePath);
+                except IOError as e:
+                    print("Could not dump completion metrics to %s: %s" % (filePath, `e`));
+        self.dumpThread = threading.Thread(target=dumpPeriodically);
+        self.dumpThread.setDaemon(True);
+        self.dumpThread.stopEvent = stopEvent;
+        self.dumpThread.start();
+        
+    def stopPeriodicDump(self):
+        if self.dumpThread is None:
+            return;
+        self.dumpThread.stopEvent.set();
+        self.dumpThread = None;
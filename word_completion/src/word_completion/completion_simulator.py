@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+import argparse;
+import json;
+import multiprocessing;
+import sys;
+from timeit import default_timer as timer;
+
+from word_collection import WordCollection, CompletionKind;
+from completion_metrics import CompletionMetrics, Histogram;
+from corpus_dict_builder import WORD_PATTERN, shardCorpusFiles;
+
+# Replays text through the completion policy of the Proser editor,
+# without Qt, and measures how many keystrokes completion saves:
+#
+#   - The simulated user types each corpus word letter by letter. 
+#   - After each letter, the top NUM_COMPLETIONS completions are 
+#     requested, as Proser's actionTextChanged() does: a phrase search over
+#     the preceding words and the word so far, or, without phrases, a plain 
+#     prefix_search() of the word so far.
+#   - As soon as a completion would produce the text that follows, the
+#     user accepts it. That costs one keystroke (button or function key), 
+#     and inserts the completion plus a space, as Proser's 
+#     actionCompletionButton() does, including its capitalization rule.
+#   - Otherwise the user types the whole word, and a space.
+#   - Like Proser, the simulator reports accepted completions and finished 
+#     words through noteWordUsed(), so recency policies take effect.
+#
+# Usage: completion_simulator.py [--dictDir dir] [--processes n] [--noPhrases] corpusFile [corpusFile ...]
+
+NUM_COMPLETIONS = 5;
+
+class SimulationResult(object):
+    '''
+    Counts of one simulation run. Results of parallel runs 
+    are combined with merge().
+    '''
+    
+    def __init__(self):
+        self.numWords = 0;
+        # Keystrokes needed without completion: all letters and a space per word:
+        self.numBaselineKeystrokes = 0;
+        self.numKeystrokes = 0;
+        self.numCompletionsAccepted = 0;
+        self.numPhraseCompletionsAccepted = 0;
+        # Sum of the 1-based positions of accepted completions in their lists:
+        self.sumAcceptedPositions = 0;
+        self.queryLatencies = Histogram(CompletionMetrics.LATENCY_BUCKETS);
+        
+    def merge(self, other):
+        '''
+        Add the counts of another result.
+        @param other: result to add
+        @type other: SimulationResult
+        '''
+        self.numWords += other.numWords;
+        self.numBaselineKeystrokes += other.numBaselineKeystrokes;
+        self.numKeystrokes += other.numKeystrokes;
+        self.numCompletionsAccepted += other.numCompletionsAccepted;
+        self.numPhraseCompletionsAccepted += other.numPhraseCompletionsAccepted;
+        self.sumAcceptedPositions += other.sumAcceptedPositions;
+        self.queryLatencies.merge(other.queryLatencies);
+    
+    def keystrokeSavingsRate(self):
+        '''
+        Fraction of the baseline keystrokes that completion saved.
+        '''
+        if self.numBaselineKeystrokes == 0:
+            return 0.0;
+        return 1.0 - self.numKeystrokes / float(self.numBaselineKeystrokes);
+    
+    def meanAcceptedPosition(self):
+        '''
+        Average 1-based position of the accepted completions in the
+        completion lists, or None if none was accepted.
+        '''
+        if self.numCompletionsAccepted == 0:
+            return None;
+        return self.sumAcceptedPositions / float(self.numCompletionsAccepted);
+    
+    def toDict(self):
+        return {
+                'words'                     : self.numWords,
+                'baselineKeystrokes'        : self.numBaselineKeystrokes,
+                'keystrokes'                : self.numKeystrokes,
+                'keystrokeSavingsRate'      : self.keystrokeSavingsRate(),
+                'completionsAccepted'       : self.numCompletionsAccepted,
+                'phraseCompletionsAccepted' : self.numPhraseCompletionsAccepted,
+                'meanAcceptedPosition'      : self.meanAcceptedPosition(),
+                'queryLatency'              : self.queryLatencies.toDict()
+                };
+
+class CompletionSimulator(object):
+    '''
+    Replays words through Proser's completion policy against one word collection.
+    '''
+    
+    def __init__(self, wordCollection, numCompletions=NUM_COMPLETIONS, usePhrases=True, noteUsage=True):
+        '''
+        @param wordCollection: collection to query. Anything with prefix_search() 
+                               works if usePhrases and noteUsage are False. Without
+                               phrases, collections that lack tagged_prefix_search(), 
+                               such as a WordCollectionClient or DictionaryBundleSet, 
+                               are queried through prefix_search(), and offer no 
+                               abbreviation expansions.
+        @type wordCollection: WordCollection
+        @param numCompletions: number of completion buttons
+        @type numCompletions: int
+        @param usePhrases: if True, query phrase_prefix_search() as Proser does.
+        @type usePhrases: boolean
+        @param noteUsage: if True, report used words through noteWordUsed() as Proser does.
+        @type noteUsage: boolean
+        '''
+        self.wordCollection = wordCollection;
+        self.numCompletions = numCompletions;
+        self.usePhrases = usePhrases;
+        self.noteUsage = noteUsage;
+        self.hasTaggedSearch = hasattr(wordCollection, 'tagged_prefix_search');
+        self.result = SimulationResult();
+        
+    def simulateLines(self, lines):
+        '''
+        Simulate typing the given lines. Completion context does not
+        reach across lines.
+        @param lines: text lines
+        @type lines: iterable of strings
+        @return: the accumulated result of this simulator
+        @rtype: SimulationResult
+        '''
+        for line in lines:
+            self.simulateWords(WORD_PATTERN.findall(line));
+        return self.result;
+    
+    def simulateWords(self, words):
+        '''
+        Simulate typing the given sequence of words, separated by spaces.
+        @param words: the words
+        @type words: [string]
+        '''
+        result = self.result;
+        wordIndex = 0;
+        while wordIndex < len(words):
+            targetWord = words[wordIndex];
+            for numTyped in range(1, len(targetWord) + 1):
+                completions = self.queryCompletions(words, wordIndex, targetWord[:numTyped]);
+                numCompleted = 0;
+                for (position, (completion, numWords, kind)) in enumerate(completions, 1):
+                    numCompleted = self.numWordsCompleted(words, wordIndex, targetWord[:numTyped], completion, numWords, kind);
+                    if numCompleted > 0:
+                        break;
+                if numCompleted > 0:
+                    # Typed letters, plus the completion keystroke:
+                    result.numKeystrokes += numTyped + 1;
+                    result.numCompletionsAccepted += 1;
+                    result.sumAcceptedPositions += position;
+                    if numWords > 1 or numCompleted > 1:
+                        result.numPhraseCompletionsAccepted += 1;
+                    if self.noteUsage:
+                        self.wordCollection.noteWordUsed(completion);
+                    break;
+            else:
+                # Typed the whole word, and a space:
+                result.numKeystrokes += len(targetWord) + 1;
+                numCompleted = 1;
+                if self.noteUsage:
+                    self.wordCollection.noteWordUsed(targetWord);
+            for completedWord in words[wordIndex:wordIndex + numCompleted]:
+                result.numWords += 1;
+                result.numBaselineKeystrokes += len(completedWord) + 1;
+            wordIndex += numCompleted;
+    
+    def queryCompletions(self, words, wordIndex, wordSoFar):
+        '''
+        Return the completions Proser would show while words[wordIndex] is typed
+        up to wordSoFar, as (completion, numWordsReplaced, completionKind) triples.
+        '''
+        startTime = timer();
+        if self.usePhrases:
+            numPrecedingWords = self.wordCollection.maxPhraseWords - 1;
+            precedingWords = words[max(0, wordIndex - numPrecedingWords):wordIndex];
+            completions = self.wordCollection.phrase_prefix_search(precedingWords + [wordSoFar], cutoffRank=self.numCompletions);
+        elif self.hasTaggedSearch:
+            completions = [(completion, 1, kind) 
+                           for (completion, kind) in self.wordCollection.tagged_prefix_search(wordSoFar, cutoffRank=self.numCompletions)];
+        else:
+            completions = [(completion, 1, CompletionKind.WORD) 
+                           for completion in self.wordCollection.prefix_search(wordSoFar, cutoffRank=self.numCompletions)];
+        self.result.queryLatencies.record(timer() - startTime);
+        return completions;
+    
+    def numWordsCompleted(self, words, wordIndex, wordSoFar, completion, numWords, kind=CompletionKind.WORD):
+        '''
+        Return how many words, starting at words[wordIndex], accepting the given
+        completion would correctly produce. Zero if the completion would produce
+        wrong text, or nothing. Mirrors Proser's actionCompletionButton().
+        '''
+        firstWordIndex = wordIndex - numWords + 1;
+        typedPhrase = ' '.join(words[firstWordIndex:wordIndex] + [wordSoFar]);
+        if len(typedPhrase) >= len(completion):
+            return 0;
+        if kind == CompletionKind.ABBREVIATION:
+            # Expansions replace the typed abbreviation:
+            insertedText = completion;
+        elif completion != completion.lower() and completion[:len(typedPhrase)] != typedPhrase:
+            insertedText = completion;
+        else:
+            insertedText = typedPhrase + completion[len(typedPhrase):];
+        insertedWords = insertedText.split(' ');
+        if insertedWords != words[firstWordIndex:firstWordIndex + len(insertedWords)]:
+            return 0;
+        return len(insertedWords) - numWords + 1;
+
+# ----------------------------------  Parallel Simulation -----------------------
+
+# One simulator per worker process, built by initWorker():
+workerSimulator = None;
+
+def initWorker(dictDir, userDictFilePath, numCompletions, usePhrases, noteUsage):
+    global workerSimulator;
+    wordCollection = WordCollection(dictDir=dictDir, userDictFilePath=userDictFilePath);
+    workerSimulator = CompletionSimulator(wordCollection, numCompletions, usePhrases, noteUsage);
+
+def simulateShard(shard):
+    '''
+    Process pool worker: simulate one corpus shard with
+    the process's simulator, as a fresh session.
+    @param shard: shard to simulate
+    @type shard: CorpusShard
+    @rtype: SimulationResult
+    '''
+    workerSimulator.result = SimulationResult();
+    workerSimulator.wordCollection.clearRecentWords();
+    return workerSimulator.simulateLines(shard.lines());
+
+def simulateCorpus(corpusFilePaths,
+                   dictDir=None,
+                   userDictFilePath=None,
+                   numCompletions=NUM_COMPLETIONS,
+                   usePhrases=True,
+                   noteUsage=True,
+                   numProcesses=None,
+                   shardBytes=1024 * 1024):
+    '''
+    Simulate typing the given corpus files with a WordCollection built
+    from the given dictionary. The corpus is cut into shards, which are
+    simulated in a pool of processes, each shard as one session.
+    @param corpusFilePaths: plain text or gzip (.gz) files
+    @type corpusFilePaths: [string]
+    @param dictDir: see WordCollection
+    @type dictDir: string
+    @param userDictFilePath: see WordCollection
+    @type userDictFilePath: string
+    @param numCompletions: see CompletionSimulator
+    @type numCompletions: int
+    @param usePhrases: see CompletionSimulator
+    @type usePhrases: boolean
+    @param noteUsage: see CompletionSimulator
+    @type noteUsage: boolean
+    @param numProcesses: size of the process pool. None: one per CPU. 1: no pool.
+    @type numProcesses: int
+    @param shardBytes: approximate shard size for plain text files
+    @type shardBytes: int
+    @return: the combined result of all shards
+    @rtype: SimulationResult
+    '''
+    shards = shardCorpusFiles(corpusFilePaths, shardBytes);
+    workerConfig = (dictDir, userDictFilePath, numCompletions, usePhrases, noteUsage);
+    if numProcesses == 1 or len(shards) == 1:
+        initWorker(*workerConfig);
+        shardResults = map(simulateShard, shards);
+    else:
+        pool = multiprocessing.Pool(numProcesses, initWorker, workerConfig);
+        try:
+            shardResults = pool.map(simulateShard, shards);
+        finally:
+            pool.close();
+            pool.join();
+    result = SimulationResult();
+    for shardResult in shardResults:
+        result.merge(shardResult);
+    return result;
+
+if __name__ == "__main__":
+    
+    parser = argparse.ArgumentParser(description="Measure keystroke savings of Proser-style word completion on text corpora.");
+    parser.add_argument('--dictDir', default=None, help="dictionary directory; default: the built-in dict_files");
+    parser.add_argument('--userDict', default=None, help="user dictionary file");
+    parser.add_argument('--completions', type=int, default=NUM_COMPLETIONS, help="number of completion buttons");
+    parser.add_argument('--noPhrases', action='store_true', help="plain prefix search of the word so far");
+    parser.add_argument('--noRecency', action='store_true', help="don't report used words to the collection");
+    parser.add_argument('--processes', type=int, default=None, help="simulation processes; default: one per CPU");
+    parser.add_argument('corpusFiles', nargs='+', help="plain text or .gz files");
+    args = parser.parse_args();
+    
+    result = simulateCorpus(args.corpusFiles,
+                            dictDir=args.dictDir,
+                            userDictFilePath=args.userDict,
+                            numCompletions=args.completions,
+                            usePhrases=not args.noPhrases,
+                            noteUsage=not args.noRecency,
+                            numProcesses=args.processes);
+    json.dump(result.toDict(), sys.stdout, indent=2);
+    sys.stdout.write('\n');
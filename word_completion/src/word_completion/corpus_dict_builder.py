@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+import argparse;
+import gzip;
+import heapq;
+import multiprocessing;
+import os;
+import re;
+import shutil;
+import sys;
+import tempfile;
+
+# Builds frequency-ranked word files for WordCollection from local text
+# corpora. Replaces the web scraping in grab6000FrequentWords.py.
+#
+# Corpus files are cut into shards (one per gzip file, byte ranges of
+# plain text files), and the shards are tokenized and counted in a pool
+# of processes. Each process keeps at most a given number of distinct
+# words in memory; when that number is reached, the counts are written
+# to a word-sorted spill file. All spill files are then merged in one
+# streaming pass, and the most frequent words are kept in a bounded heap.
+# Counts are exact.
+#
+# Usage: corpus_dict_builder.py -o dictMyDomainRankAndWord.txt [--maxWords N] corpusFile [corpusFile ...]
+
+DEFAULT_MAX_WORDS = 50000;
+DEFAULT_MAX_WORDS_IN_MEMORY = 500000;
+DEFAULT_SHARD_BYTES = 64 * 1024 * 1024;
+
+# Letters, optionally with one inner apostrophe, as in "men's":
+WORD_PATTERN = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?");
+
+class CorpusShard(object):
+    '''
+    A portion of one corpus file: the lines that start in the
+    byte range [startByte, endByte). An endByte of None means
+    the end of the file. Gzip files are always one shard.
+    '''
+    def __init__(self, filePath, startByte=0, endByte=None):
+        self.filePath = filePath;
+        self.startByte = startByte;
+        self.endByte = endByte;
+        
+    def lines(self):
+        if self.filePath.endswith('.gz'):
+            with gzip.open(self.filePath, 'rb') as fd:
+                for line in fd:
+                    yield line;
+            return;
+        with open(self.filePath, 'rb') as fd:
+            if self.startByte > 0:
+                # The line that straddles our start belongs to the previous shard:
+                fd.seek(self.startByte - 1);
+                fd.readline();
+            while self.endByte is None or fd.tell() < self.endByte:
+                line = fd.readline();
+                if len(line) == 0:
+                    return;
+                yield line;
+
+def shardCorpusFiles(filePaths, shardBytes=DEFAULT_SHARD_BYTES):
+    '''
+    Cut the given corpus files into shards of about shardBytes each.
+    @param filePaths: plain text or gzip (.gz) corpus files
+    @type filePaths: [string]
+    @param shardBytes: approximate shard size for plain text files
+    @type shardBytes: int
+    @rtype: [CorpusShard]
+    '''
+    shards = [];
+    for filePath in filePaths:
+        fileSize = os.path.getsize(filePath);
+        if filePath.endswith('.gz') or fileSize <= shardBytes:
+            shards.append(CorpusShard(filePath));
+            continue;
+        for startByte in range(0, fileSize, shardBytes):
+            shards.append(CorpusShard(filePath, startByte, startByte + shardBytes));
+    return shards;
+
+def tokenize(line, foldCase=True):
+    '''
+    Return the words in one line of text.
+    @param line: text to tokenize
+    @type line: string
+    @param foldCase: if True, words are lower-cased
+    @type foldCase: boolean
+    '''
+    if foldCase:
+        line = line.lower();
+    return WORD_PATTERN.findall(line);
+
+def spillCounts(wordCounts, spillDir):
+    '''
+    Write word counts to a new file in spillDir, sorted by word,
+    one 'word<tab>count' per line. Returns the file's path.
+    '''
+    (spillFd, spillFilePath) = tempfile.mkstemp(dir=spillDir, suffix='.counts');
+    with os.fdopen(spillFd, 'wb') as fd:
+        for word in sorted(wordCounts.iterkeys()):
+            fd.write('%s\t%d\n' % (word, wordCounts[word]));
+    return spillFilePath;
+
+def countShard(args):
+    '''
+    Process pool worker: tokenize and count one shard.
+    @param args: shard, spill directory, max distinct words held in memory, case folding flag
+    @type args: (CorpusShard, string, int, boolean)
+    @return: paths of the spill files holding this shard's counts
+    @rtype: [string]
+    '''
+    (shard, spillDir, maxWordsInMemory, foldCase) = args;
+    spillFilePaths = [];
+    wordCounts = {};
+    for line in shard.lines():
+        for word in tokenize(line, foldCase):
+            wordCounts[word] = wordCounts.get(word, 0) + 1;
+        if len(wordCounts) >= maxWordsInMemory:
+            spillFilePaths.append(spillCounts(wordCounts, spillDir));
+            wordCounts = {};
+    if len(wordCounts) > 0:
+        spillFilePaths.append(spillCounts(wordCounts, spillDir));
+    return spillFilePaths;
+
+def readSpillFile(spillFilePath):
+    with open(spillFilePath, 'rb') as fd:
+        for line in fd:
+            (word, count) = line.rstrip('\n').split('\t');
+            yield (word, int(count));
+
+def mergeSpillFiles(spillFilePaths):
+    '''
+    Stream the total count of each word over all spill files, in word order.
+    '''
+    currWord = None;
+    currCount = 0;
+    for (word, count) in heapq.merge(*[readSpillFile(spillFilePath) for spillFilePath in spillFilePaths]):
+        if word == currWord:
+            currCount += count;
+            continue;
+        if currWord is not None:
+            yield (currWord, currCount);
+        (currWord, currCount) = (word, count);
+    if currWord is not None:
+        yield (currWord, currCount);
+
+def mostFrequentWords(wordCountStream, maxWords, minCount=1):
+    '''
+    Return the maxWords most frequent words from the given
+    stream of (word, count) pairs, most frequent first. Holds
+    at most maxWords pairs in memory.
+    @rtype: [(string, int)]
+    '''
+    # Min-heap of (count, word) keeps the most frequent words seen so far:
+    topWords = [];
+    for (word, count) in wordCountStream:
+        if count < minCount:
+            continue;
+        if len(topWords) < maxWords:
+            heapq.heappush(topWords, (count, word));
+        elif count > topWords[0][0]:
+            heapq.heapreplace(topWords, (count, word));
+    # Highest count first; alphabetical among equal counts:
+    topWords.sort(key=lambda countAndWord: (-countAndWord[0], countAndWord[1]));
+    return [(word, count) for (count, word) in topWords];
+
+def writeRankAndWordFile(rankedWords, outFilePath):
+    '''
+    Write words in the WordCollection dictionary file format:
+    one 'rank<tab>word' per line. The most frequent word has rank 1.
+    @param rankedWords: (word, count) pairs, most frequent first.
+    @type rankedWords: [(string, int)]
+    @param outFilePath: file to create
+    @type outFilePath: string
+    '''
+    with open(outFilePath, 'wb') as fd:
+        for (rank, (word, _)) in enumerate(rankedWords, 1):
+            fd.write('%d\t%s\n' % (rank, word));
+
+def buildRankedWords(corpusFilePaths, 
+                     maxWords=DEFAULT_MAX_WORDS, 
+                     minCount=1, 
+                     foldCase=True,
+                     numProcesses=None, 
+                     maxWordsInMemory=DEFAULT_MAX_WORDS_IN_MEMORY, 
+                     shardBytes=DEFAULT_SHARD_BYTES):
+    '''
+    Count the words of the given corpus files, and return the most frequent ones.
+    @param corpusFilePaths: plain text or gzip (.gz) files
+    @type corpusFilePaths: [string]
+    @param maxWords: number of words to return
+    @type maxWords: int
+    @param minCount: words occurring fewer times are dropped
+    @type minCount: int
+    @param foldCase: if True, words are lower-cased before counting
+    @type foldCase: boolean
+    @param numProcesses: size of the counting process pool. None: one per CPU
+    @type numProcesses: int
+    @param maxWordsInMemory: distinct words each process holds before spilling to disk
+    @type maxWordsInMemory: int
+    @param shardBytes: approximate size of the pieces plain text files are cut into
+    @type shardBytes: int
+    @return: (word, count) pairs, most frequent first
+    @rtype: [(string, int)]
+    '''
+    shards = shardCorpusFiles(corpusFilePaths, shardBytes);
+    spillDir = tempfile.mkdtemp(prefix='corpusDictBuilder');
+    try:
+        workerArgs = [(shard, spillDir, maxWordsInMemory, foldCase) for shard in shards];
+        if numProcesses == 1 or len(shards) == 1:
+            spillFileLists = map(countShard, workerArgs);
+        else:
+            pool = multiprocessing.Pool(numProcesses);
+            try:
+                spillFileLists = pool.map(countShard, workerArgs);
+            finally:
+                pool.close();
+                pool.join();
+        spillFilePaths = [spillFilePath for spillFileList in spillFileLists for spillFilePath in spillFileList];
+        return mostFrequentWords(mergeSpillFiles(spillFilePaths), maxWords, minCount);
+    finally:
+        shutil.rmtree(spillDir, ignore_errors=True);
+
+if __name__ == "__main__":
+    
+    parser = argparse.ArgumentParser(description="Build a rank/word dictionary file for word_completion from text corpora.");
+    parser.add_argument('-o', '--outFile', required=True, help="rank/word file to write, e.g. dict_files/dictRobotsRankAndWord.txt");
+    parser.add_argument('--maxWords', type=int, default=DEFAULT_MAX_WORDS, help="number of most frequent words to keep");
+    parser.add_argument('--minCount', type=int, default=1, help="drop words that occur fewer times");
+    parser.add_argument('--keepCase', action='store_true', help="count 'The' and 'the' separately");
+    parser.add_argument('--processes', type=int, default=None, help="counting processes; default: one per CPU");
+    parser.add_argument('--maxWordsInMemory', type=int, default=DEFAULT_MAX_WORDS_IN_MEMORY, help="distinct words per process before spilling to disk");
+    parser.add_argument('corpusFiles', nargs='+', help="plain text or .gz files");
+    args = parser.parse_args();
+    
+    rankedWords = buildRankedWords(args.corpusFiles, 
+                                   maxWords=args.maxWords, 
+                                   minCount=args.minCount, 
+                                   foldCase=not args.keepCase,
+                                   numProcesses=args.processes, 
+                                   maxWordsInMemory=args.maxWordsInMemory);
+    writeRankAndWordFile(rankedWords, args.outFile);
+    sys.stdout.write("Wrote %d words to %s\n" % (len(rankedWords), args.outFile));
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+import os;
+import threading;
+
+try:
+    import pyinotify;
+    INOTIFY_AVAILABLE = True;
+except ImportError:
+    INOTIFY_AVAILABLE = False;
+
+class DictFileWatcher(threading.Thread):
+    '''
+    Watches a dictionary directory, plus optionally a user dictionary
+    file that lives elsewhere, and calls a callback with the full path
+    of every file that was created, modified, or deleted. Uses inotify
+    (via pyinotify) when that module is available. Otherwise falls back
+    to polling the files' modification times and sizes.
+    
+    A file is only reported once it is complete, so that the callback
+    does not read a file that an editor or cp is still writing. With 
+    inotify, a file is reported when it is closed after writing, or moved
+    into place. When polling, a file is reported once its modification
+    time and size stayed the same for one poll interval.
+    
+    The callback runs in this watcher's thread.
+    '''
+    
+    DEFAULT_POLL_INTERVAL = 2.0; # seconds
+    
+    def __init__(self, dictDir, callback, userDictFilePath=None, pollInterval=None, forcePolling=False):
+        '''
+        @param dictDir: directory whose files are to be watched.
+        @type dictDir: string
+        @param callback: callable that takes the full path of a changed file.
+        @type callback: Python callable
+        @param userDictFilePath: a single additional file to watch. May be inside dictDir, or not.
+        @type userDictFilePath: string
+        @param pollInterval: seconds between checks when polling. Also the maximum
+                             time it takes stopWatching() to take effect.
+        @type pollInterval: float
+        @param forcePolling: if True, poll even if inotify is available.
+        @type forcePolling: boolean
+        '''
+        super(DictFileWatcher, self).__init__();
+        self.setDaemon(True);
+        self.dictDir = os.path.realpath(dictDir);
+        self.callback = callback;
+        if userDictFilePath is not None:
+            userDictFilePath = os.path.realpath(userDictFilePath);
+        self.userDictFilePath = userDictFilePath;
+        self.pollInterval = DictFileWatcher.DEFAULT_POLL_INTERVAL if pollInterval is None else pollInterval;
+        self.usePolling = forcePolling or not INOTIFY_AVAILABLE;
+        self.keepRunning = True;
+        # When polling, the file states last reported, and those 
+        # of the most recent poll. See pollOnce():
+        self.reportedFileStates = None;
+        self.polledFileStates = None;
+
+    def stopWatching(self):
+        '''
+        Ask the watcher thread to terminate. Returns right away.
+        '''
+        self.keepRunning = False;
+    
+    def run(self):
+        if self.usePolling:
+            self.pollForChanges();
+        else:
+            self.waitForInotifyEvents();
+
+    # ------------------------------ Private ---------------------
+
+    def isWatchedFile(self, filePath):
+        '''
+        True if the given file is one this watcher reports on.
+        Editor backup and swap files in the dictionary directory are ignored.
+        @param filePath: full path to the file.
+        @type filePath: string
+        '''
+        if filePath == self.userDictFilePath:
+            return True;
+        if os.path.dirname(filePath) != self.dictDir:
+            return False;
+        fileName = os.path.basename(filePath);
+        return not (fileName.startswith('.') or fileName.endswith('~') or fileName.endswith('.swp'));
+
+    def reportChange(self, filePath):
+        try:
+            self.callback(filePath);
+        except Exception as e:
+            # Don't let a bad dictionary file edit kill the watcher.
+            # The next save of the file will be tried again:
+            print("Could not apply change of dictionary file %s: %r" % (filePath, e));
+
+    def pollForChanges(self):
+        self.pollOnce();
+        stopEvent = threading.Event();
+        while self.keepRunning:
+            stopEvent.wait(self.pollInterval);
+            self.pollOnce();
+
+    def pollOnce(self):
+        '''
+        Take the states of the watched files, and report each file whose
+        state differs from the one last reported, but equals the one of 
+        the previous poll. A file that is still being written is thus
+        reported one poll after the writing stopped, rather than read 
+        while incomplete. The first poll only records the states.
+        '''
+        newFileStates = self.takeFileStates();
+        if self.reportedFileStates is None:
+            self.reportedFileStates = newFileStates;
+            self.polledFileStates = newFileStates;
+            return;
+        for filePath in set(self.reportedFileStates.keys()) | set(newFileStates.keys()):
+            newState = newFileStates.get(filePath);
+            if newState == self.reportedFileStates.get(filePath):
+                continue;
+            if newState != self.polledFileStates.get(filePath):
+                # Still changing. Check again at the next poll:
+                continue;
+            if newState is None:
+                del self.reportedFileStates[filePath];
+            else:
+                self.reportedFileStates[filePath] = newState;
+            self.reportChange(filePath);
+        self.polledFileStates = newFileStates;
+
+    def takeFileStates(self):
+        '''
+        Return a dict mapping each watched file to its (modification time, size) pair.
+        '''
+        fileStates = {};
+        filePaths = [];
+        if os.path.isdir(self.dictDir):
+            filePaths = [os.path.join(self.dictDir, fileName) for fileName in os.listdir(self.dictDir)];
+        if self.userDictFilePath is not None:
+            filePaths.append(self.userDictFilePath);
+        for filePath in filePaths:
+            if not self.isWatchedFile(filePath):
+                continue;
+            try:
+                fileStat = os.stat(filePath);
+            except OSError:
+                # File was removed between listdir() and stat():
+                continue;
+            fileStates[filePath] = (fileStat.st_mtime, fileStat.st_size);
+        return fileStates;
+
+    def waitForInotifyEvents(self):
+        watchManager = pyinotify.WatchManager();
+        notifier = pyinotify.Notifier(watchManager, DictFileWatcher.InotifyHandler(watcher=self));
+        # Files are reported when closed after writing, not on each write, so
+        # that they are complete. Moves cover editors that save by writing a
+        # temp file, then renaming it:
+        eventMask = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_DELETE | pyinotify.IN_MOVED_TO | pyinotify.IN_MOVED_FROM;
+        watchManager.add_watch(self.dictDir, eventMask);
+        if self.userDictFilePath is not None and os.path.dirname(self.userDictFilePath) != self.dictDir:
+            watchManager.add_watch(os.path.dirname(self.userDictFilePath), eventMask);
+        try:
+            while self.keepRunning:
+                # check_events() takes milliseconds:
+                if notifier.check_events(timeout=int(1000 * self.pollInterval)):
+                    notifier.read_events();
+                    notifier.process_events();
+        finally:
+            notifier.stop();
+
+    #-----------------------------
+    # InotifyHandler Class
+    #-------------------
+    
+    if INOTIFY_AVAILABLE:
+        class InotifyHandler(pyinotify.ProcessEvent):
+            
+            def my_init(self, watcher=None):
+                # Called by pyinotify's ProcessEvent.__init__() with its keyword args:
+                self.watcher = watcher;
+                
+            def process_default(self, event):
+                filePath = os.path.realpath(event.pathname);
+                if self.watcher.isWatchedFile(filePath):
+                    self.watcher.reportChange(filePath);
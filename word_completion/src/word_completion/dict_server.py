@@ -0,0 +1,537 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+import errno;
+import os;
+import socket;
+import SocketServer;
+import struct;
+import sys;
+import threading;
+
+from word_collection import WordCollection, TelPadEncodedWordCollection;
+from dict_file_watcher import DictFileWatcher;
+
+# Wire protocol. Every request is a fixed header, followed by a payload:
+#
+#     request ID (uint32) | opcode (uint8) | payload length (uint32) | payload
+#
+# Every response has the same layout, with a status byte instead of the
+# opcode. Responses on a connection come back in the order of the
+# requests, so clients may send any number of requests before reading
+# the responses (pipelining). Strings travel as UTF-8, preceded by
+# their uint16 length; lists of strings are preceded by a uint32 count.
+
+HEADER_FORMAT = '!IBI';
+HEADER_LEN = struct.calcsize(HEADER_FORMAT);
+
+class Opcode:
+    PREFIX_SEARCH       = 1
+    RANK                = 2
+    ADD_TO_USER_DICT    = 3
+    CONTAINS            = 4
+    SIZE                = 5
+    T9_PREFIX_SEARCH    = 6
+    T9_RANK             = 7
+    T9_ADD_TO_USER_DICT = 8
+    T9_CONTAINS         = 9
+    PHRASE_PREFIX_SEARCH = 10
+    MAX_PHRASE_WORDS    = 11
+    NOTE_WORD_USED      = 12
+    T9_NOTE_WORD_USED   = 13
+    T9_RANKED_PREFIX_SEARCH = 14
+
+class Status:
+    OK          = 0
+    KEY_ERROR   = 1
+    VALUE_ERROR = 2
+    TYPE_ERROR  = 3
+    ERROR       = 4
+
+NO_CUTOFF_RANK = -1;
+
+def packString(theStr):
+    if isinstance(theStr, unicode):
+        theStr = theStr.encode('UTF-8');
+    return struct.pack('!H', len(theStr)) + theStr;
+
+def unpackString(payload, offset=0):
+    '''
+    Return the string that starts at offset in payload, and the offset just past it.
+    '''
+    (strLen,) = struct.unpack_from('!H', payload, offset);
+    offset += 2;
+    return (payload[offset:offset + strLen], offset + strLen);
+
+def packStringList(strList):
+    return struct.pack('!I', len(strList)) + ''.join([packString(theStr) for theStr in strList]);
+
+def unpackStringList(payload):
+    (numStrs,) = struct.unpack_from('!I', payload, 0);
+    offset = 4;
+    strList = [];
+    for _ in range(numStrs):
+        (theStr, offset) = unpackString(payload, offset);
+        strList.append(theStr.decode('UTF-8'));
+    return strList;
+
+def packPhraseCompletions(completions):
+    '''
+    Pack the (entry, numWords, kind) triples of WordCollection.phrase_prefix_search().
+    '''
+    return struct.pack('!I', len(completions)) +\
+           ''.join([packString(entry) + struct.pack('!BB', numWords, kind) for (entry, numWords, kind) in completions]);
+
+def unpackPhraseCompletions(payload):
+    (numCompletions,) = struct.unpack_from('!I', payload, 0);
+    offset = 4;
+    completions = [];
+    for _ in range(numCompletions):
+        (entry, offset) = unpackString(payload, offset);
+        (numWords, kind) = struct.unpack_from('!BB', payload, offset);
+        offset += 2;
+        completions.append((entry.decode('UTF-8'), numWords, kind));
+    return completions;
+
+def receiveExactly(sock, numBytes):
+    '''
+    Read numBytes from the socket. Returns None if the 
+    peer closed the connection before the first byte.
+    @raise IOError: if the connection closes in mid-message.
+    '''
+    chunks = [];
+    numReceived = 0;
+    while numReceived < numBytes:
+        chunk = sock.recv(numBytes - numReceived);
+        if len(chunk) == 0:
+            if numReceived == 0:
+                return None;
+            raise IOError("Word completion server connection closed in mid-message.");
+        chunks.append(chunk);
+        numReceived += len(chunk);
+    return ''.join(chunks);
+
+# ---------------------------------------------  Class WordCollectionServer -----------------      
+
+class WordCollectionServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    '''
+    Daemon that holds one WordCollection, and one TelPadEncodedWordCollection,
+    for all input applications on a host. Clients connect via a Unix domain
+    socket (see WordCollectionClient and TelPadEncodedWordCollectionClient).
+    The server is thereby the only writer of the user dictionary, and
+    its in-memory dictionaries stay warm when applications restart.
+    Edits of the dictionary files are picked up while the server runs.
+    
+    Each client connection is served by its own thread. Access to the 
+    dictionaries is serialized.
+    '''
+    
+    DEFAULT_SOCKET_PATH = "/tmp/wordCompletionServer.sock";
+    daemon_threads = True;
+    
+    def __init__(self, socketPath=None, dictDir=None, userDictFilePath=None, watchDictFiles=True):
+        '''
+        Build the dictionaries, and bind the server socket. Call serve_forever() to start serving.
+        @param socketPath: file system path of the Unix domain socket. If None, DEFAULT_SOCKET_PATH is used.
+        @type socketPath: string
+        @param dictDir: passed to WordCollection
+        @type dictDir: string
+        @param userDictFilePath: passed to WordCollection
+        @type userDictFilePath: string
+        @param watchDictFiles: if True, edits of the dictionary files are applied while the server runs.
+        @type watchDictFiles: boolean
+        @raise socket.error: if another server is listening on the socket.
+        '''
+        self.socketPath = WordCollectionServer.DEFAULT_SOCKET_PATH if socketPath is None else socketPath;
+        # Fail before the dictionaries are built if another server owns the socket:
+        self.removeStaleSocket();
+        self.dictDir = dictDir;
+        self.userDictFilePath = userDictFilePath;
+        self.dictLock = threading.Lock();
+        self.wordCollection = WordCollection(dictDir=dictDir, userDictFilePath=userDictFilePath);
+        # Built on first T9 request:
+        self.telPadCollection = None;
+        SocketServer.UnixStreamServer.__init__(self, self.socketPath, WordCollectionServer.RequestHandler);
+        self.dictFileWatcher = None;
+        if watchDictFiles:
+            self.dictFileWatcher = DictFileWatcher(self.wordCollection.dictDir, 
+                                                   self.dictFileChanged, 
+                                                   userDictFilePath=WordCollection.USER_DICT_FILE_PATH);
+            self.dictFileWatcher.start();
+            
+    def removeStaleSocket(self):
+        '''
+        Remove a socket file left over from a server that died. 
+        @raise socket.error: if a live server is listening on the socket.
+        '''
+        if not os.path.exists(self.socketPath):
+            return;
+        probeSock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM);
+        try:
+            probeSock.connect(self.socketPath);
+        except socket.error as e:
+            if e.errno != errno.ECONNREFUSED:
+                raise;
+            # Nobody listening:
+            os.remove(self.socketPath);
+            return;
+        finally:
+            probeSock.close();
+        raise socket.error(errno.EADDRINUSE, "A word completion server is already listening on %s" % self.socketPath);
+    
+    def dictFileChanged(self, filePath):
+        with self.dictLock:
+            self.wordCollection.applyDictFileChange(filePath);
+            if self.telPadCollection is not None:
+                self.telPadCollection.applyDictFileChange(filePath);
+    
+    def getTelPadCollection(self):
+        '''
+        Return the T9 collection, building it on first use. Caller must hold dictLock.
+        '''
+        if self.telPadCollection is None:
+            self.telPadCollection = TelPadEncodedWordCollection(dictDir=self.dictDir, userDictFilePath=self.userDictFilePath);
+        return self.telPadCollection;
+    
+    def server_close(self):
+        if self.dictFileWatcher is not None:
+            self.dictFileWatcher.stopWatching();
+        SocketServer.UnixStreamServer.server_close(self);
+        try:
+            os.remove(self.socketPath);
+        except OSError:
+            pass;
+
+    def executeRequest(self, opcode, payload):
+        '''
+        Run one decoded request against the dictionaries.
+        @return: response payload
+        @rtype: string
+        @raise KeyError, ValueError, TypeError: passed on to the client.
+        '''
+        with self.dictLock:
+            if opcode == Opcode.PREFIX_SEARCH:
+                (cutoffRank,) = struct.unpack_from('!i', payload, 0);
+                (prefix, _) = unpackString(payload, 4);
+                if cutoffRank == NO_CUTOFF_RANK:
+                    cutoffRank = None;
+                return packStringList(self.wordCollection.prefix_search(prefix, cutoffRank=cutoffRank));
+            elif opcode == Opcode.RANK:
+                (word, _) = unpackString(payload);
+                return struct.pack('!i', self.wordCollection.rank(word));
+            elif opcode == Opcode.ADD_TO_USER_DICT:
+                (rankInt,) = struct.unpack_from('!i', payload, 0);
+                (utf8Word, _) = unpackString(payload, 4);
+                # addToUserDict() expects unicode or ASCII, not UTF-8 bytes:
+                wasAdded = self.wordCollection.addToUserDict(utf8Word.decode('UTF-8'), rankInt=rankInt);
+                if wasAdded and self.telPadCollection is not None:
+                    # Keep the T9 collection in sync with the shared user dictionary.
+                    # Like the word added to the file, these take the UTF-8 bytes:
+                    self.telPadCollection.insert(utf8Word, rankInt);
+                    self.telPadCollection.noteUserDictAddition(utf8Word, rankInt);
+                return struct.pack('!B', wasAdded);
+            elif opcode == Opcode.CONTAINS:
+                (word, _) = unpackString(payload);
+                return struct.pack('!B', self.wordCollection.contains(word));
+            elif opcode == Opcode.SIZE:
+                return struct.pack('!I', len(self.wordCollection));
+            elif opcode == Opcode.PHRASE_PREFIX_SEARCH:
+                (cutoffRank,) = struct.unpack_from('!i', payload, 0);
+                words = unpackStringList(payload[4:]);
+                if cutoffRank == NO_CUTOFF_RANK:
+                    cutoffRank = None;
+                return packPhraseCompletions(self.wordCollection.phrase_prefix_search(words, cutoffRank=cutoffRank));
+            elif opcode == Opcode.MAX_PHRASE_WORDS:
+                return struct.pack('!I', self.wordCollection.maxPhraseWords);
+            elif opcode == Opcode.NOTE_WORD_USED:
+                (word, _) = unpackString(payload);
+                self.wordCollection.noteWordUsed(word);
+                return '';
+            elif opcode == Opcode.T9_NOTE_WORD_USED:
+                (word, _) = unpackString(payload);
+                self.getTelPadCollection().noteWordUsed(word);
+                return '';
+            elif opcode == Opcode.T9_PREFIX_SEARCH:
+                (encPrefix, _) = unpackString(payload);
+                return packStringList(self.getTelPadCollection().prefix_search(encPrefix));
+            elif opcode == Opcode.T9_RANKED_PREFIX_SEARCH:
+                (cutoffRank,) = struct.unpack_from('!i', payload, 0);
+                (encPrefix, _) = unpackString(payload, 4);
+                if cutoffRank == NO_CUTOFF_RANK:
+                    cutoffRank = None;
+                return packStringList(self.getTelPadCollection().ranked_prefix_search(encPrefix, cutoffRank=cutoffRank));
+            elif opcode == Opcode.T9_RANK:
+                (word, _) = unpackString(payload);
+                return struct.pack('!i', self.getTelPadCollection().rank(word));
+            elif opcode == Opcode.T9_ADD_TO_USER_DICT:
+                (rankInt,) = struct.unpack_from('!i', payload, 0);
+                (utf8Word, _) = unpackString(payload, 4);
+                # addToUserDict() expects unicode or ASCII, not UTF-8 bytes:
+                wasAdded = self.getTelPadCollection().addToUserDict(utf8Word.decode('UTF-8'), rankInt=rankInt);
+                if wasAdded:
+                    # Keep the plain collection in sync with the shared user dictionary.
+                    # Like the word added to the file, these take the UTF-8 bytes:
+                    self.wordCollection.insert(utf8Word, rankInt);
+                    self.wordCollection.noteUserDictAddition(utf8Word, rankInt);
+                return struct.pack('!B', wasAdded);
+            elif opcode == Opcode.T9_CONTAINS:
+                (encWord, _) = unpackString(payload);
+                return struct.pack('!B', self.getTelPadCollection().contains(encWord));
+            else:
+                raise ValueError("Unknown word completion server opcode: %d" % opcode);
+
+    #-----------------------------
+    # RequestHandler Class
+    #-------------------
+
+    class RequestHandler(SocketServer.BaseRequestHandler):
+        
+        def handle(self):
+            sock = self.request;
+            while True:
+                header = receiveExactly(sock, HEADER_LEN);
+                if header is None:
+                    # Client hung up:
+                    return;
+                (requestID, opcode, payloadLen) = struct.unpack(HEADER_FORMAT, header);
+                payload = receiveExactly(sock, payloadLen) if payloadLen > 0 else '';
+                status = Status.OK;
+                try:
+                    response = self.server.executeRequest(opcode, payload);
+                except KeyError as e:
+                    # str() of a KeyError would add quotes around the key:
+                    (status, response) = (Status.KEY_ERROR, str(e.args[0]) if e.args else '');
+                except ValueError as e:
+                    (status, response) = (Status.VALUE_ERROR, str(e));
+                except TypeError as e:
+                    (status, response) = (Status.TYPE_ERROR, str(e));
+                except Exception as e:
+                    (status, response) = (Status.ERROR, `e`);
+                sock.sendall(struct.pack(HEADER_FORMAT, requestID, status, len(response)) + response);
+
+# ---------------------------------------------  Class WordCollectionClient -----------------      
+
+class WordCollectionClient(object):
+    '''
+    Stand-in for WordCollection that forwards all lookups to a 
+    WordCollectionServer. Applications can use an instance wherever
+    they would use a WordCollection:
+    
+      - prefix_search(word, cutoffRank=None)
+      - rank(word)
+      - contains(word)
+      - addToUserDict(newWord, rankInt=0)
+      - phrase_prefix_search(words, cutoffRank=None)
+      - maxPhraseWords
+      - noteWordUsed(word)
+      - len()
+      
+    In addition, prefix_search_pipelined() sends several prefix searches
+    before waiting for the first answer.
+    
+    Instances are not thread safe. Use one client per thread.
+    '''
+    
+    def __init__(self, socketPath=None):
+        '''
+        Connect to the server.
+        @param socketPath: the server's Unix domain socket. If None, WordCollectionServer.DEFAULT_SOCKET_PATH is used.
+        @type socketPath: string
+        @raise socket.error: if no server is listening on the socket.
+        '''
+        self.socketPath = WordCollectionServer.DEFAULT_SOCKET_PATH if socketPath is None else socketPath;
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM);
+        self.sock.connect(self.socketPath);
+        self.nextRequestID = 0;
+    
+    def close(self):
+        self.sock.close();
+    
+    def prefix_search(self, word, cutoffRank=None):
+        '''
+        See WordCollection.prefix_search()
+        '''
+        return self.prefix_search_pipelined([word], cutoffRank=cutoffRank)[0];
+    
+    def prefix_search_pipelined(self, prefixes, cutoffRank=None):
+        '''
+        Send one prefix search request for each of the given prefixes, then
+        collect the answers. Saves one round trip per prefix.
+        @param prefixes: the prefixes to search by.
+        @type prefixes: [string]
+        @param cutoffRank: see WordCollection.prefix_search()
+        @type cutoffRank: int
+        @return: one result list for each prefix, in the order of the prefixes.
+        @rtype: [[string]]
+        '''
+        if cutoffRank is not None and not isinstance(cutoffRank, int):
+            raise TypeError("Parameter cutoffRank for prefix_search must be an integer.");
+        cutoffRankField = struct.pack('!i', NO_CUTOFF_RANK if cutoffRank is None else cutoffRank);
+        requestIDs = [self.sendRequest(Opcode.PREFIX_SEARCH, cutoffRankField + packString(prefix)) for prefix in prefixes];
+        return [unpackStringList(self.receiveResponse(requestID)) for requestID in requestIDs];
+    
+    def phrase_prefix_search(self, words, cutoffRank=None):
+        '''
+        See WordCollection.phrase_prefix_search()
+        '''
+        if cutoffRank is not None and not isinstance(cutoffRank, int):
+            raise TypeError("Parameter cutoffRank for phrase_prefix_search must be an integer.");
+        payload = struct.pack('!i', NO_CUTOFF_RANK if cutoffRank is None else cutoffRank) + packStringList(words);
+        return unpackPhraseCompletions(self.request(Opcode.PHRASE_PREFIX_SEARCH, payload));
+    
+    @property
+    def maxPhraseWords(self):
+        '''
+        See WordCollection.maxPhraseWords. Fetched from the server 
+        each time, because user dictionary additions may change it.
+        '''
+        return struct.unpack('!I', self.request(Opcode.MAX_PHRASE_WORDS, ''))[0];
+    
+    def noteWordUsed(self, word):
+        '''
+        See WordCollection.noteWordUsed(). The recently used words
+        are shared by all clients of the server.
+        '''
+        self.request(Opcode.NOTE_WORD_USED, packString(word));
+    
+    def rank(self, word):
+        '''
+        See WordCollection.rank()
+        @raise KeyError: if word or rank are not present in the word collection. 
+        '''
+        return struct.unpack('!i', self.request(Opcode.RANK, packString(word)))[0];
+    
+    def contains(self, word):
+        return struct.unpack('!B', self.request(Opcode.CONTAINS, packString(word)))[0] == 1;
+    
+    def addToUserDict(self, newWord, rankInt=0):
+        '''
+        See WordCollection.addToUserDict(). The server appends the word
+        to its user dictionary file.
+        '''
+        payload = struct.pack('!i', rankInt) + packString(newWord);
+        return struct.unpack('!B', self.request(Opcode.ADD_TO_USER_DICT, payload))[0] == 1;
+    
+    def __len__(self):
+        return struct.unpack('!I', self.request(Opcode.SIZE, ''))[0];
+    
+    # ------------------------------ Private ---------------------
+
+    def request(self, opcode, payload):
+        return self.receiveResponse(self.sendRequest(opcode, payload));
+    
+    def sendRequest(self, opcode, payload):
+        requestID = self.nextRequestID;
+        self.nextRequestID = (self.nextRequestID + 1) % 2**32;
+        self.sock.sendall(struct.pack(HEADER_FORMAT, requestID, opcode, len(payload)) + payload);
+        return requestID;
+    
+    def receiveResponse(self, expectedRequestID):
+        header = receiveExactly(self.sock, HEADER_LEN);
+        if header is None:
+            raise IOError("Word completion server closed the connection.");
+        (requestID, status, payloadLen) = struct.unpack(HEADER_FORMAT, header);
+        payload = receiveExactly(self.sock, payloadLen) if payloadLen > 0 else '';
+        if requestID != expectedRequestID:
+            raise IOError("Word completion server response out of order: expected request %d, got %d." % (expectedRequestID, requestID));
+        if status == Status.OK:
+            return payload;
+        elif status == Status.KEY_ERROR:
+            raise KeyError(payload);
+        elif status == Status.VALUE_ERROR:
+            raise ValueError(payload);
+        elif status == Status.TYPE_ERROR:
+            raise TypeError(payload);
+        else:
+            raise RuntimeError("Word completion server error: %s" % payload);
+
+# ---------------------------------------------  Class TelPadEncodedWordCollectionClient -----------------      
+
+class TelPadEncodedWordCollectionClient(WordCollectionClient):
+    '''
+    Stand-in for TelPadEncodedWordCollection that forwards lookups to 
+    a WordCollectionServer. Encoding of words and button labels 
+    happens locally.
+    '''
+    
+    # The encoding methods only use TelPadEncodedWordCollection's
+    # class-level tables. Borrow their plain functions: 
+    encodeWord        = TelPadEncodedWordCollection.__dict__['encodeWord'];
+    encodeTelPadLabel = TelPadEncodedWordCollection.__dict__['encodeTelPadLabel'];
+    decodeTelPadLabel = TelPadEncodedWordCollection.__dict__['decodeTelPadLabel'];
+    
+    def prefix_search(self, encWord):
+        '''
+        See TelPadEncodedWordCollection.prefix_search()
+        '''
+        if len(encWord) == 0:
+            return [];
+        return unpackStringList(self.request(Opcode.T9_PREFIX_SEARCH, packString(encWord)));
+
+    def ranked_prefix_search(self, encWord, cutoffRank=None):
+        '''
+        See TelPadEncodedWordCollection.ranked_prefix_search()
+        '''
+        if cutoffRank is not None and not isinstance(cutoffRank, int):
+            raise TypeError("Parameter cutoffRank for ranked_prefix_search must be an integer.");
+        payload = struct.pack('!i', NO_CUTOFF_RANK if cutoffRank is None else cutoffRank) + packString(encWord);
+        return unpackStringList(self.request(Opcode.T9_RANKED_PREFIX_SEARCH, payload));
+
+    def rank(self, word):
+        return struct.unpack('!i', self.request(Opcode.T9_RANK, packString(word)))[0];
+    
+    def contains(self, encWord):
+        return struct.unpack('!B', self.request(Opcode.T9_CONTAINS, packString(encWord)))[0] == 1;
+    
+    def noteWordUsed(self, realWord):
+        self.request(Opcode.T9_NOTE_WORD_USED, packString(realWord));
+    
+    def addToUserDict(self, newRealWord, rankInt=0):
+        payload = struct.pack('!i', rankInt) + packString(newRealWord);
+        return struct.unpack('!B', self.request(Opcode.T9_ADD_TO_USER_DICT, payload))[0] == 1;
+
+if __name__ == "__main__":
+    
+    # Usage: dict_server.py [socketPath [dictDir]]
+    socketPath = sys.argv[1] if len(sys.argv) > 1 else None;
+    dictDir    = sys.argv[2] if len(sys.argv) > 2 else None;
+    server = WordCollectionServer(socketPath=socketPath, dictDir=dictDir);
+    print("Word completion server listening on %s" % server.socketPath);
+    try:
+        server.serve_forever();
+    except KeyboardInterrupt:
+        pass;
+    finally:
+        server.server_close();
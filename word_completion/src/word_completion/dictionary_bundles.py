@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+import bisect;
+import os;
+import sys;
+import threading;
+
+from front_coding import FrontCodedWordList;
+from recency_cache import RecencyCache;
+from word_collection import WordCollection, CompletionKind, selectTopRanked;
+
+# Dictionaries for several languages or domains, of which one is
+# active at a time. Each is a bundle directory under a common root:
+#
+#    bundleRoot/
+#        en/
+#            words.fcwl                 front-coded snapshot, see front_coding.py
+#            dictUserRankAndWord.txt    the bundle's user dictionary
+#        de/
+#            ...
+#
+# Build a bundle from a directory of rank/word files with:
+#
+#    dictionary_bundles.py bundleRoot/en dictDir
+#
+# The snapshots are memory-mapped, so a bundle costs little more
+# than the pages that lookups touch, and no tree is built.
+
+class DictionaryBundle(object):
+    '''
+    One compiled dictionary and its user dictionary. Offers the
+    lookup methods of WordCollection. User dictionary words are held
+    in memory; the compiled words stay in the mapped snapshot.
+    '''
+    
+    SNAPSHOT_FILE_NAME = "words.fcwl";
+    USER_DICT_FILE_NAME = WordCollection.DEFAULT_USER_DICT_FILE_NAME;
+    
+    def __init__(self, bundleDir):
+        '''
+        Map the bundle's snapshot, and read its user dictionary, if any.
+        @param bundleDir: directory with the snapshot file
+        @type bundleDir: string
+        @raise ValueError: if the snapshot file is invalid.
+        @raise IOError: if the snapshot file cannot be read.
+        '''
+        self.bundleDir = bundleDir;
+        self.name = os.path.basename(os.path.normpath(bundleDir));
+        self.wordList = FrontCodedWordList.load(os.path.join(bundleDir, DictionaryBundle.SNAPSHOT_FILE_NAME));
+        self.userDictFilePath = os.path.join(bundleDir, DictionaryBundle.USER_DICT_FILE_NAME);
+        if os.path.exists(self.userDictFilePath):
+            self.userWordsToRanks = WordCollection.readRankAndWordFile(self.userDictFilePath);
+        else:
+            self.userWordsToRanks = {};
+        # Sorted (foldedWord, word) pairs of the user words, for prefix search:
+        self.userKeys = sorted([(self.foldCase(word), word) for word in self.userWordsToRanks.keys()]);
+        self.recentWords = RecencyCache(WordCollection.RECENT_WORDS_CAPACITY);
+        self.writeLock = threading.Lock();
+    
+    @classmethod
+    def build(cls, bundleDir, dictDir):
+        '''
+        Compile all rank/word files of dictDir into the snapshot of a new or
+        existing bundle directory. The bundle's user dictionary is not touched.
+        If a word occurs in several files, one of its ranks is used, as in WordCollection.
+        @param bundleDir: bundle directory to create or update
+        @type bundleDir: string
+        @param dictDir: directory of rank/word files
+        @type dictDir: string
+        @return: the number of compiled words
+        @rtype: int
+        '''
+        wordsToRanks = {};
+        for rankAndWordListFileName in os.listdir(dictDir):
+            wordsToRanks.update(WordCollection.readRankAndWordFile(os.path.join(dictDir, rankAndWordListFileName)));
+        if not os.path.isdir(bundleDir):
+            os.makedirs(bundleDir);
+        FrontCodedWordList.fromWords(wordsToRanks.items()).save(os.path.join(bundleDir, cls.SNAPSHOT_FILE_NAME));
+        return len(wordsToRanks);
+    
+    def close(self):
+        self.wordList.close();
+    
+    def foldCase(self, word):
+        return word.lower();
+    
+    def prefix_search(self, word, cutoffRank=None):
+        '''
+        See WordCollection.prefix_search().
+        '''
+        if cutoffRank is not None:
+            if not isinstance(cutoffRank, int):
+                raise TypeError("Parameter cutoffRank for prefix_search must be an integer.");
+        if isinstance(word, unicode):
+            word = word.encode('UTF-8');
+        entries = self.wordList.prefixSearchEntries(word) + self.userEntries(word);
+        if cutoffRank is None:
+            return [entryWord for (entryWord, _) in entries];
+        return selectTopRanked(entries, cutoffRank, self.recentWords);
+    
+    def phrase_prefix_search(self, words, cutoffRank=None):
+        '''
+        Like WordCollection.phrase_prefix_search(), but only the last word is
+        searched. Phrase entries of a bundle are offered once their first word
+        is typed. Bundles have no abbreviations.
+        '''
+        if len(words) == 0:
+            return [];
+        return [(entry, 1, CompletionKind.WORD) for entry in self.prefix_search(words[-1], cutoffRank=cutoffRank)];
+    
+    def rank(self, word):
+        '''
+        See WordCollection.rank().
+        @raise KeyError: if word or rank are not present in the bundle. 
+        '''
+        if isinstance(word, unicode):
+            word = word.encode('UTF-8');
+        try:
+            return self.exactRank(word);
+        except KeyError:
+            # A capitalized variant of a dictionary word ranks like the word:
+            foldedWord = self.foldCase(word);
+            if foldedWord == word:
+                raise;
+            return self.exactRank(foldedWord);
+    
+    def contains(self, word):
+        if word is None or len(word) < 1:
+            raise ValueError("word cannot be empty");
+        return word in self.userWordsToRanks or self.wordList.contains(word);
+    
+    def addToUserDict(self, newWord, rankInt=0):
+        '''
+        See WordCollection.addToUserDict(). Appends to the
+        bundle's own user dictionary.
+        '''
+        with self.writeLock:
+            newWord = newWord.encode("UTF-8");
+            if self.contains(newWord):
+                return False;
+            with open(self.userDictFilePath, 'a') as fd:
+                fd.write(str(rankInt) + "\t" + newWord + "\n");
+            self.userWordsToRanks[newWord] = rankInt;
+            # Insert into a copy, so that concurrent searches
+            # see either the old or the new list:
+            userKeys = list(self.userKeys);
+            bisect.insort(userKeys, (self.foldCase(newWord), newWord));
+            self.userKeys = userKeys;
+            return True;
+    
+    def noteWordUsed(self, word):
+        '''
+        See WordCollection.noteWordUsed(). Each bundle
+        remembers its own recently used words.
+        '''
+        if len(word) == 0:
+            return;
+        if not self.contains(word):
+            word = self.foldCase(word);
+            if not self.contains(word):
+                return;
+        with self.writeLock:
+            self.recentWords.noteUsed(word);
+    
+    def clearRecentWords(self):
+        with self.writeLock:
+            self.recentWords.clear();
+    
+    def __len__(self):
+        return len(self.wordList) + len(self.userWordsToRanks);
+    
+    # ----------------------------------  Private -----------------------
+    
+    def exactRank(self, word):
+        try:
+            return self.userWordsToRanks[word];
+        except KeyError:
+            return self.wordList.rank(word);
+    
+    def userEntries(self, prefix):
+        '''
+        Return (word, rank) pairs of the user words that start with
+        prefix, ignoring case.
+        '''
+        foldedPrefix = self.foldCase(prefix);
+        userKeys = self.userKeys;
+        entries = [];
+        for pos in xrange(bisect.bisect_left(userKeys, (foldedPrefix,)), len(userKeys)):
+            (foldedWord, word) = userKeys[pos];
+            if not foldedWord.startswith(foldedPrefix):
+                break;
+            entries.append((word, self.userWordsToRanks[word]));
+        return entries;
+
+class DictionaryBundleSet(object):
+    '''
+    All bundles under one root directory, one of which is active. 
+    Offers the lookup methods of WordCollection, answered by the active
+    bundle, so it can replace a WordCollection in Proser. Switching
+    bundles is one attribute assignment, once a bundle has been opened.
+    Bundles are opened on first use, and stay open.
+    '''
+    
+    # Bundles have no phrase context; see DictionaryBundle.phrase_prefix_search():
+    maxPhraseWords = 1;
+    
+    def __init__(self, bundleRoot, activeBundleName=None):
+        '''
+        @param bundleRoot: directory with one subdirectory per bundle
+        @type bundleRoot: string
+        @param activeBundleName: bundle to activate. If None, the alphabetically first bundle.
+        @type activeBundleName: string
+        @raise ValueError: if there is no bundle under bundleRoot.
+        @raise KeyError: if there is no bundle of the given name.
+        '''
+        self.bundleRoot = bundleRoot;
+        self.bundleNames = sorted([fileName for fileName in os.listdir(bundleRoot) 
+                                   if os.path.exists(os.path.join(bundleRoot, fileName, DictionaryBundle.SNAPSHOT_FILE_NAME))]);
+        if len(self.bundleNames) == 0:
+            raise ValueError("Directory %s contains no dictionary bundles." % bundleRoot);
+        self.openBundles = {};
+        self.openLock = threading.Lock();
+        self.activeBundle = None;
+        self.switchTo(self.bundleNames[0] if activeBundleName is None else activeBundleName);
+        
+    def switchTo(self, bundleName):
+        '''
+        Make the named bundle the active one. Opens the bundle if this
+        is its first use.
+        @param bundleName: name of the bundle's directory
+        @type bundleName: string
+        @raise KeyError: if there is no bundle of the given name.
+        '''
+        if bundleName not in self.bundleNames:
+            raise KeyError(bundleName);
+        with self.openLock:
+            try:
+                bundle = self.openBundles[bundleName];
+            except KeyError:
+                bundle = self.openBundles[bundleName] = DictionaryBundle(os.path.join(self.bundleRoot, bundleName));
+        self.activeBundle = bundle;
+        
+    def switchToNext(self):
+        '''
+        Activate the bundle after the active one, in alphabetical order,
+        wrapping around. Returns the name of the new active bundle.
+        '''
+        nextIndex = (self.bundleNames.index(self.activeBundle.name) + 1) % len(self.bundleNames);
+        self.switchTo(self.bundleNames[nextIndex]);
+        return self.activeBundle.name;
+    
+    def activeBundleName(self):
+        return self.activeBundle.name;
+    
+    def close(self):
+        with self.openLock:
+            for bundle in self.openBundles.values():
+                bundle.close();
+            self.openBundles.clear();
+            
+    def prefix_search(self, word, cutoffRank=None):
+        return self.activeBundle.prefix_search(word, cutoffRank=cutoffRank);
+    
+    def phrase_prefix_search(self, words, cutoffRank=None):
+        return self.activeBundle.phrase_prefix_search(words, cutoffRank=cutoffRank);
+    
+    def rank(self, word):
+        return self.activeBundle.rank(word);
+    
+    def contains(self, word):
+        return self.activeBundle.contains(word);
+    
+    def addToUserDict(self, newWord, rankInt=0):
+        return self.activeBundle.addToUserDict(newWord, rankInt=rankInt);
+    
+    def noteWordUsed(self, word):
+        self.activeBundle.noteWordUsed(word);
+    
+    def clearRecentWords(self):
+        self.activeBundle.clearRecentWords();
+    
+    def __len__(self):
+        return len(self.activeBundle);
+
+if __name__ == "__main__":
+    
+    if len(sys.argv) != 3:
+        print("Usage: dictionary_bundles.py bundleDir dictDir");
+        sys.exit(1);
+    numWords = DictionaryBundle.build(sys.argv[1], sys.argv[2]);
+    print("Compiled %d words into %s" % (numWords, sys.argv[1]));
@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+import array;
+import heapq;
+import mmap;
+import struct;
+import sys;
+
+# Front-coded (incremental prefix-compressed) storage for a
+# sorted, ranked word list.
+#
+# Entries are sorted by case-folded word, and cut into blocks of 
+# BLOCK_SIZE entries. The first entry of each block is stored whole.
+# Each following entry is stored as the number of leading bytes it 
+# shares with its predecessor, and the remaining suffix:
+#
+#    block:  <suffixLen:B> <head bytes>
+#            <sharedLen:B> <suffixLen:B> <suffix bytes>   (BLOCK_SIZE - 1 times)
+#
+# The block index holds the byte offset of each block. A lookup binary
+# searches the block heads, and decodes entries only within one or a few
+# blocks. Ranks are held in a parallel int array. 
+#
+# Snapshot file layout (little-endian):
+#
+#    header:  magic 'FCWL', format version, block size, number of entries, 
+#             number of blocks, number of data bytes
+#    uint32[numBlocks]  block offsets
+#    int32[numEntries]  ranks; NO_RANK for entries without a rank
+#    data bytes
+
+class FrontCodedWordList(object):
+    '''
+    Read-only, front-coded list of words and their ranks. Supports
+    prefix search, membership test, and rank lookup. Instances are created
+    from words with fromWords() or fromWordCollection(), or from a snapshot
+    file with load().
+    '''
+    
+    BLOCK_SIZE = 16;
+    NO_RANK = -1;
+    # Encoded entry lengths must fit one byte:
+    MAX_WORD_BYTES = 255;
+    
+    SNAPSHOT_MAGIC = 'FCWL';
+    SNAPSHOT_VERSION = 1;
+    # magic, version, block size, numEntries, numBlocks, numDataBytes:
+    SNAPSHOT_HEADER = struct.Struct('<4sHHIII');
+    
+    def __init__(self, data, blockOffsets, ranks, numEntries, blockSize=None):
+        '''
+        Clients use fromWords(), fromWordCollection(), or load().
+        @param data: the encoded blocks
+        @type data: string, or mmap
+        @param blockOffsets: offset of each block in data
+        @type blockOffsets: array('I')
+        @param ranks: rank of each entry in sort order
+        @type ranks: array('i')
+        @param numEntries: number of entries
+        @type numEntries: int
+        @param blockSize: entries per block
+        @type blockSize: int
+        '''
+        self.data = data;
+        self.blockOffsets = blockOffsets;
+        self.ranks = ranks;
+        self.numEntries = numEntries;
+        if blockSize is None:
+            blockSize = FrontCodedWordList.BLOCK_SIZE;
+        self.blockSize = blockSize;
+        # Set when the data are mapped from a snapshot file:
+        self.snapshotFile = None;
+    
+    @classmethod
+    def fromWords(cls, wordsAndRanks, blockSize=None):
+        '''
+        Build a list from (word, rank) pairs in any order.
+        @param wordsAndRanks: UTF-8 encoded words, and their ranks. A rank of None is stored as NO_RANK.
+        @type wordsAndRanks: [(string, int)]
+        @param blockSize: entries per block. Larger blocks compress better, but
+                          lookups decode more entries.
+        @type blockSize: int
+        @raise ValueError: if a word is empty, or longer than MAX_WORD_BYTES when encoded.
+        '''
+        if blockSize is None:
+            blockSize = cls.BLOCK_SIZE;
+        sortedEntries = sorted(wordsAndRanks, key=lambda wordAndRank: (cls.foldCase(wordAndRank[0]), wordAndRank[0]));
+        chunks = [];
+        numDataBytes = 0;
+        blockOffsets = array.array('I');
+        ranks = array.array('i');
+        prevWord = '';
+        for (index, (word, rankInt)) in enumerate(sortedEntries):
+            if isinstance(word, unicode):
+                word = word.encode('UTF-8');
+            if len(word) == 0 or len(word) > cls.MAX_WORD_BYTES:
+                raise ValueError("Front-coded entries must have 1 to %d bytes: '%s'" % (cls.MAX_WORD_BYTES, word));
+            if index % blockSize == 0:
+                blockOffsets.append(numDataBytes);
+                chunk = chr(len(word)) + word;
+            else:
+                sharedLen = cls.sharedPrefixLength(prevWord, word);
+                chunk = chr(sharedLen) + chr(len(word) - sharedLen) + word[sharedLen:];
+            chunks.append(chunk);
+            numDataBytes += len(chunk);
+            ranks.append(cls.NO_RANK if rankInt is None else rankInt);
+            prevWord = word;
+        return cls(''.join(chunks), blockOffsets, ranks, len(sortedEntries), blockSize);
+    
+    @classmethod
+    def fromWordCollection(cls, wordCollection, blockSize=None):
+        '''
+        Build a list of all entries of a WordCollection, with their ranks.
+        Abbreviation expansions are not entries, and are left out.
+        @param wordCollection: collection to copy
+        @type wordCollection: WordCollection
+        @param blockSize: entries per block.
+        @type blockSize: int
+        '''
+        wordsAndRanks = [];
+        for foldedWord in wordCollection.foldedToEntries.keys():
+            wordsAndRanks.extend([(word, rankInt) for (word, rankInt) in wordCollection.getEntries(foldedWord)
+                                  if wordCollection.foldCase(word) == foldedWord]);
+        return cls.fromWords(wordsAndRanks, blockSize);
+    
+    @classmethod
+    def load(cls, filePath, useMmap=True):
+        '''
+        Read a snapshot file written by save(). With useMmap, the encoded
+        blocks are not read, but mapped into memory, so that pages are 
+        loaded as lookups touch them, and are shared among processes that 
+        load the same file.
+        @param filePath: snapshot file
+        @type filePath: string
+        @param useMmap: if True, map the encoded blocks instead of reading them.
+        @type useMmap: boolean
+        @raise ValueError: if the file is not a snapshot of a supported version.
+        @raise IOError: if the file cannot be read.
+        '''
+        with open(filePath, 'rb') as fd:
+            header = fd.read(cls.SNAPSHOT_HEADER.size);
+            if len(header) != cls.SNAPSHOT_HEADER.size:
+                raise ValueError("File %s is too short for a word list snapshot." % filePath);
+            (magic, version, blockSize, numEntries, numBlocks, numDataBytes) = cls.SNAPSHOT_HEADER.unpack(header);
+            if magic != cls.SNAPSHOT_MAGIC or version != cls.SNAPSHOT_VERSION:
+                raise ValueError("File %s is not a version %d word list snapshot." % (filePath, cls.SNAPSHOT_VERSION));
+            blockOffsets = array.array('I');
+            blockOffsets.fromfile(fd, numBlocks);
+            ranks = array.array('i');
+            ranks.fromfile(fd, numEntries);
+            if sys.byteorder != 'little':
+                blockOffsets.byteswap();
+                ranks.byteswap();
+            dataOffset = fd.tell();
+            if useMmap and numDataBytes > 0:
+                # Map the whole file; mmap offsets must be page aligned:
+                data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ);
+                wordList = cls(data, blockOffsets, ranks, numEntries, blockSize);
+                wordList.dataStart = dataOffset;
+                return wordList;
+            data = fd.read(numDataBytes);
+        return cls(data, blockOffsets, ranks, numEntries, blockSize);
+    
+    def save(self, filePath):
+        '''
+        Write this list to a snapshot file that load() can read.
+        @param filePath: file to create or overwrite
+        @type filePath: string
+        '''
+        blockOffsets = array.array('I', self.blockOffsets);
+        ranks = array.array('i', self.ranks);
+        if sys.byteorder != 'little':
+            blockOffsets.byteswap();
+            ranks.byteswap();
+        numDataBytes = self.numDataBytes();
+        with open(filePath, 'wb') as fd:
+            fd.write(FrontCodedWordList.SNAPSHOT_HEADER.pack(FrontCodedWordList.SNAPSHOT_MAGIC,
+                                                             FrontCodedWordList.SNAPSHOT_VERSION,
+                                                             self.blockSize,
+                                                             self.numEntries,
+                                                             len(self.blockOffsets),
+                                                             numDataBytes));
+            blockOffsets.tofile(fd);
+            ranks.tofile(fd);
+            fd.write(self.data[self.dataStart:self.dataStart + numDataBytes]);
+    
+    def close(self):
+        '''
+        Release the memory mapping, if any. The list is unusable afterwards.
+        '''
+        if isinstance(self.data, mmap.mmap):
+            self.data.close();
+    
+    # ----------------------------------  Lookups -----------------------
+    
+    def prefix_search(self, prefix, cutoffRank=None):
+        '''
+        Return all entries that begin with prefix, ignoring case. If cutoffRank
+        is given, only the cutoffRank best ranked entries are returned, best first.
+        Else the entries are returned in sort order.
+        @param prefix: prefix to search by
+        @type prefix: string
+        @param cutoffRank: number of entries to return
+        @type cutoffRank: int
+        @rtype: [string]
+        '''
+        matches = self.prefixSearchEntries(prefix);
+        if cutoffRank is not None:
+            matches = heapq.nsmallest(cutoffRank, matches, key=lambda wordAndRank: sys.maxint if wordAndRank[1] is None else wordAndRank[1]);
+        return [word for (word, _) in matches];
+    
+    def prefixSearchEntries(self, prefix):
+        '''
+        Return (word, rank) pairs of all entries that begin with prefix, 
+        ignoring case, in sort order. The rank is None for entries without rank.
+        @param prefix: prefix to search by
+        @type prefix: string
+        @rtype: [(string, int)]
+        '''
+        foldedPrefix = self.foldCase(prefix);
+        ranks = self.ranks;
+        matches = [];
+        for (index, word) in self.iterEntries(self.findBlock(foldedPrefix)):
+            foldedWord = self.foldCase(word);
+            if foldedWord.startswith(foldedPrefix):
+                rankInt = ranks[index];
+                matches.append((word, None if rankInt == FrontCodedWordList.NO_RANK else rankInt));
+            elif foldedWord > foldedPrefix:
+                break;
+        return matches;
+    
+    def contains(self, word):
+        return self.indexOf(word) is not None;
+    
+    def rank(self, word):
+        '''
+        Return the rank of word.
+        @raise KeyError: if word is not in the list, or has no rank.
+        '''
+        index = self.indexOf(word);
+        if index is None or self.ranks[index] == FrontCodedWordList.NO_RANK:
+            raise KeyError(word);
+        return self.ranks[index];
+    
+    def indexOf(self, word):
+        '''
+        Return the position of word in sort order, or None
+        if word is not in the list.
+        '''
+        foldedWord = self.foldCase(word);
+        for (index, entry) in self.iterEntries(self.findBlock(foldedWord)):
+            if entry == word:
+                return index;
+            if self.foldCase(entry) > foldedWord:
+                return None;
+        return None;
+    
+    def __iter__(self):
+        '''
+        Iterate over (word, rank) pairs in sort order. The rank is None for
+        entries without rank.
+        '''
+        for (index, word) in self.iterEntries(0):
+            rankInt = self.ranks[index];
+            yield (word, None if rankInt == FrontCodedWordList.NO_RANK else rankInt);
+    
+    def __len__(self):
+        return self.numEntries;
+    
+    def numDataBytes(self):
+        '''
+        Return the size of the encoded blocks.
+        '''
+        if isinstance(self.data, mmap.mmap):
+            return len(self.data) - self.dataStart;
+        return len(self.data);
+    
+    # ----------------------------------  Private -----------------------
+    
+    # Offset of the encoded blocks in self.data. Non-zero
+    # when self.data maps an entire snapshot file:
+    dataStart = 0;
+    
+    @staticmethod
+    def foldCase(word):
+        return word.lower();
+    
+    @staticmethod
+    def sharedPrefixLength(word1, word2):
+        maxLen = min(len(word1), len(word2), FrontCodedWordList.MAX_WORD_BYTES);
+        sharedLen = 0;
+        while sharedLen < maxLen and word1[sharedLen] == word2[sharedLen]:
+            sharedLen += 1;
+        return sharedLen;
+    
+    def blockHead(self, blockIndex):
+        offset = self.dataStart + self.blockOffsets[blockIndex];
+        headLen = ord(self.data[offset]);
+        return self.data[offset + 1:offset + 1 + headLen];
+    
+    def findBlock(self, foldedWord):
+        '''
+        Return the index of the last block whose head is less than
+        foldedWord, or 0. Entries equal to or starting with foldedWord
+        begin in that block at the earliest. 
+        '''
+        (low, high) = (0, len(self.blockOffsets));
+        while low < high:
+            middle = (low + high) // 2;
+            if self.foldCase(self.blockHead(middle)) < foldedWord:
+                low = middle + 1;
+            else:
+                high = middle;
+        return max(low - 1, 0);
+    
+    def iterEntries(self, startBlock):
+        '''
+        Decode entries from the start of the given block to the end
+        of the list. Yields (index, word) pairs.
+        '''
+        data = self.data;
+        dataStart = self.dataStart;
+        blockSize = self.blockSize;
+        for blockIndex in xrange(startBlock, len(self.blockOffsets)):
+            offset = dataStart + self.blockOffsets[blockIndex];
+            index = blockIndex * blockSize;
+            headLen = ord(data[offset]);
+            word = data[offset + 1:offset + 1 + headLen];
+            offset += 1 + headLen;
+            yield (index, word);
+            for index in xrange(index + 1, min(index + blockSize, self.numEntries)):
+                sharedLen = ord(data[offset]);
+                suffixLen = ord(data[offset + 1]);
+                word = word[:sharedLen] + data[offset + 2:offset + 2 + suffixLen];
+                offset += 2 + suffixLen;
+                yield (index, word);
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+from collections import OrderedDict;
+
+class RecencyCache(object):
+    '''
+    Bounded record of the most recently used words. Noting a use
+    moves the word to the most recent end in constant time. When the
+    capacity is exceeded, the least recently used word is dropped.
+    '''
+    
+    def __init__(self, capacity):
+        '''
+        @param capacity: maximum number of words remembered.
+        @type capacity: int
+        @raise ValueError: if capacity is less than 1.
+        '''
+        if capacity < 1:
+            raise ValueError("RecencyCache capacity must be at least 1, not %s" % str(capacity));
+        self.capacity = capacity;
+        # Word to the value of useCounter when it was last used. 
+        # Ordered from least to most recently used:
+        self.wordToLastUse = OrderedDict();
+        self.useCounter = 0;
+        
+    def noteUsed(self, word):
+        '''
+        Record that word was just typed or accepted.
+        @param word: the word
+        @type word: string
+        '''
+        self.useCounter += 1;
+        self.wordToLastUse.pop(word, None);
+        self.wordToLastUse[word] = self.useCounter;
+        if len(self.wordToLastUse) > self.capacity:
+            self.wordToLastUse.popitem(last=False);
+    
+    def lastUse(self, word):
+        '''
+        Return a number that is larger the more recently word was used,
+        or None if word is not among the remembered words.
+        @param word: the word
+        @type word: string
+        '''
+        return self.wordToLastUse.get(word, None);
+    
+    def clear(self):
+        self.wordToLastUse.clear();
+        
+    def __contains__(self, word):
+        return word in self.wordToLastUse;
+    
+    def __len__(self):
+        return len(self.wordToLastUse);
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+
+import argparse;
+import json;
+import multiprocessing;
+import sys;
+from timeit import default_timer as timer;
+
+from word_collection import TelPadEncodedWordCollection;
+from completion_metrics import CompletionMetrics, Histogram;
+from corpus_dict_builder import WORD_PATTERN, shardCorpusFiles;
+
+# Replays words through the telephone pad input of TBoard, without Qt,
+# and measures how far down the remaining-words list each word sits:
+#
+#   - The simulated user enters one button per letter of the word.
+#     The button sequence is the word's TelPadEncodedWordCollection.encodeWord().
+#   - After each button, the list of remaining words is rebuilt with the
+#     ranking of TBoard's showRemainingWords(), and its first row is selected.
+#   - The user can flick South as often as the word's position in the list
+#     requires, then flick East to accept it.
+#
+# For each prefix length, the simulator records the word's list position,
+# which equals the number of South flicks needed. The best strategy is the
+# prefix length with the fewest buttons plus flicks. Words that contain
+# characters other than letters cannot be entered with buttons alone, and
+# are only counted. Input may be a word list, or any text corpus; words
+# are extracted as by the corpus dictionary builder.
+#
+# Usage: telpad_simulator.py [--dictDir dir] [--processes n] corpusOrWordListFile [...]
+
+class TelPadSimulationResult(object):
+    '''
+    Counts of one simulation run. Results of parallel runs
+    are combined with merge().
+    '''
+    
+    def __init__(self):
+        self.numWords = 0;
+        # Words with characters that have no button:
+        self.numUntypeable = 0;
+        # Words that are not in the list even when fully entered:
+        self.numNotInDictionary = 0;
+        # Over all words in the dictionary:
+        self.numLetters = 0;
+        self.numFlicksAtFullWord = 0;
+        # Buttons, South flicks, and the East flick of each word's best strategy:
+        self.numActionsBest = 0;
+        # Prefix length to histogram of the word's list position:
+        self.positionsByPrefixLength = {};
+        self.queryLatencies = Histogram(CompletionMetrics.LATENCY_BUCKETS);
+        
+    def recordPosition(self, prefixLength, position):
+        try:
+            histogram = self.positionsByPrefixLength[prefixLength];
+        except KeyError:
+            histogram = self.positionsByPrefixLength[prefixLength] = Histogram(CompletionMetrics.COUNT_BUCKETS);
+        histogram.record(position);
+        
+    def merge(self, other):
+        '''
+        Add the counts of another result.
+        @param other: result to add
+        @type other: TelPadSimulationResult
+        '''
+        self.numWords += other.numWords;
+        self.numUntypeable += other.numUntypeable;
+        self.numNotInDictionary += other.numNotInDictionary;
+        self.numLetters += other.numLetters;
+        self.numFlicksAtFullWord += other.numFlicksAtFullWord;
+        self.numActionsBest += other.numActionsBest;
+        for (prefixLength, histogram) in other.positionsByPrefixLength.items():
+            if prefixLength in self.positionsByPrefixLength:
+                self.positionsByPrefixLength[prefixLength].merge(histogram);
+            else:
+                self.positionsByPrefixLength[prefixLength] = histogram;
+        self.queryLatencies.merge(other.queryLatencies);
+        
+    def numWordsInDictionary(self):
+        return self.numWords - self.numUntypeable - self.numNotInDictionary;
+        
+    def toDict(self):
+        numInDictionary = self.numWordsInDictionary();
+        if numInDictionary > 0:
+            meanFlicksAtFullWord = self.numFlicksAtFullWord / float(numInDictionary);
+            meanActionsBest = self.numActionsBest / float(numInDictionary);
+            # Entering all letters, and accepting the top word:
+            meanActionsBaseline = (self.numLetters + numInDictionary) / float(numInDictionary);
+        else:
+            (meanFlicksAtFullWord, meanActionsBest, meanActionsBaseline) = (None, None, None);
+        return {
+                'words'                   : self.numWords,
+                'untypeable'              : self.numUntypeable,
+                'notInDictionary'         : self.numNotInDictionary,
+                'meanFlicksAtFullWord'    : meanFlicksAtFullWord,
+                'meanActionsBest'         : meanActionsBest,
+                'meanLettersPlusAccept'   : meanActionsBaseline,
+                'positionByPrefixLength'  : dict([(prefixLength, histogram.toDict()) 
+                                                  for (prefixLength, histogram) in self.positionsByPrefixLength.items()]),
+                'queryLatency'            : self.queryLatencies.toDict()
+                };
+
+class TelPadSimulator(object):
+    '''
+    Replays words through TBoard's button entry and word list ranking.
+    '''
+    
+    def __init__(self, wordCollection):
+        '''
+        @param wordCollection: collection to query
+        @type wordCollection: TelPadEncodedWordCollection
+        '''
+        self.wordCollection = wordCollection;
+        self.result = TelPadSimulationResult();
+    
+    def simulateLines(self, lines):
+        '''
+        Simulate entering each word of the given lines.
+        @param lines: text lines
+        @type lines: iterable of strings
+        @return: the accumulated result of this simulator
+        @rtype: TelPadSimulationResult
+        '''
+        for line in lines:
+            for word in WORD_PATTERN.findall(line):
+                self.simulateWord(word);
+        return self.result;
+    
+    def simulateWord(self, word):
+        '''
+        Simulate entering one word.
+        @param word: the word
+        @type word: string
+        '''
+        result = self.result;
+        result.numWords += 1;
+        if not word.isalpha():
+            result.numUntypeable += 1;
+            return;
+        encWord = self.wordCollection.encodeWord(word);
+        # TBoard inserts list entries as they are; a sentence-initial
+        # capital is not available, so the lower case entry is as good:
+        targets = (word, word.lower());
+        positions = [];
+        for prefixLength in range(1, len(encWord) + 1):
+            startTime = timer();
+            # The ranking of TBoard.showRemainingWords():
+            remainingWords = self.wordCollection.ranked_prefix_search(encWord[:prefixLength]);
+            result.queryLatencies.record(timer() - startTime);
+            for (position, remainingWord) in enumerate(remainingWords):
+                if remainingWord in targets:
+                    positions.append((prefixLength, position));
+                    break;
+            else:
+                result.numNotInDictionary += 1;
+                return;
+        for (prefixLength, position) in positions:
+            result.recordPosition(prefixLength, position);
+        result.numLetters += len(encWord);
+        result.numFlicksAtFullWord += positions[-1][1];
+        # Buttons, South flicks, and one East flick:
+        result.numActionsBest += min([prefixLength + position + 1 for (prefixLength, position) in positions]);
+
+# ----------------------------------  Parallel Simulation -----------------------
+
+# One simulator per worker process, built by initWorker():
+workerSimulator = None;
+
+def initWorker(dictDir, userDictFilePath):
+    global workerSimulator;
+    workerSimulator = TelPadSimulator(TelPadEncodedWordCollection(dictDir=dictDir, userDictFilePath=userDictFilePath));
+
+def simulateShard(shard):
+    '''
+    Process pool worker: simulate the words of one corpus shard.
+    @param shard: shard to simulate
+    @type shard: CorpusShard
+    @rtype: TelPadSimulationResult
+    '''
+    workerSimulator.result = TelPadSimulationResult();
+    return workerSimulator.simulateLines(shard.lines());
+
+def simulateCorpus(corpusFilePaths, dictDir=None, userDictFilePath=None, numProcesses=None, shardBytes=1024 * 1024):
+    '''
+    Simulate entering the words of the given files with a
+    TelPadEncodedWordCollection built from the given dictionary. The files
+    are cut into shards, which are simulated in a pool of processes.
+    @param corpusFilePaths: plain text or gzip (.gz) files
+    @type corpusFilePaths: [string]
+    @param dictDir: see WordCollection
+    @type dictDir: string
+    @param userDictFilePath: see WordCollection
+    @type userDictFilePath: string
+    @param numProcesses: size of the process pool. None: one per CPU. 1: no pool.
+    @type numProcesses: int
+    @param shardBytes: approximate shard size for plain text files
+    @type shardBytes: int
+    @return: the combined result of all shards
+    @rtype: TelPadSimulationResult
+    '''
+    shards = shardCorpusFiles(corpusFilePaths, shardBytes);
+    if numProcesses == 1 or len(shards) == 1:
+        initWorker(dictDir, userDictFilePath);
+        shardResults = map(simulateShard, shards);
+    else:
+        pool = multiprocessing.Pool(numProcesses, initWorker, (dictDir, userDictFilePath));
+        try:
+            shardResults = pool.map(simulateShard, shards);
+        finally:
+            pool.close();
+            pool.join();
+    result = TelPadSimulationResult();
+    for shardResult in shardResults:
+        result.merge(shardResult);
+    return result;
+
+if __name__ == "__main__":
+    
+    parser = argparse.ArgumentParser(description="Measure word list positions and flicks of TBoard telephone pad input.");
+    parser.add_argument('--dictDir', default=None, help="dictionary directory; default: the built-in dict_files");
+    parser.add_argument('--userDict', default=None, help="user dictionary file");
+    parser.add_argument('--processes', type=int, default=None, help="simulation processes; default: one per CPU");
+    parser.add_argument('inputFiles', nargs='+', help="word lists, or plain text or .gz corpus files");
+    args = parser.parse_args();
+    
+    result = simulateCorpus(args.inputFiles,
+                            dictDir=args.dictDir,
+                            userDictFilePath=args.userDict,
+                            numProcesses=args.processes);
+    json.dump(result.toDict(), sys.stdout, indent=2);
+    sys.stdout.write('\n');
@@ -34,15 +34,109 @@
 
 
 import array;
+import bisect;
+import heapq;
 import os
 import sys
+import threading;
+from timeit import default_timer as timer;
 sys.path.append(os.path.join(os.path.dirname(__file__), "../../lib"));
 from ternarytree import TernarySearchTree;
+from dict_file_watcher import DictFileWatcher;
+from completion_metrics import CompletionMetrics;
+from recency_cache import RecencyCache;
+from front_coding import FrontCodedWordList;
 
 # TODO: 
 #  - get ternarytree.so into lib subdir during setup. Make that work for Cygwin as well.
 
 
+def entryRank(entry):
+    '''
+    Sort key for (word, rank) entries. Entries
+    without a rank sort after all ranked entries.
+    '''
+    rankInt = entry[1];
+    if rankInt is None:
+        return sys.maxint;
+    return rankInt;
+
+def selectTopRanked(entries, cutoffRank, recentWords):
+    '''
+    Return the words of the cutoffRank best of the given entries, best
+    first. Recently used words among them come first, most recent first.
+    The remaining places are filled in order of static rank; entries
+    without rank come last. Uses bounded heaps instead of sorting all
+    entries.
+    @param entries: candidate (word, rank) pairs
+    @type entries: [(string, int)]
+    @param cutoffRank: number of words to return. If None, all words are returned.
+    @type cutoffRank: int
+    @param recentWords: recently used words
+    @type recentWords: RecencyCache
+    @rtype: [string]
+    '''
+    maxBoosted = WordCollection.MAX_RECENCY_BOOSTED_RESULTS;
+    if cutoffRank is not None:
+        maxBoosted = min(maxBoosted, cutoffRank);
+    if len(recentWords) > 0:
+        boostedWords = heapq.nlargest(maxBoosted,
+                                      [word for (word, _) in entries if word in recentWords],
+                                      key=recentWords.lastUse);
+    else:
+        boostedWords = [];
+    if cutoffRank is None:
+        rankedEntries = sorted(entries, key=entryRank);
+    else:
+        rankedEntries = heapq.nsmallest(cutoffRank, entries, key=entryRank);
+    rankedWords = [word for (word, _) in rankedEntries];
+    if len(boostedWords) == 0:
+        return rankedWords;
+    rankedWords = [word for word in rankedWords if word not in boostedWords];
+    if cutoffRank is None:
+        return boostedWords + rankedWords;
+    return boostedWords + rankedWords[:cutoffRank - len(boostedWords)];
+
+def packEntries(foldedWord, entries):
+    '''
+    Return the compact form in which the (surfaceForm, rank) entries of
+    one tree key are stored in WordCollection.foldedToEntries. Most keys
+    hold a single entry whose surface form is the key itself; for those,
+    only the rank is stored. Other keys hold a flat tuple of alternating
+    surface forms and ranks, in which surface forms equal to the key
+    share the key's string object.
+    @param foldedWord: the tree key
+    @type foldedWord: string
+    @param entries: (surfaceForm, rank) pairs; at least one.
+    @type entries: ((string, int))
+    @return: the rank, or the flat tuple
+    @rtype: int, None, or tuple
+    '''
+    if len(entries) == 1 and entries[0][0] == foldedWord:
+        return entries[0][1];
+    packedEntries = [];
+    for (surfaceForm, rankInt) in entries:
+        packedEntries.append(foldedWord if surfaceForm == foldedWord else surfaceForm);
+        packedEntries.append(rankInt);
+    return tuple(packedEntries);
+
+def unpackEntries(foldedWord, packedEntries):
+    '''
+    Inverse of packEntries(). Ranks are never tuples, so a tuple
+    is always the flat form. The empty tuple yields no entries.
+    @rtype: ((string, int))
+    '''
+    if not isinstance(packedEntries, tuple):
+        return ((foldedWord, packedEntries),);
+    return tuple(zip(packedEntries[0::2], packedEntries[1::2]));
+
+class CompletionKind:
+    # Completion that extends the typed prefix:
+    WORD         = 0
+    # Expansion of an abbreviation that starts with the typed
+    # prefix. Replaces the typed prefix when accepted:
+    ABBREVIATION = 1
+
 # ABC, DEF, GHI, JKL, MNO, PQR, STUV, WXYZ
 #  A    D    G    J    M    P     S    W
 #
@@ -54,31 +148,93 @@ class WordCollection(TernarySearchTree):
 
     This class ingests rank/word pair files in a given directory. The ranks are intended
     to be relative usage frequencies. The class manages these frequency ranks.
+    
+    The tree is keyed by case-folded words. Each folded key maps back to
+    all the surface forms that were inserted for it, such as 'menlo' to 'Menlo',
+    or 'steve' to both 'steve' and 'Steve'. Prefix searches therefore ignore the
+    case of the prefix, and return the words as they were inserted.
+    
+    Entries may be phrases, such as 'move to the dock'. Phrases are stored
+    and ranked like words, so a prefix search for 'mo' returns them along
+    with single words. See phrase_prefix_search() for completing a phrase
+    once several of its words have been typed.
+    
+    Abbreviations, such as 'brb' for 'be right back', are read from a user-editable
+    abbreviation file. Each abbreviation is a tree key like any word, and its
+    expansions are its entries. A prefix search for 'br' thus returns 'be right back'
+    from the same traversal that finds 'bring'. See tagged_prefix_search() for 
+    telling expansions apart from words.
+    
+    Words reported through noteWordUsed() are remembered for the session,
+    and the most recently used of them are listed first in rank-limited
+    prefix search results.
+    
+    Any number of threads may search while one thread changes the collection,
+    for instance through addToUserDict(), or a dictionary file watcher.
+    Changing methods hold writeLock, so concurrent writers take turns. Lookups
+    take no lock: each change replaces the immutable entry tuple of one tree key
+    with a single dict assignment, and the C tree's add() runs without releasing
+    the interpreter lock. A reader therefore sees every word either before or
+    after a change. The version attribute counts changes; a reader can compare it
+    before and after a series of lookups to detect an intervening change. Large 
+    changes, such as applyDictFileChange(), become visible word by word.
 
     Public methods: 
 
       - add(word)
       - contains(word)
+      - remove(word)
       - prefix_search(prefix)
+      - tagged_prefix_search(prefix)
+      - phrase_prefix_search(words)
+      - prefix_search_many(prefixes)
       - rank(word)
+      - rank_many(words)
+      - noteWordUsed(word)
+      - addAbbreviation(abbreviation, expansion)
+      - loadAbbreviations()
+      - startDictFileWatcher()
+      - applyDictFileChange(filePath)
+      - enableMetrics() / disableMetrics()
+      - saveSnapshot(filePath)
     '''
 
     DEFAULT_USER_DICT_FILE_NAME = "dictUserRankAndWord.txt";
     USER_DICT_FILE_PATH = None;
+    DEFAULT_ABBREVIATION_FILE_NAME = "abbreviations.txt";
     
-    def __init__(self, dictDir=None, userDictFilePath=None):
+    # Rank of abbreviation expansions. Abbreviations are deliberate,
+    # so their expansions rank with the most frequent words:
+    ABBREVIATION_RANK = 0;
+    
+    # Rough per-node size of the C tree: object header, four
+    # node pointers, the is-word flag, and the one-char unicode object:
+    ESTIMATED_TREE_NODE_BYTES = 100;
+    
+    # Number of recently used words remembered, and how many of 
+    # the results of a rank-limited prefix search they may occupy:
+    RECENT_WORDS_CAPACITY = 200;
+    MAX_RECENCY_BOOSTED_RESULTS = 2;
+    
+    def __init__(self, dictDir=None, userDictFilePath=None, metrics=None, abbreviationFilePath=None):
         '''
-        Keep track of a Python dict mapping from word to
-        its frequency rank, of the total number of entries, and
-        the number of word files ingested from disk.
+        Keep track of each word's frequency rank, of the total 
+        number of entries, and the number of word files ingested from disk.
         @param dictDir: full path to directory that contains the dictionary files. If None, a 
                         built-in dictionary of 6000 words is used.
         @type dictDir: string
         @param userDictFilePath: full path to within a user dictionary. That file must be organized like
                         the other dictionary files.
         @type userDictFilePath: string  
+        @param metrics: if provided, timing and size measurements are recorded there
+                        from the start, including the dictionary load. See enableMetrics().
+        @type metrics: CompletionMetrics
+        @param abbreviationFilePath: full path to the abbreviation file. If None, abbreviations.txt
+                        next to this module is used. The file need not exist. See loadAbbreviations().
+        @type abbreviationFilePath: string
         '''
         super(WordCollection, self).__init__();
+        self.metrics = metrics;
         if dictDir is None:
             self.dictDir = os.path.join(os.path.dirname(__file__), "dict_files");
         else:
@@ -89,10 +245,50 @@ class WordCollection(TernarySearchTree):
         else:
             WordCollection.USER_DICT_FILE_PATH = userDictFilePath;
             
-        self.realWordToFrequencyRanks = {};
+        # The abbreviation file is kept outside of dictDir,
+        # because all files in dictDir are read as rank/word files:
+        if abbreviationFilePath is None:
+            self.abbreviationFilePath = os.path.join(os.path.dirname(__file__), WordCollection.DEFAULT_ABBREVIATION_FILE_NAME);
+        else:
+            self.abbreviationFilePath = abbreviationFilePath;
+            
+        # Map from case-folded tree key to the (surfaceForm, rank)
+        # entries that were inserted under that key, in the compact
+        # form of packEntries(). Use getEntries() and setEntries() to 
+        # access them. The rank is None if none was given. Ranks
+        # thus come with the tree key during prefix searches,
+        # without a second lookup per candidate. The underlying tree 
+        # cannot delete words. Tree keys without an entry here
+        # have been removed, and are skipped by all lookups.
+        # The entries are never modified, but replaced, so
+        # readers need no lock (see class comment):
+        self.foldedToEntries = {};
+        # Serializes writers. Reentrant, because some writing
+        # methods call others:
+        self.writeLock = threading.RLock();
+        # Incremented by every change of the entries:
+        self.version = 0;
+        # Map from full path of each ingested dictionary file
+        # to a dict of the words and ranks it contributed.
+        # Used to compute the difference when a file changes:
+        self.dictFileContents = {};
+        self.dictFileWatcher = None;
+        # Number of words in the longest phrase entry, and
+        # how many phrase tree keys start with each folded
+        # first word. Lets phrase_prefix_search() skip contexts
+        # that cannot start a phrase without touching the tree:
+        self.maxPhraseWords = 1;
+        self.phraseFirstWords = {};
+        self.recentWords = RecencyCache(WordCollection.RECENT_WORDS_CAPACITY);
+        # Map from folded abbreviation to the tuple of its expansions.
+        # The expansions are also entries of the abbreviation's
+        # tree key in foldedToEntries; this map records which 
+        # entries to take out when the abbreviations are reloaded:
+        self.abbreviations = {};
         self.numEntries = 0;
         self.numDictFilesIngested = 0;
         self.createDictStructureFromFiles();
+        self.loadAbbreviations();
     
     def createDictStructureFromFiles(self):
         '''
@@ -102,27 +298,211 @@ class WordCollection(TernarySearchTree):
         of dictionary files.
         @raise ValueError: if a rank in any of the files cannot be read as an integer.
         '''
-        for rankAndWordListFileName in os.listdir(self.dictDir):
-            with open(os.path.realpath(os.path.join(self.dictDir, rankAndWordListFileName))) as fd:
+        with self.writeLock:
+            if self.metrics is not None:
+                startTime = timer();
+            for rankAndWordListFileName in os.listdir(self.dictDir):
+                filePath = os.path.realpath(os.path.join(self.dictDir, rankAndWordListFileName));
+                wordsToRanks = self.readRankAndWordFile(filePath);
                 self.numDictFilesIngested += 1;
-                # Pull the entire rank[\t]word list into memory as one string:
-                rankAndWordLists = fd.read();
-                for line in rankAndWordLists.splitlines():
-                    if len(line) == 0:
-                        continue;
-                    # Make one whitespace split to get the rank and the word:
-                    try:
-                        (rank, word) = line.split(None, 1);
-                    except:
-                        raise ValueError("Word file file %s contains a line that does not contain a numeric rank, followed by a word: '%s'" %
-                                         (rankAndWordListFileName, line));                        
-                    try:
-                        rankInt = int(rank);
-                    except ValueError:
-                        raise ValueError("Word file %s contains a line with a non-numeric rank %s" %
-                                         (rankAndWordListFileName, rank));
+                self.dictFileContents[filePath] = wordsToRanks;
+                for (word, rankInt) in wordsToRanks.items():
                     self.insert(word, rankInt);
+            if self.metrics is not None:
+                self.metrics.recordLoad(timer() - startTime, self.estimateMemoryUsage());
                     
+    @staticmethod
+    def readRankAndWordFile(filePath):
+        '''
+        Read one file of whitespace-separated frequency-rank / word pairs.
+        If a word occurs more than once in the file, its last rank is used.
+        @param filePath: full path to the file.
+        @type filePath: string
+        @return: dict mapping each word in the file to its rank.
+        @rtype: {string : int}
+        @raise ValueError: if a rank in the file cannot be read as an integer.
+        @raise IOError: if the file cannot be read.
+        '''
+        rankAndWordListFileName = os.path.basename(filePath);
+        wordsToRanks = {};
+        with open(filePath) as fd:
+            # Pull the entire rank[\t]word list into memory as one string:
+            rankAndWordLists = fd.read();
+        for line in rankAndWordLists.splitlines():
+            if len(line) == 0:
+                continue;
+            # Make one whitespace split to get the rank and the word:
+            try:
+                (rank, word) = line.split(None, 1);
+            except:
+                raise ValueError("Word file file %s contains a line that does not contain a numeric rank, followed by a word: '%s'" %
+                                 (rankAndWordListFileName, line));                        
+            try:
+                rankInt = int(rank);
+            except ValueError:
+                raise ValueError("Word file %s contains a line with a non-numeric rank %s" %
+                                 (rankAndWordListFileName, rank));
+            wordsToRanks[word] = rankInt;
+        return wordsToRanks;
+
+    def enableMetrics(self, metrics=None):
+        '''
+        Start recording latencies, result sizes, and tree visits
+        of subsequent operations. 
+        @param metrics: instance to record into. If None, a new CompletionMetrics is created.
+        @type metrics: CompletionMetrics
+        @return: the metrics instance that is being recorded into.
+        @rtype: CompletionMetrics
+        '''
+        if metrics is None:
+            metrics = CompletionMetrics();
+        self.metrics = metrics;
+        return metrics;
+    
+    def disableMetrics(self):
+        '''
+        Stop recording measurements. Returns the metrics instance that
+        was in use, or None.
+        '''
+        metrics = self.metrics;
+        self.metrics = None;
+        return metrics;
+    
+    def estimateMemoryUsage(self):
+        '''
+        Return a rough estimate, in bytes, of the memory occupied by
+        the tree and the lookup tables. Walks all entries; intended for
+        occasional diagnostics, not for the query path.
+        '''
+        numBytes = sys.getsizeof(self.foldedToEntries);
+        # items() copies, so that concurrent changes don't break the iteration:
+        for (foldedWord, packedEntries) in self.foldedToEntries.items():
+            # Each tree key costs at most one node per character:
+            numBytes += len(foldedWord) * WordCollection.ESTIMATED_TREE_NODE_BYTES;
+            numBytes += sys.getsizeof(foldedWord) + sys.getsizeof(packedEntries);
+            if isinstance(packedEntries, tuple):
+                for item in packedEntries:
+                    if item is not foldedWord:
+                        numBytes += sys.getsizeof(item);
+        return numBytes;
+
+    def saveSnapshot(self, filePath):
+        '''
+        Write all entries and their ranks to a compact, front-coded
+        snapshot file. The file can be loaded with FrontCodedWordList.load(),
+        which answers prefix searches and rank lookups without building
+        a tree.
+        @param filePath: file to create or overwrite.
+        @type filePath: string
+        @return: the front-coded list that was written.
+        @rtype: FrontCodedWordList
+        '''
+        wordList = FrontCodedWordList.fromWordCollection(self);
+        wordList.save(filePath);
+        return wordList;
+
+    def startDictFileWatcher(self, onChange=None, pollInterval=None):
+        '''
+        Start watching the dictionary directory and the user dictionary
+        file. Whenever one of the files is edited, added, or removed, only
+        the difference to what was loaded from that file is applied to the
+        in-memory structures (see applyDictFileChange()). Uses inotify if
+        the pyinotify module is installed, else polls the files.
+        Changes are applied in the watcher's own thread.
+        @param onChange: optional callable invoked after each applied change
+                         with the file path, and the return value of applyDictFileChange().
+        @type onChange: Python callable
+        @param pollInterval: seconds between checks if polling is used.
+        @type pollInterval: float
+        '''
+        if self.dictFileWatcher is not None:
+            return;
+        def applyAndNotify(filePath):
+            changeCounts = self.applyDictFileChange(filePath);
+            if onChange is not None:
+                onChange(filePath, changeCounts);
+        self.dictFileWatcher = DictFileWatcher(self.dictDir, 
+                                               applyAndNotify, 
+                                               userDictFilePath=WordCollection.USER_DICT_FILE_PATH,
+                                               pollInterval=pollInterval);
+        self.dictFileWatcher.start();
+        
+    def stopDictFileWatcher(self):
+        '''
+        Stop the watcher started by startDictFileWatcher(). Safe to call
+        if no watcher is running.
+        '''
+        if self.dictFileWatcher is None:
+            return;
+        self.dictFileWatcher.stopWatching();
+        self.dictFileWatcher = None;
+        
+    def applyDictFileChange(self, filePath):
+        '''
+        Re-read one dictionary file, and compare its words and ranks to 
+        what was loaded from it earlier. Only the new words, the removed words,
+        and the words whose rank changed are applied to the in-memory 
+        structures. A file that no longer exists counts as empty. A word
+        removed from this file, but still present in another dictionary file,
+        keeps the rank from that other file.
+        @param filePath: full path to the new, changed, or deleted file.
+        @type filePath: string
+        @return: the number of inserted words, removed words, and words whose rank changed.
+        @rtype: (int, int, int)
+        @raise ValueError: if a rank in the file cannot be read as an integer. In that
+                           case nothing is changed.
+        '''
+        with self.writeLock:
+            filePath = os.path.realpath(filePath);
+            oldWordsToRanks = self.dictFileContents.get(filePath, {});
+            if os.path.exists(filePath):
+                newWordsToRanks = self.readRankAndWordFile(filePath);
+                if filePath not in self.dictFileContents:
+                    self.numDictFilesIngested += 1;
+                self.dictFileContents[filePath] = newWordsToRanks;
+            else:
+                newWordsToRanks = {};
+                if self.dictFileContents.pop(filePath, None) is not None:
+                    self.numDictFilesIngested -= 1;
+        
+            numInserted = 0;
+            numRemoved  = 0;
+            numRankChanges = 0;
+            for (word, oldRankInt) in oldWordsToRanks.items():
+                if word in newWordsToRanks:
+                    continue;
+                otherRankInt = self.rankFromOtherDictFiles(word, filePath);
+                if otherRankInt is None:
+                    if self.remove(word):
+                        numRemoved += 1;
+                elif otherRankInt != oldRankInt:
+                    self.insert(word, otherRankInt);
+                    numRankChanges += 1;
+            for (word, newRankInt) in newWordsToRanks.items():
+                oldRankInt = oldWordsToRanks.get(word, None);
+                if oldRankInt == newRankInt:
+                    continue;
+                if oldRankInt is None:
+                    numInserted += 1;
+                else:
+                    numRankChanges += 1;
+                self.insert(word, newRankInt);
+            return (numInserted, numRemoved, numRankChanges);
+    
+    def rankFromOtherDictFiles(self, word, excludedFilePath):
+        '''
+        Return the rank of word in any loaded dictionary file other
+        than the given one. None if no other file contains the word.
+        @param word: word to look up
+        @type word: string
+        @param excludedFilePath: full path of the dictionary file to skip.
+        @type excludedFilePath: string
+        '''
+        for (filePath, wordsToRanks) in self.dictFileContents.items():
+            if filePath != excludedFilePath and word in wordsToRanks:
+                return wordsToRanks[word];
+        return None;
+
     def addToUserDict(self, newWord, rankInt=0):
         '''
         Given a word, checks whether the word is already in 
@@ -135,33 +515,304 @@ class WordCollection(TernarySearchTree):
         second-most important, etc. OK to have ties.
         @type rankInt: int
         '''
-        # Ensure that the word is not unicode:
-        newWord = newWord.encode("UTF-8");
-        if self.contains(newWord):
-            return False;
-        with open(os.path.realpath(WordCollection.USER_DICT_FILE_PATH), 'a') as fd:
-            fd.write(str(rankInt) + "\t" + newWord + "\n");
-        # Update the current in-memory tree to include the word as well:
-        self.insert(newWord, rankInt);
-        return True;
+        with self.writeLock:
+            # Ensure that the word is not unicode:
+            newWord = newWord.encode("UTF-8");
+            if self.contains(newWord):
+                return False;
+            with open(os.path.realpath(WordCollection.USER_DICT_FILE_PATH), 'a') as fd:
+                fd.write(str(rankInt) + "\t" + newWord + "\n");
+            # Update the current in-memory tree to include the word as well:
+            self.insert(newWord, rankInt);
+            self.noteUserDictAddition(newWord, rankInt);
+            return True;
+    
+    def noteUserDictAddition(self, newWord, rankInt):
+        '''
+        Record a word just appended to the user dictionary file as
+        loaded from that file, so that a file watcher will not see it as new.
+        @param newWord: word that was appended to the user dictionary file.
+        @type newWord: string
+        @param rankInt: the word's rank
+        @type rankInt: int
+        '''
+        with self.writeLock:
+            userDictFilePath = os.path.realpath(WordCollection.USER_DICT_FILE_PATH);
+            self.dictFileContents.setdefault(userDictFilePath, {})[newWord] = rankInt;
                     
                     
 
+    @staticmethod
+    def readAbbreviationFile(filePath):
+        '''
+        Read an abbreviation file. Each line holds an abbreviation, whitespace,
+        and the expansion, which may be several words. Empty lines, and lines
+        that start with '#' are ignored. An abbreviation may occur on several
+        lines, once for each of its expansions. Example:
+        
+            brb     be right back
+            rg      robot gripper
+        
+        @param filePath: full path to the file.
+        @type filePath: string
+        @return: list of (abbreviation, expansion) pairs in the order of the file. 
+        @rtype: [(string, string)]
+        @raise ValueError: if a line has an abbreviation, but no expansion, or
+                           if an expansion only differs from its abbreviation by case.
+        @raise IOError: if the file cannot be read.
+        '''
+        abbreviationFileName = os.path.basename(filePath);
+        abbreviationPairs = [];
+        with open(filePath) as fd:
+            abbreviationLines = fd.read();
+        for line in abbreviationLines.splitlines():
+            line = line.strip();
+            if len(line) == 0 or line.startswith('#'):
+                continue;
+            try:
+                (abbreviation, expansion) = line.split(None, 1);
+            except ValueError:
+                raise ValueError("Abbreviation file %s contains a line that does not contain an abbreviation, followed by its expansion: '%s'" %
+                                 (abbreviationFileName, line));
+            if abbreviation.lower() == expansion.lower():
+                raise ValueError("Abbreviation file %s contains an abbreviation that is its own expansion: '%s'" %
+                                 (abbreviationFileName, line));
+            abbreviationPairs.append((abbreviation, expansion));
+        return abbreviationPairs;
+    
+    def loadAbbreviations(self):
+        '''
+        (Re)read the abbreviation file, replacing all abbreviations
+        that were loaded before. Call again after editing the file.
+        A missing abbreviation file means no abbreviations.
+        @raise ValueError: if the abbreviation file is malformed. The 
+                           previous abbreviations then stay in effect.
+        '''
+        with self.writeLock:
+            if os.path.exists(self.abbreviationFilePath):
+                abbreviationPairs = self.readAbbreviationFile(self.abbreviationFilePath);
+            else:
+                abbreviationPairs = [];
+            for (foldedAbbreviation, expansions) in self.abbreviations.items():
+                for expansion in expansions:
+                    self.removeExpansion(foldedAbbreviation, expansion);
+            for (abbreviation, expansion) in abbreviationPairs:
+                self.insertExpansion(abbreviation, expansion);
+    
+    def addAbbreviation(self, abbreviation, expansion):
+        '''
+        Append an abbreviation to the abbreviation file, and
+        make it available for completion right away.
+        @param abbreviation: the abbreviation; a single word.
+        @type abbreviation: string
+        @param expansion: text that replaces the abbreviation. May be several words.
+        @type expansion: string
+        @return: False if the abbreviation already had this expansion, else True.
+        @rtype: boolean
+        @raise ValueError: if the abbreviation is not a single word, or is its own expansion.
+        '''
+        with self.writeLock:
+            abbreviation = self.toUTF8(abbreviation).strip();
+            expansion = self.toUTF8(expansion).strip();
+            if len(abbreviation) == 0 or len(abbreviation.split()) != 1:
+                raise ValueError("Abbreviation must be a single word: '%s'" % abbreviation);
+            if len(expansion) == 0 or self.foldCase(abbreviation) == self.foldCase(expansion):
+                raise ValueError("Abbreviation '%s' needs an expansion other than itself." % abbreviation);
+            if expansion in self.abbreviations.get(self.foldCase(abbreviation), ()):
+                return False;
+            with open(os.path.realpath(self.abbreviationFilePath), 'a') as fd:
+                fd.write(abbreviation + "\t" + expansion + "\n");
+            self.insertExpansion(abbreviation, expansion);
+            return True;
+    
+    def insertExpansion(self, abbreviation, expansion):
+        '''
+        Index expansion under the tree key of abbreviation, so that prefix
+        searches for the abbreviation find it. Expansions are not counted
+        as entries of the collection.
+        @param abbreviation: the abbreviation
+        @type abbreviation: string
+        @param expansion: one of its expansions
+        @type expansion: string
+        '''
+        with self.writeLock:
+            foldedAbbreviation = self.foldCase(abbreviation);
+            expansions = self.abbreviations.get(foldedAbbreviation, ());
+            if expansion in expansions:
+                return;
+            self.abbreviations[foldedAbbreviation] = expansions + (expansion,);
+            entries = self.getEntries(foldedAbbreviation);
+            self.setEntries(foldedAbbreviation, entries + ((expansion, WordCollection.ABBREVIATION_RANK),));
+            if len(entries) == 0:
+                self.add(foldedAbbreviation);
+            self.version += 1;
+    
+    def removeExpansion(self, foldedAbbreviation, expansion):
+        '''
+        Undo insertExpansion(). Dictionary words stored
+        under the same tree key are not affected.
+        @param foldedAbbreviation: case-folded abbreviation
+        @type foldedAbbreviation: string
+        @param expansion: the expansion to remove
+        @type expansion: string
+        '''
+        with self.writeLock:
+            expansions = tuple([oldExpansion for oldExpansion in self.abbreviations.get(foldedAbbreviation, ()) 
+                                if oldExpansion != expansion]);
+            if len(expansions) > 0:
+                self.abbreviations[foldedAbbreviation] = expansions;
+            else:
+                self.abbreviations.pop(foldedAbbreviation, None);
+            entries = self.getEntries(foldedAbbreviation);
+            newEntries = tuple([(surfaceForm, rankInt) for (surfaceForm, rankInt) in entries
+                                if surfaceForm != expansion]);
+            if len(newEntries) == len(entries):
+                return;
+            self.setEntries(foldedAbbreviation, newEntries);
+            self.version += 1;
+    
     def insert(self, word, rankInt=None):
         '''
         Insert one word into the word collection.
         @param word: word to insert.
         @type word: string
         @param rankInt: Optionally the frequency rank of the word. If None, no rank is recorded,
-            and subsequent calls to the rank() method will fail. 
+            and subsequent calls to the rank() method will fail, unless the word
+            was inserted with a rank before. 
         @type rankInt: int
         @raise ValueError: if word is not valid or empty. 
         '''
-        if not self.contains(word):
-            self.numEntries += 1;
-        self.add(word);
-        if rankInt is not None:
-            self.realWordToFrequencyRanks[word.encode('UTF-8')] = rankInt;
+        with self.writeLock:
+            if word is None or len(word) == 0:
+                raise ValueError("word cannot be empty");
+            foldedWord = self.foldCase(word);
+            entries = self.getEntries(foldedWord);
+            isNewKey = len(entries) == 0;
+            for (pos, (surfaceForm, oldRankInt)) in enumerate(entries):
+                if surfaceForm == word:
+                    if rankInt is None or rankInt == oldRankInt:
+                        return;
+                    newEntries = entries[:pos] + ((word, rankInt),) + entries[pos + 1:];
+                    break;
+            else:
+                newEntries = entries + ((word, rankInt),);
+                self.numEntries += 1;
+            # Publish the new entries with one dict assignment:
+            self.setEntries(foldedWord, newEntries);
+            if isNewKey:
+                self.add(foldedWord);
+                self.notePhraseKey(foldedWord, 1);
+            self.version += 1;
+        
+    def remove(self, word):
+        '''
+        Remove one word from the word collection. The underlying tree 
+        cannot delete nodes, so the word's tree key stays in the tree,
+        but is skipped by all subsequent lookups once none of its surface
+        forms remain. Inserting the word again revives it.
+        @param word: word to remove.
+        @type word: string
+        @return: True if the word was in the collection, else False.
+        @rtype: boolean
+        '''
+        with self.writeLock:
+            foldedWord = self.foldCase(word);
+            entries = self.getEntries(foldedWord);
+            for (pos, (surfaceForm, _)) in enumerate(entries):
+                if surfaceForm == word:
+                    break;
+            else:
+                return False;
+            newEntries = entries[:pos] + entries[pos + 1:];
+            self.setEntries(foldedWord, newEntries);
+            if len(newEntries) == 0:
+                self.notePhraseKey(foldedWord, -1);
+            self.numEntries -= 1;
+            self.version += 1;
+            return True;
+    
+    def getEntries(self, foldedWord):
+        '''
+        Return the (surfaceForm, rank) entries stored under a tree key.
+        @param foldedWord: the tree key
+        @type foldedWord: string
+        @return: the entries; empty if the key has none.
+        @rtype: ((string, int))
+        '''
+        return unpackEntries(foldedWord, self.foldedToEntries.get(foldedWord, ()));
+    
+    def setEntries(self, foldedWord, entries):
+        '''
+        Replace the entries stored under a tree key with one dict
+        assignment, or drop the key if entries is empty. Caller
+        must hold the writeLock.
+        @param foldedWord: the tree key
+        @type foldedWord: string
+        @param entries: the new (surfaceForm, rank) entries
+        @type entries: ((string, int))
+        '''
+        if len(entries) == 0:
+            self.foldedToEntries.pop(foldedWord, None);
+        else:
+            self.foldedToEntries[foldedWord] = packEntries(foldedWord, entries);
+    
+    def notePhraseKey(self, foldedWord, delta):
+        '''
+        Maintain the phrase bookkeeping when a tree key is added
+        (delta 1) or removed (delta -1). Single-word keys are ignored.
+        maxPhraseWords is not lowered on removal; a too-large
+        value only costs a few dictionary lookups.
+        @param foldedWord: tree key
+        @type foldedWord: string
+        @param delta: 1 or -1
+        @type delta: int
+        '''
+        phraseWords = foldedWord.split();
+        if len(phraseWords) < 2:
+            return;
+        firstWord = phraseWords[0];
+        numPhrases = self.phraseFirstWords.get(firstWord, 0) + delta;
+        if numPhrases > 0:
+            self.phraseFirstWords[firstWord] = numPhrases;
+        else:
+            self.phraseFirstWords.pop(firstWord, None);
+        if delta > 0:
+            self.maxPhraseWords = max(self.maxPhraseWords, len(phraseWords));
+    
+    def isPhrase(self, word):
+        '''
+        True if the given entry consists of more than one word.
+        @param word: entry to examine
+        @type word: string
+        '''
+        return len(word.split()) > 1;
+
+    def contains(self, word):
+        '''
+        True if word is in the collection with exactly this 
+        capitalization, and has not been removed.
+        @param word: word to look up.
+        @type word: string
+        '''
+        if word is None or len(word) < 1:
+            raise ValueError("word cannot be empty");
+        for (surfaceForm, _) in self.getEntries(self.foldCase(word)):
+            if surfaceForm == word:
+                return True;
+        return False;
+    
+    def foldCase(self, word):
+        '''
+        Return the key under which word is stored in the tree. A word
+        that is folded already is returned itself, so that the tree key 
+        shares the string object with the word's other references.
+        @param word: word to fold
+        @type word: string
+        '''
+        foldedWord = word.lower();
+        if foldedWord == word:
+            return word;
+        return foldedWord;
         
     def rank(self, word):
         '''
@@ -173,7 +824,49 @@ class WordCollection(TernarySearchTree):
         @type word: string
         @raise KeyError: if word or rank are not present in the word collection. 
         '''
-        return self.realWordToFrequencyRanks[word.encode('UTF-8')];
+        if isinstance(word, unicode):
+            word = word.encode('UTF-8');
+        foldedWord = self.foldCase(word);
+        foldedRankInt = None;
+        for (surfaceForm, rankInt) in self.getEntries(foldedWord):
+            if rankInt is None:
+                continue;
+            if surfaceForm == word:
+                return rankInt;
+            if surfaceForm == foldedWord:
+                foldedRankInt = rankInt;
+        # A capitalized variant of a dictionary word, such
+        # as a sentence-initial 'New', ranks like the word:
+        if foldedRankInt is None:
+            raise KeyError(word);
+        return foldedRankInt;
+
+    def noteWordUsed(self, word):
+        '''
+        Record that the user just typed or accepted word. Up to 
+        MAX_RECENCY_BOOSTED_RESULTS of the most recently used words 
+        that match a rank-limited prefix search are listed ahead of
+        the statically ranked results. Words not in the collection are
+        ignored. A capitalized variant of a dictionary word, such as a
+        sentence-initial 'The', counts as a use of the word.
+        @param word: the word that was used.
+        @type word: string
+        '''
+        with self.writeLock:
+            if len(word) == 0:
+                return;
+            if not self.contains(word):
+                word = self.foldCase(word);
+                if not self.contains(word):
+                    return;
+            self.recentWords.noteUsed(word);
+    
+    def clearRecentWords(self):
+        '''
+        Forget all words recorded by noteWordUsed().
+        '''
+        with self.writeLock:
+            self.recentWords.clear();
 
     def prefix_search(self, word, cutoffRank=None):
         '''
@@ -182,8 +875,13 @@ class WordCollection(TernarySearchTree):
         returned list to include only the top cutoffRank words. Example, if
         cutoffRank=5, only the five most highly ranked dictionary entries 
         are returned. Also, if cutoffRank is specified, the returned list
-        is sorted by decreasing word rank. If cutoffRank is not specified,
+        is sorted by decreasing word rank, except that recently used words
+        come first (see noteWordUsed()). If cutoffRank is not specified,
         or is None, the returned list is unsorted.
+        
+        The search ignores the case of word: 'Ne' and 'ne' yield the same,
+        identically ranked, list. Entries are returned with the capitalization
+        under which they were inserted. 
         @param word: prefix to search by.
         @type word: string.
         @param cutoffRank: Number of most highly ranked dictionary entries to return in rank-sorted order.
@@ -193,20 +891,235 @@ class WordCollection(TernarySearchTree):
         if cutoffRank is not None:
             if not isinstance(cutoffRank, int):
                 raise TypeError("Parameter cutoffRank for prefix_search must be an integer.");
+        metrics = self.metrics;
+        if metrics is not None:
+            startTime = timer();
         
-        matchingWords = super(WordCollection, self).prefix_search(word); 
+        (numMatchingKeys, finalEntries) = self.prefixEntries(self.foldCase(word));
+        if cutoffRank is not None:
+            # sort by rank:
+            if metrics is not None:
+                sortStartTime = timer();
+            finalWords = self.selectTopRanked(finalEntries, cutoffRank);
+            if metrics is not None:
+                metrics.recordLatency('rank_sort', timer() - sortStartTime);
+        else:
+            finalWords = [surfaceForm for (surfaceForm, _) in finalEntries];
+        if metrics is not None:
+            metrics.recordPrefixSearch(word, timer() - startTime, numMatchingKeys, len(finalWords));
+        return finalWords;
+    
+    def prefixEntries(self, foldedPrefix):
+        '''
+        Return the number of tree keys the tree search for foldedPrefix
+        returned, and the (surfaceForm, rank) entries of the keys that
+        start with foldedPrefix.
+        @param foldedPrefix: case folded prefix
+        @type foldedPrefix: string
+        @rtype: (int, [(string, int)])
+        '''
+        matchingWords = super(WordCollection, self).prefix_search(foldedPrefix); 
         # The underlying tree traversal implementation seems to return
         # all the words in the tree that start with the first letter of 'word'.
-        # Keep only the ones that really start with word:
-        finalWords = [];
+        # Keep only the ones that really start with word, and 
+        # replace each tree key with its (surfaceForm, rank) entries:
+        finalEntries = [];
         for candidate in matchingWords:
-            if self.startsWith(candidate,word):
-                finalWords.append(candidate);
+            if not self.startsWith(candidate,foldedPrefix):
+                continue;
+            # The tree returns unicode; the entry table is keyed by UTF-8:
+            finalEntries.extend(self.getEntries(candidate.encode('UTF-8')));
+        return (len(matchingWords), finalEntries);
+          
+    def tagged_prefix_search(self, word, cutoffRank=None):
+        '''
+        Like prefix_search(), but tags each result with its CompletionKind.
+        Abbreviation expansions that do not themselves start with the prefix
+        are tagged CompletionKind.ABBREVIATION, and replace the typed prefix 
+        when accepted. All other results, including expansions that start 
+        with the prefix, extend it, and are tagged CompletionKind.WORD. 
+        A result that is both a word and an expansion is returned once,
+        with the better of its ranks, and takes a single one of the 
+        cutoffRank places. The tags are computed from the results, so 
+        this search costs no more than prefix_search().
+        @param word: the prefix
+        @type word: string
+        @param cutoffRank: maximum number of results, as for prefix_search().
+        @type cutoffRank: int
+        @rtype: [(string, int)]
+        '''
         if cutoffRank is not None:
-            # sort by rank:
-            finalWords.sort(key=self.rank);
-            return finalWords[:cutoffRank]
-        return finalWords;
+            if not isinstance(cutoffRank, int):
+                raise TypeError("Parameter cutoffRank for tagged_prefix_search must be an integer.");
+        metrics = self.metrics;
+        if metrics is not None:
+            startTime = timer();
+        foldedPrefix = self.foldCase(word);
+        (numMatchingKeys, entries) = self.prefixEntries(foldedPrefix);
+        # Merge the entries of completions that are both words and
+        # expansions before the cutoff, so that each takes one place:
+        mergedEntries = [];
+        entryPositions = {};
+        for entry in entries:
+            (completion, _) = entry;
+            pos = entryPositions.get(completion);
+            if pos is None:
+                entryPositions[completion] = len(mergedEntries);
+                mergedEntries.append(entry);
+            elif entryRank(entry) < entryRank(mergedEntries[pos]):
+                mergedEntries[pos] = entry;
+        completions = self.selectTopRanked(mergedEntries, cutoffRank);
+        if metrics is not None:
+            metrics.recordPrefixSearch(word, timer() - startTime, numMatchingKeys, len(completions));
+        taggedCompletions = [];
+        for completion in completions:
+            if self.startsWith(self.foldCase(completion), foldedPrefix):
+                taggedCompletions.append((completion, CompletionKind.WORD));
+            else:
+                taggedCompletions.append((completion, CompletionKind.ABBREVIATION));
+        return taggedCompletions;
+          
+    def prefix_search_many(self, prefixes, cutoffRank=None):
+        '''
+        Batch version of prefix_search(): returns one result list per prefix,
+        in the order of prefixes. Equal prefixes are searched once. The prefixes
+        are processed in sorted order, and the tree is traversed only for prefixes
+        that do not extend an already searched one. The matches of an extended
+        prefix are cut from its ancestor's sorted matches by binary search.
+        Empty prefixes yield empty lists.
+        @param prefixes: prefixes to search by
+        @type prefixes: [string]
+        @param cutoffRank: as for prefix_search()
+        @type cutoffRank: int
+        @rtype: [[string]]
+        '''
+        if cutoffRank is not None:
+            if not isinstance(cutoffRank, int):
+                raise TypeError("Parameter cutoffRank for prefix_search_many must be an integer.");
+        metrics = self.metrics;
+        if metrics is not None:
+            startTime = timer();
+        foldedPrefixes = [self.foldCase(self.toUTF8(prefix)) for prefix in prefixes];
+        keysByPrefix = self.prefixKeysMany(foldedPrefixes);
+        resultsByPrefix = {};
+        for (foldedPrefix, keys) in keysByPrefix.iteritems():
+            entries = [];
+            for key in keys:
+                entries.extend(self.getEntries(key));
+            if cutoffRank is None:
+                resultsByPrefix[foldedPrefix] = [word for (word, _) in entries];
+            else:
+                resultsByPrefix[foldedPrefix] = self.selectTopRanked(entries, cutoffRank);
+        results = [list(resultsByPrefix[foldedPrefix]) for foldedPrefix in foldedPrefixes];
+        if metrics is not None:
+            metrics.recordLatency('prefix_search_many', timer() - startTime);
+        return results;
+    
+    def rank_many(self, words):
+        '''
+        Batch version of rank(). Words that are not in the collection,
+        or have no rank, get rank -1.
+        @param words: words whose ranks are requested
+        @type words: [string]
+        @return: the ranks, in the order of words
+        @rtype: array('i')
+        '''
+        ranks = array.array('i', [-1]) * len(words);
+        rank = self.rank;
+        for (index, word) in enumerate(words):
+            try:
+                ranks[index] = rank(word);
+            except KeyError:
+                pass;
+        return ranks;
+    
+    def prefixKeysMany(self, foldedPrefixes):
+        '''
+        Return a dict mapping each of the given distinct folded prefixes
+        to the sorted list of tree keys that start with it, and are
+        not removed. Shares one tree traversal among all prefixes that 
+        extend the same searched prefix.
+        @param foldedPrefixes: UTF-8 encoded, case-folded prefixes
+        @type foldedPrefixes: [string]
+        @rtype: {string : [string]}
+        '''
+        keysByPrefix = {};
+        # Searched prefixes that are ancestors of the current prefix, with their keys:
+        ancestors = [];
+        for prefix in sorted(set(foldedPrefixes)):
+            if len(prefix) == 0:
+                keysByPrefix[prefix] = [];
+                continue;
+            while len(ancestors) > 0 and not prefix.startswith(ancestors[-1][0]):
+                ancestors.pop();
+            if len(ancestors) > 0:
+                ancestorKeys = ancestors[-1][1];
+                # No UTF-8 string contains byte 0xff, so all extensions 
+                # of prefix sort before prefix + '\xff':
+                keys = ancestorKeys[bisect.bisect_left(ancestorKeys, prefix):bisect.bisect_left(ancestorKeys, prefix + '\xff')];
+            else:
+                keys = [];
+                for candidate in super(WordCollection, self).prefix_search(prefix):
+                    # The tree returns unicode:
+                    candidate = candidate.encode('UTF-8');
+                    if candidate.startswith(prefix) and candidate in self.foldedToEntries:
+                        keys.append(candidate);
+                keys.sort();
+            keysByPrefix[prefix] = keys;
+            ancestors.append((prefix, keys));
+        return keysByPrefix;
+    
+    def toUTF8(self, word):
+        if isinstance(word, unicode):
+            return word.encode('UTF-8');
+        return word;
+
+    def selectTopRanked(self, entries, cutoffRank):
+        '''
+        Return the words of the cutoffRank best of the given entries, 
+        best first, boosting this collection's recently used words.
+        See module function selectTopRanked().
+        '''
+        return selectTopRanked(entries, cutoffRank, self.recentWords);
+
+    def phrase_prefix_search(self, words, cutoffRank=None):
+        '''
+        Completion for the end of typed text that may be the beginning
+        of a phrase entry. The words are the most recently typed ones, the last
+        of them possibly incomplete. Each tail of the list that starts with the
+        first word of some phrase entry is prefix-searched as one phrase, longest
+        tail first. Finally the last word is searched by itself, as in prefix_search().
+        Example: for ['please', 'move', 'to', 't'], the tails 'move to t' and 't' 
+        are searched if 'move' starts a phrase entry, but 'please' and 'to' do not.
+        
+        Completions of longer tails come first; within the
+        completions of one tail, entries are ordered by rank if cutoffRank
+        is given. Each entry is returned only once, with its longest tail.
+        @param words: the typed words, oldest first. Only the last maxPhraseWords of them matter.
+        @type words: [string]
+        @param cutoffRank: maximum number of entries to return. 
+        @type cutoffRank: int
+        @return: triples of entry, the number of trailing words of the 
+                 typed text that the entry completes, and would replace, and the
+                 CompletionKind of the entry (see tagged_prefix_search()).
+        @rtype: [(string, int, int)]
+        '''
+        if len(words) == 0:
+            return [];
+        completions = [];
+        seenEntries = set();
+        numContextWords = min(len(words), self.maxPhraseWords);
+        for numWords in range(numContextWords, 0, -1):
+            if numWords > 1 and self.foldCase(words[-numWords]) not in self.phraseFirstWords:
+                continue;
+            for (entry, kind) in self.tagged_prefix_search(' '.join(words[-numWords:]), cutoffRank=cutoffRank):
+                if entry in seenEntries:
+                    continue;
+                seenEntries.add(entry);
+                completions.append((entry, numWords, kind));
+            if cutoffRank is not None and len(completions) >= cutoffRank:
+                return completions[:cutoffRank];
+        return completions;
           
     def startsWith(self, word, prefix):
         '''
@@ -299,14 +1212,30 @@ class TelPadEncodedWordCollection(WordCollection):
                 'z' : 'w'
                 }
     
-    def __init__(self):
+    def __init__(self, dictDir=None, userDictFilePath=None, metrics=None):
         '''
         Maintain a data structure that maps each encoded word
         to all the possible equivalent real words. We call these
-        multiple words 'collisions.'
+        multiple words 'collisions.' Each collision is a 
+        (realWord, rank) tuple. The collisions of one encoded word
+        are a tuple, ordered by rank, that is replaced as a whole on
+        every change.
+        @param dictDir: see WordCollection
+        @type dictDir: string
+        @param userDictFilePath: see WordCollection
+        @type userDictFilePath: string
+        @param metrics: see WordCollection
+        @type metrics: CompletionMetrics
         '''
         self.encWordToRealWords = {};
-        super(TelPadEncodedWordCollection, self).__init__();
+        super(TelPadEncodedWordCollection, self).__init__(dictDir=dictDir, userDictFilePath=userDictFilePath, metrics=metrics);
+    
+    def loadAbbreviations(self):
+        '''
+        Telephone pad input does not expand abbreviations. 
+        The abbreviation file is therefore not read.
+        '''
+        pass
     
     def prefix_search(self, encWord):
         '''
@@ -315,7 +1244,52 @@ class TelPadEncodedWordCollection(WordCollection):
         words that could complete the given prefix.  
         @param encWord: the encoded prefix
         @type encWord: string
-        @raise ValueError: if the mapping from encoded words to collisions is corrupted. Never caused by caller. 
+        '''
+        return [realWord for (realWord, _) in self.collisionEntries(encWord)];
+    
+    def ranked_prefix_search(self, encWord, cutoffRank=None):
+        '''
+        Like prefix_search(), but returns the real words in order of rank,
+        best first, with recently used words ahead (see noteWordUsed()). 
+        The ranks are carried with the collisions, so no per-word rank lookup
+        is needed.
+        @param encWord: the encoded prefix
+        @type encWord: string
+        @param cutoffRank: if given, only this many words are returned.
+        @type cutoffRank: int
+        '''
+        return self.selectTopRanked(self.collisionEntries(encWord), cutoffRank);
+    
+    def prefix_search_many(self, encPrefixes, cutoffRank=None):
+        '''
+        Batch version of prefix_search() and ranked_prefix_search(), sharing
+        tree traversals as in WordCollection.prefix_search_many(). 
+        @param encPrefixes: telephone pad encoded prefixes
+        @type encPrefixes: [string]
+        @param cutoffRank: if None, each result is unsorted as from prefix_search().
+                           Else each result holds the cutoffRank best real words, as 
+                           from ranked_prefix_search().
+        @type cutoffRank: int
+        @rtype: [[string]]
+        '''
+        encPrefixes = [self.toUTF8(encPrefix) for encPrefix in encPrefixes];
+        keysByPrefix = self.prefixKeysMany(encPrefixes);
+        encWordToRealWords = self.encWordToRealWords;
+        resultsByPrefix = {};
+        for (encPrefix, encWords) in keysByPrefix.iteritems():
+            collisions = [];
+            for encWord in encWords:
+                collisions.extend(encWordToRealWords.get(encWord, ()));
+            if cutoffRank is None:
+                resultsByPrefix[encPrefix] = [realWord for (realWord, _) in collisions];
+            else:
+                resultsByPrefix[encPrefix] = self.selectTopRanked(collisions, cutoffRank);
+        return [list(resultsByPrefix[encPrefix]) for encPrefix in encPrefixes];
+    
+    def collisionEntries(self, encWord):
+        '''
+        Return the (realWord, rank) collisions of all encoded
+        words that start with the given encoded prefix.
         '''
         if len(encWord) == 0:
             return [];
@@ -325,15 +1299,51 @@ class TelPadEncodedWordCollection(WordCollection):
         
         # But each encoded word, might match to multiple real words. Build
         # that larger list:
+        # An encoded word whose last collision is being removed
+        # concurrently may already be gone from the mapping; it
+        # then contributes no collisions:
         realWordMatches = [];
         for encWord in encMatches:
-            try:
-                realWordCollisions = self.encWordToRealWords[encWord];
-            except KeyError:
-                raise ValueError("An encoded tel pad word did not have a mapping to at least one real word: %s" % encWord);
-            realWordMatches.extend(realWordCollisions);
+            realWordMatches.extend(self.encWordToRealWords.get(encWord, ()));
         return realWordMatches;
     
+    def rank(self, realWord):
+        '''
+        Return the frequency rank of the given real, that is unencoded word.
+        A capitalized variant of a dictionary word ranks like the word.
+        @param realWord: the word whose frequency rank is requested.
+        @type realWord: string
+        @raise KeyError: if word or rank are not present in the word collection. 
+        '''
+        if isinstance(realWord, unicode):
+            realWord = realWord.encode('UTF-8');
+        foldedWord = self.foldCase(realWord);
+        foldedRankInt = None;
+        for (collisionWord, rankInt) in self.encWordToRealWords.get(self.encodeWord(realWord), ()):
+            if collisionWord == realWord:
+                return rankInt;
+            if collisionWord == foldedWord:
+                foldedRankInt = rankInt;
+        if foldedRankInt is None:
+            raise KeyError(realWord);
+        return foldedRankInt;
+    
+    def noteWordUsed(self, realWord):
+        '''
+        As in WordCollection, but for a real, that is unencoded word.
+        @param realWord: the word that was used.
+        @type realWord: string
+        '''
+        with self.writeLock:
+            if len(realWord) == 0:
+                return;
+            collisionWords = [collisionWord for (collisionWord, _) in self.encWordToRealWords.get(self.encodeWord(realWord), ())];
+            if realWord not in collisionWords:
+                realWord = self.foldCase(realWord);
+                if realWord not in collisionWords:
+                    return;
+            self.recentWords.noteUsed(realWord);
+    
     def encodeTelPadLabel(self, label):
         '''
         Given a string label as seen on the JBoard button pad,
@@ -381,39 +1391,61 @@ class TelPadEncodedWordCollection(WordCollection):
         @type newRealWord: string
         @param newRankInt: the new word's frequency rank.
         @type newRankInt: int
-        @raise ValueError: if the encoded-word to collisions data structure is corrupted. Not caused by caller. 
-        '''
-        newEncWord = self.encodeWord(newRealWord);
-        super(TelPadEncodedWordCollection, self).insert(newEncWord);
-        self.realWordToFrequencyRanks[newRealWord] = newRankInt;
-        try:
-            existingCollisions = self.encWordToRealWords[newEncWord];
-        except KeyError:
-            existingCollisions = [];
-        # Insert the new real word into the existing list of collisions,
-        # since newEncWord maps to newRealWord. Preserving high-to-low ranking order:
-        if len(existingCollisions) == 0:
-            existingCollisions.append(newRealWord);
-            self.encWordToRealWords[newEncWord] = [newRealWord];
-        else:
-            for (pos, realCollisionWord) in enumerate(existingCollisions):
-                
-                # If this same realWord was inserted before then we are done:
-                if (realCollisionWord == newRealWord):
-                    return;
-    
-                # Get rank of the existing collision realWord:
-                try:
-                    realCollisionWordRank = self.realWordToFrequencyRanks[realCollisionWord]; 
-                except KeyError:
-                    raise ValueError("Data structure that maps telephone-pad-encoded words to lists of true words should contain %s, but does not." % realCollisionWord);
+        '''
+        with self.writeLock:
+            newEncWord = self.encodeWord(newRealWord);
+            # Modify a copy, so that concurrent readers see
+            # either the old or the new collisions:
+            existingCollisions = list(self.encWordToRealWords.get(newEncWord, ()));
+            # If this same realWord was inserted before, its rank may 
+            # have changed. Take it out, and re-insert it below at the
+            # position its (new) rank calls for:
+            for (pos, (realCollisionWord, _)) in enumerate(existingCollisions):
+                if realCollisionWord == newRealWord:
+                    del existingCollisions[pos];
+                    break;
+            # Insert the new real word into the existing list of collisions,
+            # since newEncWord maps to newRealWord. Preserving high-to-low ranking order:
+            for (pos, (realCollisionWord, realCollisionWordRank)) in enumerate(existingCollisions):
                 if newRankInt <= realCollisionWordRank:
-                    existingCollisions.insert(pos, newRealWord);
-                    self.encWordToRealWords[newEncWord] = existingCollisions;
-                    return;
-                
-                existingCollisions.append(newRealWord);
-                self.encWordToRealWords[newEncWord] = existingCollisions;
+                    existingCollisions.insert(pos, (newRealWord, newRankInt));
+                    break;
+            else:
+                existingCollisions.append((newRealWord, newRankInt));
+            # Publish the collisions before the tree key, so that
+            # readers who find the key always find its collisions:
+            self.encWordToRealWords[newEncWord] = tuple(existingCollisions);
+            super(TelPadEncodedWordCollection, self).insert(newEncWord);
+            self.version += 1;
+
+    def remove(self, realWord):
+        '''
+        Takes a real, that is unencoded word, and removes it from the
+        collisions of its encoded word. If no collisions remain, the 
+        encoded word itself is removed from the tree.
+        @param realWord: the unencoded word to remove.
+        @type realWord: string
+        @return: True if the word was in the collection, else False.
+        @rtype: boolean
+        '''
+        with self.writeLock:
+            encWord = self.encodeWord(realWord);
+            existingCollisions = self.encWordToRealWords.get(encWord, ());
+            for (pos, (realCollisionWord, _)) in enumerate(existingCollisions):
+                if realCollisionWord == realWord:
+                    break;
+            else:
+                return False;
+            remainingCollisions = existingCollisions[:pos] + existingCollisions[pos + 1:];
+            if len(remainingCollisions) == 0:
+                # Take out the tree key before its collisions (the
+                # reverse of insert()):
+                super(TelPadEncodedWordCollection, self).remove(encWord);
+                del self.encWordToRealWords[encWord];
+            else:
+                self.encWordToRealWords[encWord] = remainingCollisions;
+            self.version += 1;
+            return True;
 
     def addToUserDict(self, newRealWord, rankInt=0):
         '''
@@ -426,16 +1458,18 @@ class TelPadEncodedWordCollection(WordCollection):
         @param rankInt: frequency rank of the word. Rank 0 is most important; 1 is
         second-most important, etc. OK to have ties.
         '''
-        # Ensure that the word is not unicode:
-        newRealWord = newRealWord.encode("UTF-8");
-        newEncWord  = self.encodeWord(newRealWord);
-        if self.contains(newEncWord):
-            return False;
-        with open(os.path.realpath(WordCollection.USER_DICT_FILE_PATH), 'a') as fd:
-            fd.write(str(rankInt) + "\t" + newRealWord + "\n");
-        # Update the current in-memory tree to include the word as well:
-        self.insert(newRealWord, rankInt);
-        return True;
+        with self.writeLock:
+            # Ensure that the word is not unicode:
+            newRealWord = newRealWord.encode("UTF-8");
+            newEncWord  = self.encodeWord(newRealWord);
+            if self.contains(newEncWord):
+                return False;
+            with open(os.path.realpath(WordCollection.USER_DICT_FILE_PATH), 'a') as fd:
+                fd.write(str(rankInt) + "\t" + newRealWord + "\n");
+            # Update the current in-memory tree to include the word as well:
+            self.insert(newRealWord, rankInt);
+            self.noteUserDictAddition(newRealWord, rankInt);
+            return True;
 
 if __name__ == "__main__":
     
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+import os;
+import sys;
+import shutil;
+import tempfile;
+import unittest;
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src/word_completion'));
+from word_collection import WordCollection;
+from dictionary_bundles import DictionaryBundle, DictionaryBundleSet;
+from completion_simulator import CompletionSimulator;
+
+class CompletionSimulatorTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp();
+        self.dictDir = os.path.join(self.tmpDir, 'dict_files');
+        os.mkdir(self.dictDir);
+        with open(os.path.join(self.dictDir, 'dict1.txt'), 'w') as fd:
+            fd.write("1 the\n2 robot\n3 gripper\n4 grip\n5 great\n");
+        self.abbreviationFilePath = os.path.join(self.tmpDir, 'abbreviations.txt');
+        with open(self.abbreviationFilePath, 'w') as fd:
+            fd.write("rg robot gripper\n");
+        
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir);
+    
+    def testWordCollection(self):
+        coll = WordCollection(dictDir=self.dictDir, 
+                              userDictFilePath=os.path.join(self.tmpDir, 'userDict.txt'),
+                              abbreviationFilePath=self.abbreviationFilePath);
+        result = CompletionSimulator(coll, usePhrases=False).simulateLines(['the robot gripper']);
+        self.assertEqual(result.numWords, 3);
+        # 't' + accept, then 'r' + accepting the expansion 'robot gripper':
+        self.assertEqual(result.numKeystrokes, 2 + 2);
+        self.assertEqual(result.numPhraseCompletionsAccepted, 1);
+    
+    def testWithoutTaggedSearch(self):
+        bundleDir = os.path.join(self.tmpDir, 'bundles', 'en');
+        DictionaryBundle.build(bundleDir, self.dictDir);
+        bundleSet = DictionaryBundleSet(os.path.dirname(bundleDir));
+        try:
+            result = CompletionSimulator(bundleSet, usePhrases=False).simulateLines(['the robot gripper']);
+        finally:
+            bundleSet.close();
+        # Queried through prefix_search(). Without expansions, 
+        # each word takes its first letter and an accept:
+        self.assertEqual(result.numWords, 3);
+        self.assertEqual(result.numKeystrokes, 2 + 2 + 2);
+
+if __name__ == '__main__':
+    unittest.main();
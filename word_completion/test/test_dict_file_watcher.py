@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+import os;
+import sys;
+import shutil;
+import tempfile;
+import unittest;
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src/word_completion'));
+from dict_file_watcher import DictFileWatcher;
+
+class DictFileWatcherPollingTest(unittest.TestCase):
+    '''
+    Drives the polling watcher one poll at a time, without its thread.
+    '''
+    
+    def setUp(self):
+        self.dictDir = tempfile.mkdtemp();
+        self.dictFilePath = os.path.join(self.dictDir, 'dict1.txt');
+        self.writeFile(self.dictFilePath, "1 the\n", 1000);
+        self.changedFiles = [];
+        self.watcher = DictFileWatcher(self.dictDir, self.changedFiles.append, forcePolling=True);
+        self.watcher.pollOnce();
+    
+    def tearDown(self):
+        shutil.rmtree(self.dictDir);
+    
+    def writeFile(self, filePath, contents, mtime):
+        with open(filePath, 'w') as fd:
+            fd.write(contents);
+        os.utime(filePath, (mtime, mtime));
+    
+    def testReportsOnceStable(self):
+        self.watcher.pollOnce();
+        self.assertEqual(self.changedFiles, []);
+        self.writeFile(self.dictFilePath, "1 the\n2 a", 1001);
+        # Could still be written to:
+        self.watcher.pollOnce();
+        self.assertEqual(self.changedFiles, []);
+        self.writeFile(self.dictFilePath, "1 the\n2 a\n3 an\n", 1002);
+        self.watcher.pollOnce();
+        self.assertEqual(self.changedFiles, []);
+        # Unchanged for one poll:
+        self.watcher.pollOnce();
+        self.assertEqual(self.changedFiles, [self.dictFilePath]);
+        # Reported only once:
+        self.watcher.pollOnce();
+        self.assertEqual(self.changedFiles, [self.dictFilePath]);
+    
+    def testNewAndRemovedFiles(self):
+        newFilePath = os.path.join(self.dictDir, 'dict2.txt');
+        self.writeFile(newFilePath, "1 robot\n", 1000);
+        self.watcher.pollOnce();
+        self.watcher.pollOnce();
+        self.assertEqual(self.changedFiles, [newFilePath]);
+        os.remove(newFilePath);
+        self.watcher.pollOnce();
+        self.watcher.pollOnce();
+        self.assertEqual(self.changedFiles, [newFilePath, newFilePath]);
+    
+    def testEditorFilesIgnored(self):
+        for fileName in ('.dict1.txt.swp', 'dict1.txt~'):
+            self.writeFile(os.path.join(self.dictDir, fileName), "x", 1000);
+        self.watcher.pollOnce();
+        self.watcher.pollOnce();
+        self.assertEqual(self.changedFiles, []);
+    
+    def testUserDictOutsideDictDir(self):
+        userDictDir = tempfile.mkdtemp();
+        try:
+            userDictFilePath = os.path.join(userDictDir, 'userDict.txt');
+            self.writeFile(userDictFilePath, "", 1000);
+            watcher = DictFileWatcher(self.dictDir, self.changedFiles.append, 
+                                      userDictFilePath=userDictFilePath, forcePolling=True);
+            watcher.pollOnce();
+            self.writeFile(userDictFilePath, "0\trobot\n", 1001);
+            watcher.pollOnce();
+            watcher.pollOnce();
+            self.assertEqual(self.changedFiles, [os.path.realpath(userDictFilePath)]);
+        finally:
+            shutil.rmtree(userDictDir);
+
+if __name__ == '__main__':
+    unittest.main();
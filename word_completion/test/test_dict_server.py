@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+import os;
+import sys;
+import shutil;
+import socket;
+import tempfile;
+import threading;
+import unittest;
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src/word_completion'));
+from dict_server import WordCollectionServer, WordCollectionClient, TelPadEncodedWordCollectionClient;
+from word_collection import CompletionKind;
+
+class DictServerTest(unittest.TestCase):
+    '''
+    Round trips between WordCollectionClients and a 
+    WordCollectionServer on a private socket.
+    '''
+    
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp();
+        self.dictDir = os.path.join(self.tmpDir, 'dict_files');
+        os.mkdir(self.dictDir);
+        with open(os.path.join(self.dictDir, 'dict1.txt'), 'w') as fd:
+            fd.write("1 the\n2 them\n3 then\n4 hello\n5 help\n6 hello world\n");
+        self.userDictFilePath = os.path.join(self.tmpDir, 'userDict.txt');
+        open(self.userDictFilePath, 'w').close();
+        self.socketPath = os.path.join(self.tmpDir, 'server.sock');
+        self.server = WordCollectionServer(socketPath=self.socketPath, 
+                                           dictDir=self.dictDir, 
+                                           userDictFilePath=self.userDictFilePath,
+                                           watchDictFiles=False);
+        self.serverThread = threading.Thread(target=self.server.serve_forever);
+        self.serverThread.daemon = True;
+        self.serverThread.start();
+        self.client = WordCollectionClient(self.socketPath);
+        self.telPadClient = TelPadEncodedWordCollectionClient(self.socketPath);
+        
+    def tearDown(self):
+        self.client.close();
+        self.telPadClient.close();
+        self.server.shutdown();
+        self.server.server_close();
+        shutil.rmtree(self.tmpDir);
+    
+    def testLookups(self):
+        self.assertEqual(sorted(self.client.prefix_search('the')), ['the', 'them', 'then']);
+        self.assertEqual(self.client.prefix_search('the', cutoffRank=2), ['the', 'them']);
+        self.assertEqual(self.client.rank('hello'), 4);
+        self.assertRaises(KeyError, self.client.rank, 'nothere');
+        self.assertTrue(self.client.contains('help'));
+        self.assertFalse(self.client.contains('helps'));
+        self.assertEqual(len(self.client), 6);
+    
+    def testPipelined(self):
+        self.assertEqual(self.client.prefix_search_pipelined(['he', 'x', 'them'], cutoffRank=1),
+                         [['hello'], [], ['them']]);
+    
+    def testPipelinedManyRequests(self):
+        prefixes = ['t', 'th', 'the', 'them', 'h', 'he', 'hel', 'help'] * 50;
+        results = self.client.prefix_search_pipelined(prefixes, cutoffRank=1);
+        self.assertEqual(results[:8], [['the'], ['the'], ['the'], ['them'], ['hello'], ['hello'], ['hello'], ['help']]);
+        self.assertEqual(results[8:], results[:8] * 49);
+    
+    def testPhrases(self):
+        self.assertEqual(self.client.maxPhraseWords, 2);
+        self.assertEqual(self.client.phrase_prefix_search(['hello', 'w'], cutoffRank=3)[0], ('hello world', 2, CompletionKind.WORD));
+        self.assertTrue(self.client.addToUserDict('hello there you', rankInt=7));
+        self.assertEqual(self.client.maxPhraseWords, 3);
+    
+    def testNoteWordUsed(self):
+        self.client.noteWordUsed('then');
+        self.assertEqual(self.client.prefix_search('the', cutoffRank=2), ['then', 'the']);
+        self.telPadClient.noteWordUsed('help');
+        encWord = self.telPadClient.encodeWord('hel');
+        self.assertEqual(self.telPadClient.ranked_prefix_search(encWord, cutoffRank=2), ['help', 'hello']);
+    
+    def testTelPadLookups(self):
+        encWord = self.telPadClient.encodeWord('hel');
+        self.assertEqual(self.telPadClient.ranked_prefix_search(encWord, cutoffRank=2), ['hello', 'help']);
+        self.assertEqual(self.telPadClient.rank('help'), 5);
+    
+    def testAddNonAsciiWord(self):
+        # Build the T9 collection first, so that the addition reaches it:
+        self.assertTrue(self.telPadClient.contains(self.telPadClient.encodeWord('the')));
+        self.assertTrue(self.client.addToUserDict(u'caf\xe9', rankInt=6));
+        self.assertFalse(self.client.addToUserDict(u'caf\xe9', rankInt=6));
+        self.assertTrue(self.client.contains(u'caf\xe9'));
+        self.assertEqual(self.telPadClient.rank(u'caf\xe9'), 6);
+        self.assertEqual(self.readUserDict(), "6\tcaf\xc3\xa9\n");
+    
+    def testTelPadAddNonAsciiWord(self):
+        self.assertTrue(self.telPadClient.addToUserDict(u'na\xefve', rankInt=7));
+        self.assertFalse(self.telPadClient.addToUserDict(u'na\xefve', rankInt=7));
+        self.assertTrue(self.client.contains(u'na\xefve'));
+        self.assertEqual(self.client.rank(u'na\xefve'), 7);
+        self.assertEqual(self.readUserDict(), "7\tna\xc3\xafve\n");
+    
+    def testSocketOfLiveServerIsKept(self):
+        self.assertRaises(socket.error, WordCollectionServer, 
+                          socketPath=self.socketPath, dictDir=self.dictDir, watchDictFiles=False);
+        # The running server still answers:
+        client = WordCollectionClient(self.socketPath);
+        self.assertTrue(client.contains('the'));
+        client.close();
+    
+    def readUserDict(self):
+        with open(self.userDictFilePath, 'r') as fd:
+            return fd.read();
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+import os;
+import sys;
+import shutil;
+import tempfile;
+import unittest;
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src/word_completion'));
+from dictionary_bundles import DictionaryBundle, DictionaryBundleSet;
+from word_collection import CompletionKind;
+
+class DictionaryBundleTest(unittest.TestCase):
+    '''
+    Builds bundles 'english' and 'robotics' under a temporary 
+    bundle root.
+    '''
+    
+    BUNDLE_DICTS = {'english'  : "1 the\n2 bring\n3 brown\n4 grass\n5 hello\n",
+                    'robotics' : "1 gripper\n2 grasp\n3 base\n4 bring\n"};
+    
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp();
+        self.bundleRoot = os.path.join(self.tmpDir, 'bundles');
+        os.mkdir(self.bundleRoot);
+        for (bundleName, dictContents) in self.BUNDLE_DICTS.items():
+            dictDir = os.path.join(self.tmpDir, bundleName + '_dict');
+            os.mkdir(dictDir);
+            with open(os.path.join(dictDir, 'dict1.txt'), 'w') as fd:
+                fd.write(dictContents);
+            DictionaryBundle.build(os.path.join(self.bundleRoot, bundleName), dictDir);
+        self.bundleSet = DictionaryBundleSet(self.bundleRoot);
+    
+    def tearDown(self):
+        self.bundleSet.close();
+        shutil.rmtree(self.tmpDir);
+    
+    def testSwitching(self):
+        # Alphabetically first bundle is active by default:
+        self.assertEqual(self.bundleSet.activeBundleName(), 'english');
+        self.assertEqual(self.bundleSet.prefix_search('gr', cutoffRank=5), ['grass']);
+        self.assertEqual(len(self.bundleSet), 5);
+        self.assertEqual(self.bundleSet.switchToNext(), 'robotics');
+        self.assertEqual(self.bundleSet.prefix_search('gr', cutoffRank=5), ['gripper', 'grasp']);
+        self.assertEqual(self.bundleSet.rank('bring'), 4);
+        self.assertFalse(self.bundleSet.contains('hello'));
+        # Wraps around:
+        self.assertEqual(self.bundleSet.switchToNext(), 'english');
+        self.assertEqual(self.bundleSet.rank('bring'), 2);
+        self.bundleSet.switchTo('robotics');
+        self.assertEqual(self.bundleSet.activeBundleName(), 'robotics');
+        roboticsSet = DictionaryBundleSet(self.bundleRoot, activeBundleName='robotics');
+        try:
+            self.assertEqual(roboticsSet.activeBundleName(), 'robotics');
+        finally:
+            roboticsSet.close();
+    
+    def testBadBundleNames(self):
+        self.assertRaises(KeyError, self.bundleSet.switchTo, 'klingon');
+        self.assertEqual(self.bundleSet.activeBundleName(), 'english');
+        self.assertRaises(KeyError, DictionaryBundleSet, self.bundleRoot, activeBundleName='klingon');
+        emptyRoot = os.path.join(self.tmpDir, 'empty');
+        os.mkdir(emptyRoot);
+        # A directory without snapshot is not a bundle:
+        os.mkdir(os.path.join(emptyRoot, 'notABundle'));
+        self.assertRaises(ValueError, DictionaryBundleSet, emptyRoot);
+    
+    def testLookups(self):
+        self.assertEqual(sorted(self.bundleSet.prefix_search('BR')), ['bring', 'brown']);
+        self.assertEqual(self.bundleSet.phrase_prefix_search(['say', 'he']), [('hello', 1, CompletionKind.WORD)]);
+        self.assertEqual(self.bundleSet.phrase_prefix_search([]), []);
+        # Capitalized variants rank like the dictionary word:
+        self.assertEqual(self.bundleSet.rank('Hello'), 5);
+        self.assertRaises(KeyError, self.bundleSet.rank, 'nosuchword');
+        self.assertRaises(TypeError, self.bundleSet.prefix_search, 'br', cutoffRank='1');
+    
+    def testUserDictsPerBundle(self):
+        self.assertTrue(self.bundleSet.addToUserDict(u'gr\xfcn', rankInt=0));
+        self.assertFalse(self.bundleSet.addToUserDict(u'grass'));
+        self.assertEqual(self.bundleSet.prefix_search('gr', cutoffRank=1), ['gr\xc3\xbcn']);
+        self.assertEqual(self.bundleSet.rank(u'gr\xfcn'), 0);
+        self.bundleSet.switchTo('robotics');
+        self.assertFalse(self.bundleSet.contains('gr\xc3\xbcn'));
+        self.bundleSet.switchTo('english');
+        # The word went to the english bundle's own user dictionary, and survives reopening:
+        with open(os.path.join(self.bundleRoot, 'english', DictionaryBundle.USER_DICT_FILE_NAME)) as fd:
+            self.assertIn('gr\xc3\xbcn', fd.read());
+        self.assertFalse(os.path.exists(os.path.join(self.bundleRoot, 'robotics', DictionaryBundle.USER_DICT_FILE_NAME)));
+        reopenedSet = DictionaryBundleSet(self.bundleRoot);
+        try:
+            self.assertTrue(reopenedSet.contains('gr\xc3\xbcn'));
+            self.assertEqual(len(reopenedSet), 6);
+        finally:
+            reopenedSet.close();
+    
+    def testRecentWordsPerBundle(self):
+        self.assertEqual(self.bundleSet.prefix_search('br', cutoffRank=1), ['bring']);
+        self.bundleSet.noteWordUsed('Brown');
+        self.assertEqual(self.bundleSet.prefix_search('br', cutoffRank=1), ['brown']);
+        self.bundleSet.switchTo('robotics');
+        self.bundleSet.noteWordUsed('grasp');
+        self.assertEqual(self.bundleSet.prefix_search('gr', cutoffRank=1), ['grasp']);
+        self.bundleSet.switchTo('english');
+        self.assertEqual(self.bundleSet.prefix_search('br', cutoffRank=1), ['brown']);
+        self.bundleSet.clearRecentWords();
+        self.assertEqual(self.bundleSet.prefix_search('br', cutoffRank=1), ['bring']);
+
+if __name__ == '__main__':
+    unittest.main();
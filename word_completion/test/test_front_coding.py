@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+import os;
+import sys;
+import shutil;
+import tempfile;
+import unittest;
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src/word_completion'));
+from front_coding import FrontCodedWordList;
+from word_collection import WordCollection;
+
+class FrontCodedWordListTest(unittest.TestCase):
+    
+    # More words than fit one block, sharing long prefixes:
+    WORDS_AND_RANKS = [('help', 5), ('hello', 4), ('Hello', 40), ('helm', None), ('the', 1), 
+                       ('caf\xc3\xa9', 7)] +\
+                      [('word%03d' % num, 100 + num) for num in range(50)];
+    
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp();
+        self.snapshotPath = os.path.join(self.tmpDir, 'words.fcwl');
+        self.wordList = FrontCodedWordList.fromWords(self.WORDS_AND_RANKS, blockSize=4);
+        
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir);
+    
+    def checkLookups(self, wordList):
+        self.assertEqual(len(wordList), len(self.WORDS_AND_RANKS));
+        self.assertEqual(sorted(wordList), sorted(self.WORDS_AND_RANKS));
+        self.assertEqual(sorted(wordList.prefix_search('HEL')), ['Hello', 'hello', 'helm', 'help']);
+        self.assertEqual(wordList.prefix_search('hel', cutoffRank=2), ['hello', 'help']);
+        self.assertEqual(wordList.prefix_search('word04'), ['word%03d' % num for num in range(40, 50)]);
+        self.assertEqual(wordList.prefix_search('x'), []);
+        self.assertEqual(wordList.rank('word049'), 149);
+        self.assertEqual(wordList.rank('Hello'), 40);
+        self.assertEqual(wordList.rank('caf\xc3\xa9'), 7);
+        self.assertRaises(KeyError, wordList.rank, 'helm');
+        self.assertRaises(KeyError, wordList.rank, 'hellos');
+        self.assertTrue(wordList.contains('helm'));
+        self.assertFalse(wordList.contains('HELM'));
+    
+    def testLookups(self):
+        self.checkLookups(self.wordList);
+    
+    def testSaveAndLoad(self):
+        self.wordList.save(self.snapshotPath);
+        loadedList = FrontCodedWordList.load(self.snapshotPath, useMmap=False);
+        self.assertEqual(loadedList.blockSize, 4);
+        self.checkLookups(loadedList);
+    
+    def testSaveAndMap(self):
+        self.wordList.save(self.snapshotPath);
+        mappedList = FrontCodedWordList.load(self.snapshotPath);
+        try:
+            self.checkLookups(mappedList);
+            self.assertEqual(mappedList.numDataBytes(), self.wordList.numDataBytes());
+            # A mapped list saves the same snapshot:
+            resavedPath = os.path.join(self.tmpDir, 'resaved.fcwl');
+            mappedList.save(resavedPath);
+            with open(self.snapshotPath, 'rb') as fd:
+                snapshot = fd.read();
+            with open(resavedPath, 'rb') as fd:
+                self.assertEqual(fd.read(), snapshot);
+        finally:
+            mappedList.close();
+    
+    def testEmptyList(self):
+        FrontCodedWordList.fromWords([]).save(self.snapshotPath);
+        emptyList = FrontCodedWordList.load(self.snapshotPath);
+        self.assertEqual(len(emptyList), 0);
+        self.assertEqual(emptyList.prefix_search('a'), []);
+        self.assertFalse(emptyList.contains('a'));
+    
+    def testBadSnapshot(self):
+        with open(self.snapshotPath, 'wb') as fd:
+            fd.write('not a snapshot, but long enough for a header');
+        self.assertRaises(ValueError, FrontCodedWordList.load, self.snapshotPath);
+        with open(self.snapshotPath, 'wb') as fd:
+            fd.write('FCWL');
+        self.assertRaises(ValueError, FrontCodedWordList.load, self.snapshotPath);
+    
+    def testBadWords(self):
+        self.assertRaises(ValueError, FrontCodedWordList.fromWords, [('', 1)]);
+        self.assertRaises(ValueError, FrontCodedWordList.fromWords, [('x' * 256, 1)]);
+    
+    def testWordCollectionSnapshot(self):
+        dictDir = os.path.join(self.tmpDir, 'dict_files');
+        os.mkdir(dictDir);
+        with open(os.path.join(dictDir, 'dict1.txt'), 'w') as fd:
+            fd.write("1 the\n2 bring\n3 Menlo\n4 move to the dock\n");
+        abbreviationFilePath = os.path.join(self.tmpDir, 'abbreviations.txt');
+        with open(abbreviationFilePath, 'w') as fd:
+            fd.write("br be right back\n");
+        coll = WordCollection(dictDir=dictDir, 
+                              userDictFilePath=os.path.join(self.tmpDir, 'userDict.txt'),
+                              abbreviationFilePath=abbreviationFilePath);
+        coll.saveSnapshot(self.snapshotPath);
+        wordList = FrontCodedWordList.load(self.snapshotPath);
+        try:
+            # Abbreviation expansions are not entries:
+            self.assertEqual(sorted(wordList), [('Menlo', 3), ('bring', 2), ('move to the dock', 4), ('the', 1)]);
+            self.assertEqual(wordList.prefix_search('me'), ['Menlo']);
+        finally:
+            wordList.close();
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+import os;
+import sys;
+import shutil;
+import tempfile;
+import threading;
+import itertools;
+import unittest;
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src/word_completion'));
+from word_collection import TelPadEncodedWordCollection;
+
+class TelPadConcurrencyTest(unittest.TestCase):
+    '''
+    Lock-free readers of a TelPadEncodedWordCollection must never
+    find an encoded tree key without its collisions, while a writer
+    inserts and removes words.
+    '''
+    
+    NUM_WRITES = 5000;
+    
+    def setUp(self):
+        self.dictDir = tempfile.mkdtemp();
+        with open(os.path.join(self.dictDir, 'dict1.txt'), 'w') as fd:
+            fd.write("1 way\n2 wax\n3 yaw\n");
+        self.coll = TelPadEncodedWordCollection(dictDir=self.dictDir);
+        self.oldCheckInterval = sys.getcheckinterval();
+        # Switch threads as often as possible:
+        sys.setcheckinterval(1);
+        
+    def tearDown(self):
+        sys.setcheckinterval(self.oldCheckInterval);
+        shutil.rmtree(self.dictDir);
+
+    def testReadersDuringInsertAndRemove(self):
+        errors = [];
+        done = threading.Event();
+        
+        def reader(search):
+            try:
+                while not done.is_set():
+                    for realWord in search('wwww'):
+                        self.assertTrue(realWord.startswith('wwww'));
+            except Exception as e:
+                errors.append(e);
+        
+        readers = [threading.Thread(target=reader, args=(self.coll.ranked_prefix_search,)),
+                   threading.Thread(target=reader, args=(self.coll.prefix_search,))];
+        for thread in readers:
+            thread.start();
+        try:
+            for combo in itertools.islice(itertools.product('wxyz', repeat=7), TelPadConcurrencyTest.NUM_WRITES):
+                word = 'wwww' + ''.join(combo);
+                self.coll.insert(word, 5);
+                self.coll.remove(word);
+                if errors:
+                    break;
+        finally:
+            done.set();
+            for thread in readers:
+                thread.join();
+        self.assertEqual(errors, []);
+        # The original words are untouched:
+        self.assertEqual(self.coll.ranked_prefix_search('wa'), ['way', 'wax', 'yaw']);
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2013, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of the Willow Garage nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE
+
+import os;
+import sys;
+import shutil;
+import tempfile;
+import unittest;
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src/word_completion'));
+from word_collection import WordCollection, TelPadEncodedWordCollection, CompletionKind;
+
+class WordCollectionTestCase(unittest.TestCase):
+    '''
+    Builds a WordCollection from small dictionary and abbreviation
+    files in a temporary directory.
+    '''
+    
+    DICT_FILE_CONTENTS = "1 the\n2 bring\n3 brown\n4 break\n5 bread\n6 brief\n7 brick\n8 hello\n9 help\n";
+    ABBREVIATION_FILE_CONTENTS = "br bring\nbr be right back\n";
+    
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp();
+        self.dictDir = os.path.join(self.tmpDir, 'dict_files');
+        os.mkdir(self.dictDir);
+        self.dictFilePath = os.path.join(self.dictDir, 'dict1.txt');
+        self.writeFile(self.dictFilePath, self.DICT_FILE_CONTENTS);
+        self.userDictFilePath = os.path.join(self.tmpDir, 'userDict.txt');
+        self.writeFile(self.userDictFilePath, '');
+        self.abbreviationFilePath = os.path.join(self.tmpDir, 'abbreviations.txt');
+        self.writeFile(self.abbreviationFilePath, self.ABBREVIATION_FILE_CONTENTS);
+        self.coll = WordCollection(dictDir=self.dictDir, 
+                                   userDictFilePath=self.userDictFilePath,
+                                   abbreviationFilePath=self.abbreviationFilePath);
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir);
+    
+    def writeFile(self, filePath, contents):
+        with open(filePath, 'w') as fd:
+            fd.write(contents);
+
+class AbbreviationTest(WordCollectionTestCase):
+    
+    def testTags(self):
+        # Both have the rank of abbreviation expansions:
+        self.assertEqual(sorted(self.coll.tagged_prefix_search('br', cutoffRank=2)),
+                         [('be right back', CompletionKind.ABBREVIATION), ('bring', CompletionKind.WORD)]);
+    
+    def testWordAndExpansionTakeOnePlace(self):
+        # 'bring' is a word and an expansion of 'br':
+        taggedCompletions = self.coll.tagged_prefix_search('br', cutoffRank=5);
+        self.assertEqual(len(taggedCompletions), 5);
+        completions = [completion for (completion, _) in taggedCompletions];
+        self.assertEqual(completions.count('bring'), 1);
+        self.assertEqual(sorted(completions[:2]), ['be right back', 'bring']);
+        self.assertEqual(completions[2:], ['brown', 'break', 'bread']);
+    
+    def testUncut(self):
+        completions = [completion for (completion, _) in self.coll.tagged_prefix_search('br')];
+        self.assertEqual(sorted(completions), 
+                         sorted(['bring', 'be right back', 'brown', 'break', 'bread', 'brief', 'brick']));
+    
+    def testAddAbbreviation(self):
+        self.coll.addAbbreviation('hw', 'hello world');
+        self.assertEqual(self.coll.tagged_prefix_search('hw'), [('hello world', CompletionKind.ABBREVIATION)]);
+
+class HotReloadTest(WordCollectionTestCase):
+    
+    def testChangedFile(self):
+        self.writeFile(self.dictFilePath, "1 the\n20 hello\n10 helm\n");
+        # New 'helm', rank change of 'hello', the others removed:
+        self.assertEqual(self.coll.applyDictFileChange(self.dictFilePath), (1, 7, 1));
+        self.assertEqual(self.coll.prefix_search('hel', cutoffRank=5), ['helm', 'hello']);
+        self.assertEqual(self.coll.rank('hello'), 20);
+        self.assertFalse(self.coll.contains('help'));
+        self.assertEqual(len(self.coll), 3);
+        # Nothing to do without a change:
+        self.assertEqual(self.coll.applyDictFileChange(self.dictFilePath), (0, 0, 0));
+    
+    def testWordInOtherFile(self):
+        otherDictFilePath = os.path.join(self.dictDir, 'dict2.txt');
+        self.writeFile(otherDictFilePath, "30 help\n31 robot\n");
+        # Counted per file, so both words are new:
+        self.assertEqual(self.coll.applyDictFileChange(otherDictFilePath), (2, 0, 0));
+        self.writeFile(self.dictFilePath, self.DICT_FILE_CONTENTS.replace("9 help\n", ""));
+        # 'help' keeps its rank from the other file:
+        self.assertEqual(self.coll.applyDictFileChange(self.dictFilePath), (0, 0, 1));
+        self.assertEqual(self.coll.rank('help'), 30);
+        # Deleted files count as empty:
+        os.remove(otherDictFilePath);
+        self.assertEqual(self.coll.applyDictFileChange(otherDictFilePath), (0, 2, 0));
+        self.assertFalse(self.coll.contains('help'));
+        self.assertFalse(self.coll.contains('robot'));
+    
+    def testBadFileChangesNothing(self):
+        self.writeFile(self.dictFilePath, "1 the\nx hello\n");
+        self.assertRaises(ValueError, self.coll.applyDictFileChange, self.dictFilePath);
+        self.assertTrue(self.coll.contains('help'));
+        self.assertEqual(len(self.coll), 9);
+    
+    def testUserDictAdditionIsNotReapplied(self):
+        self.assertTrue(self.coll.addToUserDict('robot', rankInt=0));
+        self.assertEqual(self.coll.applyDictFileChange(self.userDictFilePath), (0, 0, 0));
+        self.assertEqual(self.coll.rank('robot'), 0);
+
+class CaseFoldingTest(WordCollectionTestCase):
+    
+    def testPrefixIgnoresCase(self):
+        self.coll.insert('Menlo', 10);
+        self.assertEqual(self.coll.prefix_search('me'), ['Menlo']);
+        self.assertEqual(self.coll.prefix_search('ME'), ['Menlo']);
+        self.assertEqual(self.coll.prefix_search('He', cutoffRank=2), ['hello', 'help']);
+    
+    def testSurfaceForms(self):
+        self.coll.insert('Menlo', 10);
+        self.assertTrue(self.coll.contains('Menlo'));
+        self.assertFalse(self.coll.contains('menlo'));
+        self.coll.insert('Hello', 30);
+        self.assertEqual(sorted(self.coll.prefix_search('hello')), ['Hello', 'hello']);
+        self.assertEqual(self.coll.rank('Hello'), 30);
+        self.assertEqual(self.coll.rank('hello'), 8);
+        self.assertTrue(self.coll.remove('Hello'));
+        self.assertEqual(self.coll.prefix_search('hello'), ['hello']);
+    
+    def testCapitalizedVariantRanksLikeWord(self):
+        self.assertEqual(self.coll.rank('The'), 1);
+        self.coll.insert('Menlo', 10);
+        self.assertRaises(KeyError, self.coll.rank, 'menlo');
+
+class PhraseTest(WordCollectionTestCase):
+    
+    DICT_FILE_CONTENTS = WordCollectionTestCase.DICT_FILE_CONTENTS + "10 move\n11 move to the dock\n12 to\n13 dock\n14 bring me\n";
+    ABBREVIATION_FILE_CONTENTS = "";
+    
+    def testPhrasesAreEntries(self):
+        self.assertEqual(self.coll.maxPhraseWords, 4);
+        self.assertEqual(self.coll.prefix_search('mo', cutoffRank=2), ['move', 'move to the dock']);
+        self.assertEqual(self.coll.rank('move to the dock'), 11);
+    
+    def testPhraseContext(self):
+        self.assertEqual(self.coll.phrase_prefix_search(['please', 'move', 'to', 't'], cutoffRank=2),
+                         [('move to the dock', 3, CompletionKind.WORD), ('the', 1, CompletionKind.WORD)]);
+        # 'to' starts no phrase, so only 'd' is searched by itself:
+        self.assertEqual(self.coll.phrase_prefix_search(['to', 'd']), [('dock', 1, CompletionKind.WORD)]);
+        self.assertEqual(self.coll.phrase_prefix_search([]), []);
+    
+    def testEachEntryOnce(self):
+        completions = self.coll.phrase_prefix_search(['move'], cutoffRank=5);
+        self.assertEqual(completions, [('move', 1, CompletionKind.WORD), ('move to the dock', 1, CompletionKind.WORD)]);
+    
+    def testRemovedPhrase(self):
+        self.assertTrue(self.coll.remove('bring me'));
+        self.assertEqual(self.coll.phrase_prefix_search(['bring', 'm']), 
+                         [('move', 1, CompletionKind.WORD), ('move to the dock', 1, CompletionKind.WORD)]);
+        self.assertEqual(self.coll.phrase_prefix_search(['move', 'to', 'th'], cutoffRank=1),
+                         [('move to the dock', 3, CompletionKind.WORD)]);
+
+class RecencyTest(WordCollectionTestCase):
+    
+    def testRecentWordsFirst(self):
+        self.assertEqual(self.coll.prefix_search('bre', cutoffRank=3), ['break', 'bread']);
+        self.coll.noteWordUsed('brick');
+        self.coll.noteWordUsed('bread');
+        # Most recent first:
+        self.assertEqual(self.coll.prefix_search('bre', cutoffRank=3), ['bread', 'break']);
+        self.assertEqual(self.coll.prefix_search('br', cutoffRank=3)[:2], ['bread', 'brick']);
+    
+    def testBoostLimit(self):
+        for word in ('brick', 'brief', 'bread'):
+            self.coll.noteWordUsed(word);
+        completions = self.coll.prefix_search('br', cutoffRank=4);
+        self.assertEqual(completions[:WordCollection.MAX_RECENCY_BOOSTED_RESULTS], ['bread', 'brief']);
+        self.assertFalse('brick' in completions);
+    
+    def testUnlimitedSearchIsNotReordered(self):
+        self.coll.noteWordUsed('help');
+        self.assertEqual(sorted(self.coll.prefix_search('hel')), ['hello', 'help']);
+    
+    def testCapitalizedAndUnknownWords(self):
+        self.coll.noteWordUsed('Help');
+        self.coll.noteWordUsed('helpless');
+        self.assertEqual(self.coll.prefix_search('hel', cutoffRank=1), ['help']);
+        self.coll.clearRecentWords();
+        self.assertEqual(self.coll.prefix_search('hel', cutoffRank=1), ['hello']);
+
+class BatchTest(WordCollectionTestCase):
+    
+    def testPrefixSearchMany(self):
+        # 'bre' and 'brea' extend 'br'; 'br' is given twice:
+        prefixes = ['br', 'hel', 'bre', '', 'x', 'brea', 'br'];
+        results = self.coll.prefix_search_many(prefixes);
+        self.assertEqual(len(results), len(prefixes));
+        for (prefix, result) in zip(prefixes, results):
+            if len(prefix) == 0:
+                self.assertEqual(result, []);
+            else:
+                self.assertEqual(sorted(result), sorted(self.coll.prefix_search(prefix)));
+        self.assertEqual(sorted(results[2]), ['bread', 'break']);
+        # Equal prefixes get separate lists:
+        results[0].append('extra');
+        self.assertNotIn('extra', results[6]);
+    
+    def testPrefixSearchManyCutoff(self):
+        prefixes = ['br', 'bri', 'HE'];
+        results = self.coll.prefix_search_many(prefixes, cutoffRank=2);
+        self.assertEqual(results, [self.coll.prefix_search(prefix, cutoffRank=2) for prefix in prefixes]);
+        self.assertEqual(results[1], ['bring', 'brief']);
+        self.assertRaises(TypeError, self.coll.prefix_search_many, prefixes, cutoffRank='2');
+    
+    def testRankMany(self):
+        ranks = self.coll.rank_many(['help', 'nosuchword', 'the', 'be right back']);
+        self.assertEqual(ranks.tolist(), [9, -1, 1, -1]);
+        self.assertEqual(self.coll.rank_many([]).tolist(), []);
+    
+    def testTelPadPrefixSearchMany(self):
+        telPadColl = TelPadEncodedWordCollection(dictDir=self.dictDir, userDictFilePath=self.userDictFilePath);
+        # 'ap' is 'br'; 'gd' is 'he'; 'apd' is 'bre':
+        encPrefixes = ['ap', 'gd', 'apd', '', 'ap'];
+        results = telPadColl.prefix_search_many(encPrefixes);
+        self.assertEqual([sorted(result) for result in results],
+                         [sorted(telPadColl.prefix_search(encPrefix)) for encPrefix in encPrefixes]);
+        self.assertEqual(sorted(results[2]), ['bread', 'break']);
+        self.assertEqual(telPadColl.prefix_search_many(encPrefixes, cutoffRank=1),
+                         [['bring'], ['hello'], ['break'], [], ['bring']]);
+
+if __name__ == '__main__':
+    unittest.main();